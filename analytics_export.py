@@ -0,0 +1,255 @@
+"""
+Columnar analytics export of executions, test cases, bugs and requirements.
+
+Each dataset is streamed as Parquet (zstd, one row group per batch) or as an
+Arrow IPC stream, typed from the model's columns. Rows are read with a
+server-side cursor (yield_per), so neither the query result nor the file is
+ever held in memory whole.
+
+Exports are incremental. Every dataset has a watermark column: id for the
+append-only tables (executions, requirements) and updated_at for the ones
+that are edited (test cases, bugs). An export covers since < watermark <=
+until, where until is read before the first row is sent; passing it back as
+since exports only what changed afterwards. Requirements have no updated_at,
+so edits to an already exported requirement are not picked up.
+
+test_executions also reads the execution archive (see execution_archive), so
+a full export includes executions already moved out of the hot table.
+
+    GET /api/export/<dataset>?format=parquet|arrow&since=<watermark>
+    flask export-analytics <directory>   # keeps watermarks.json in <directory>
+"""
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, func, or_, select
+
+from models import db, Bug, Requirement, TestCase, TestExecution
+from execution_archive import archive_files
+
+BATCH_SIZE = 50000
+FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+class Dataset:
+    def __init__(self, name, model, watermark, extra_columns=(), join=None):
+        self.name = name
+        self.model = model
+        self.watermark = watermark
+        self.columns = [getattr(model, column.key) for column in model.__table__.columns] + list(extra_columns)
+        self.join = join
+
+    def parse_watermark(self, value):
+        if value in (None, ''):
+            return None
+        try:
+            if isinstance(self.watermark.type, DateTime):
+                return datetime.fromisoformat(value)
+            return int(value)
+        except ValueError:
+            raise ExportError(f'Invalid watermark for {self.name}: {value!r}')
+
+    @staticmethod
+    def format_watermark(value):
+        if value is None:
+            return ''
+        return value.isoformat() if isinstance(value, datetime) else str(value)
+
+    def high_watermark(self):
+        return db.session.query(func.max(self.watermark)).scalar()
+
+    def query(self, since, until):
+        query = select(*self.columns)
+        if self.join is not None:
+            query = query.outerjoin(*self.join)
+        if since is not None:
+            return query.where(self.watermark > since, self.watermark <= until).order_by(self.watermark, self.model.id)
+        # Rows written before the watermark column was filled in only come with a full export
+        return query.where(or_(self.watermark <= until, self.watermark.is_(None))).order_by(
+            self.watermark, self.model.id
+        )
+
+
+def _arrow_type(pa, column):
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp('us')
+    return pa.string()
+
+
+DATASETS = {dataset.name: dataset for dataset in (
+    Dataset('test_executions', TestExecution, TestExecution.id, [TestCase.project_id],
+            join=(TestCase, TestCase.id == TestExecution.test_case_id)),
+    Dataset('test_cases', TestCase, TestCase.updated_at),
+    Dataset('bugs', Bug, Bug.updated_at),
+    Dataset('requirements', Requirement, Requirement.id),
+)}
+
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('pyarrow is required for analytics exports')
+    return pyarrow
+
+
+class _Chunks:
+    """Write-only file object whose contents are drained after every row group"""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _archive_id_range(path):
+    """(first id, last id) of an archive file, from its name: part-<first id>-<last id>.parquet"""
+    first, last = os.path.basename(path)[:-len('.parquet')].split('-')[1:]
+    return int(first), int(last)
+
+
+def _archived_batches(pa, schema, since, until):
+    """Executions of the archive files in (since, until], as record batches"""
+    import pyarrow.compute as pc
+    for path in archive_files():
+        first, last = _archive_id_range(path)
+        if (since is not None and last <= since) or first > until:
+            continue  # Already exported, or archived after this export began
+        for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=BATCH_SIZE):
+            mask = pc.less_equal(batch.column('id'), until)
+            if since is not None:
+                mask = pc.and_(mask, pc.greater(batch.column('id'), since))
+            batch = batch.filter(mask)
+            if batch.num_rows:
+                yield pa.RecordBatch.from_arrays([batch.column(name) for name in schema.names], schema=schema)
+
+
+class Export:
+    """One export run: its bounds are fixed when it is created, rows are read when iterated"""
+
+    def __init__(self, dataset, format='parquet', since=None):
+        if dataset not in DATASETS:
+            raise ExportError(f"Unknown dataset {dataset!r}; choose from {', '.join(DATASETS)}")
+        if format not in FORMATS:
+            raise ExportError(f"Unknown format {format!r}; choose from {', '.join(FORMATS)}")
+        self.pa = _arrow()
+        self.dataset = DATASETS[dataset]
+        self.format = format
+        self.since = self.dataset.parse_watermark(since) if isinstance(since, str) else since
+        until = self.dataset.high_watermark()
+        if self.dataset.name == 'test_executions':
+            until = max(until or 0, self._archived_high_watermark())
+        # Nothing new: until stays at since so the next export starts from the same place
+        self.until = until if until is not None and (self.since is None or until > self.since) else self.since
+        self.schema = self.pa.schema(
+            [(column.key, _arrow_type(self.pa, column)) for column in self.dataset.columns],
+            metadata={'dataset': self.dataset.name, 'watermark_column': self.dataset.watermark.key,
+                      'since': self.dataset.format_watermark(self.since),
+                      'until': self.dataset.format_watermark(self.until)},
+        )
+        self.rows = 0
+
+    @staticmethod
+    def _archived_high_watermark():
+        highest = 0
+        for path in archive_files():
+            highest = max(highest, _archive_id_range(path)[1])
+        return highest
+
+    @property
+    def mimetype(self):
+        return FORMATS[self.format][0]
+
+    @property
+    def filename(self):
+        bounds = '-'.join(self.dataset.format_watermark(value).replace(':', '') or 'start'
+                          for value in (self.since, self.until))
+        return f'{self.dataset.name}-{bounds}.{FORMATS[self.format][1]}'
+
+    def _batches(self):
+        if self.until is None or self.until == self.since:
+            return
+        if self.dataset.name == 'test_executions':
+            yield from _archived_batches(self.pa, self.schema, self.since, self.until)
+        result = db.session.execute(self.dataset.query(self.since, self.until).execution_options(yield_per=BATCH_SIZE))
+        for rows in result.partitions():
+            columns = list(zip(*rows))
+            yield self.pa.record_batch([self.pa.array(values, type=field.type)
+                                        for values, field in zip(columns, self.schema)], schema=self.schema)
+
+    def __iter__(self):
+        """Yield the file in pieces, one per row group"""
+        sink = _Chunks()
+        if self.format == 'parquet':
+            writer = self.pa.parquet.ParquetWriter(sink, self.schema, compression='zstd')
+        else:
+            writer = self.pa.ipc.new_stream(sink, self.schema)
+        try:
+            for batch in self._batches():
+                writer.write_batch(batch)
+                self.rows += batch.num_rows
+                yield sink.drain()
+        finally:
+            writer.close()
+            db.session.rollback()  # release the read transaction held by the cursor
+        yield sink.drain()
+
+
+def export_to_directory(directory, datasets=None, format='parquet', full=False):
+    """Write incremental exports into directory, keeping watermarks in watermarks.json
+
+    Returns {dataset: (file name, rows)}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    state_path = os.path.join(directory, 'watermarks.json')
+    watermarks = {}
+    if not full and os.path.exists(state_path):
+        with open(state_path) as f:
+            watermarks = json.load(f)
+    written = {}
+    for name in datasets or DATASETS:
+        export = Export(name, format, since=watermarks.get(name))
+        path = os.path.join(directory, name, export.filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            for chunk in export:
+                f.write(chunk)
+        if export.rows:
+            os.replace(path + '.tmp', path)
+        else:
+            os.remove(path + '.tmp')
+        written[name] = (os.path.basename(path) if export.rows else None, export.rows)
+        watermarks[name] = export.dataset.format_watermark(export.until)
+        with open(state_path, 'w') as f:
+            json.dump(watermarks, f, indent=2)
+    return written
@@ -0,0 +1,284 @@
+"""
+Static asset pipeline.
+
+The app's own CSS/JS lives in static/src; third-party assets (Bootstrap, Font
+Awesome, Chart.js, the Inter font) are pinned below and fetched once at build
+time into static/src/vendor, so a built image needs no CDN at runtime. The
+build copies everything to static/dist under content-hashed names
+(app.css -> app.3f2a9c1d0e.css), rewrites url() references inside CSS to the
+hashed names, writes .gz/.br siblings for compressible files and records the
+mapping in static/dist/manifest.json.
+
+Templates reference assets by logical name through asset_url(). Hashed files
+are served from /assets with a one-year immutable Cache-Control and the best
+precompressed encoding the client accepts; a changed file gets a new URL.
+Without a build (development), asset_url() falls back to static/src and, for
+vendor files not fetched yet, to the CDN.
+
+    python assets.py            # fetch missing vendor files and build
+    python assets.py --offline  # build from what is already in static/src
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import sys
+import urllib.request
+
+from flask import abort, request, send_file, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always written
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 10
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.ttf', '.txt', '.map'}
+MIN_COMPRESS_SIZE = 512  # bytes; smaller files gain nothing from compression
+
+JSDELIVR = 'https://cdn.jsdelivr.net/npm'
+BOOTSTRAP = f'{JSDELIVR}/bootstrap@5.3.0/dist'
+FONT_AWESOME = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0'
+CHART_JS = f'{JSDELIVR}/chart.js@4.4.0/dist'
+INTER = f'{JSDELIVR}/@fontsource/inter@5.0.8/files'
+INTER_WEIGHTS = (300, 400, 500, 600, 700)
+
+# logical name -> pinned download URL
+VENDOR_FILES = {
+    'vendor/bootstrap/bootstrap.min.css': f'{BOOTSTRAP}/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js': f'{BOOTSTRAP}/js/bootstrap.bundle.min.js',
+    'vendor/fontawesome/css/all.min.css': f'{FONT_AWESOME}/css/all.min.css',
+    'vendor/chartjs/chart.umd.js': f'{CHART_JS}/chart.umd.js',
+}
+for _font in ('fa-brands-400', 'fa-regular-400', 'fa-solid-900', 'fa-v4compatibility'):
+    for _extension in ('woff2', 'ttf'):
+        VENDOR_FILES[f'vendor/fontawesome/webfonts/{_font}.{_extension}'] = \
+            f'{FONT_AWESOME}/webfonts/{_font}.{_extension}'
+for _weight in INTER_WEIGHTS:
+    VENDOR_FILES[f'vendor/inter/inter-latin-{_weight}-normal.woff2'] = \
+        f'{INTER}/inter-latin-{_weight}-normal.woff2'
+
+# Used by asset_url() before the vendor files have been fetched
+CDN_FALLBACKS = {
+    'vendor/inter/inter.css': 'https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap',
+}
+CDN_FALLBACKS.update({name: url for name, url in VENDOR_FILES.items() if not name.endswith(('.woff2', '.ttf'))})
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+# Build
+
+def fetch_vendor(source_dir, force=False):
+    """Download the pinned third-party files that are not in source_dir yet"""
+    fetched = []
+    for name, url in VENDOR_FILES.items():
+        path = os.path.join(source_dir, name)
+        if os.path.exists(path) and not force:
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        fetched.append(name)
+    return fetched
+
+
+def write_font_css(source_dir):
+    """Declare the self-hosted Inter faces (Google Fonts serves browser-specific CSS)"""
+    path = os.path.join(source_dir, 'vendor/inter/inter.css')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        for weight in INTER_WEIGHTS:
+            f.write(
+                "@font-face{font-family:'Inter';font-style:normal;font-display:swap;"
+                f"font-weight:{weight};src:url(inter-latin-{weight}-normal.woff2) format('woff2')}}\n"
+            )
+
+
+def fingerprint(name, data):
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    base, extension = posixpath.splitext(name)
+    return f'{base}.{digest}{extension}'
+
+
+def rewrite_css_urls(name, css, manifest):
+    """Point relative url() references of a CSS file at the hashed names"""
+    directory = posixpath.dirname(name)
+
+    def replace(match):
+        reference = match.group(2).strip()
+        if reference.startswith(('data:', 'http:', 'https:', '//', '#', '/')):
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', reference).groups()
+        target = posixpath.normpath(posixpath.join(directory, path))
+        if target not in manifest:
+            logger.warning("%s references %s, which is not part of the build", name, target)
+            return match.group(0)
+        return f'url({posixpath.relpath(manifest[target], directory)}{suffix})'
+
+    return CSS_URL.sub(replace, css)
+
+
+def precompress(path, data):
+    """Write .gz (and .br when brotli is installed) next to path if it pays off"""
+    written = []
+    if posixpath.splitext(path)[1] not in COMPRESSIBLE or len(data) < MIN_COMPRESS_SIZE:
+        return written
+    encoded = {'gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(data, quality=11)
+    for suffix, compressed in encoded.items():
+        if len(compressed) < len(data):
+            with open(f'{path}.{suffix}', 'wb') as f:
+                f.write(compressed)
+            written.append(suffix)
+    return written
+
+
+def build(static_folder, fetch=True):
+    """Build static/dist from static/src; returns the manifest"""
+    source_dir = os.path.join(static_folder, 'src')
+    dist_dir = os.path.join(static_folder, 'dist')
+    if fetch:
+        fetch_vendor(source_dir)
+    write_font_css(source_dir)
+
+    names = []
+    for root, _, files in os.walk(source_dir):
+        for filename in files:
+            path = os.path.join(root, filename)
+            names.append(os.path.relpath(path, source_dir).replace(os.sep, '/'))
+
+    # CSS goes last so every file it references already has its hashed name
+    names.sort(key=lambda name: (name.endswith('.css'), name))
+
+    staging_dir = dist_dir + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    manifest = {}
+    for name in names:
+        with open(os.path.join(source_dir, name), 'rb') as f:
+            data = f.read()
+        if name.endswith('.css'):
+            data = rewrite_css_urls(name, data.decode('utf-8'), manifest).encode('utf-8')
+        hashed = fingerprint(name, data)
+        path = os.path.join(staging_dir, hashed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        precompress(path, data)
+        manifest[name] = hashed
+
+    with open(os.path.join(staging_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    # Built in a staging directory and moved into place, so a failed build leaves dist untouched
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.replace(staging_dir, dist_dir)
+    return manifest
+
+
+# Serving
+
+class AssetPipeline:
+    """Flask extension: asset_url() for templates and the /assets route"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._manifest = None
+        self._manifest_mtime = None
+        self._hashed = frozenset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_URL_PATH', '/assets')
+        app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+        self.app = app
+        app.extensions['assets'] = self
+        app.add_url_rule(app.config['ASSETS_URL_PATH'] + '/<path:filename>', 'static_assets', self.send)
+        app.add_template_global(self.asset_url, 'asset_url')
+
+    @property
+    def source_dir(self):
+        return os.path.join(self.app.static_folder, 'src')
+
+    @property
+    def dist_dir(self):
+        return os.path.join(self.app.static_folder, 'dist')
+
+    @property
+    def manifest(self):
+        path = os.path.join(self.dist_dir, MANIFEST_NAME)
+        # Re-read after a rebuild in debug mode; otherwise the first read is kept
+        if self._manifest is None or self.app.debug:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                mtime = None
+            if mtime != self._manifest_mtime or self._manifest is None:
+                manifest = {}
+                if mtime is not None:
+                    with open(path) as f:
+                        manifest = json.load(f)
+                self._manifest, self._manifest_mtime = manifest, mtime
+                self._hashed = frozenset(manifest.values())
+        return self._manifest
+
+    @property
+    def hashed_names(self):
+        self.manifest  # (re)loads the manifest when needed
+        return self._hashed
+
+    def asset_url(self, name):
+        """URL of a static asset by its logical name (path under static/src)"""
+        hashed = self.manifest.get(name)
+        if hashed:
+            return url_for('static_assets', filename=hashed)
+        if os.path.exists(os.path.join(self.source_dir, name)):
+            return url_for('static', filename='src/' + name)
+        if name in CDN_FALLBACKS:
+            return CDN_FALLBACKS[name]
+        return url_for('static', filename='src/' + name)
+
+    def send(self, filename):
+        """Serve a built asset, precompressed when the client accepts it"""
+        path = safe_join(self.dist_dir, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+        encoding = None
+        for candidate, suffix in (('br', 'br'), ('gzip', 'gz')):
+            if request.accept_encodings[candidate] and os.path.isfile(f'{path}.{suffix}'):
+                encoding, path = candidate, f'{path}.{suffix}'
+                break
+
+        immutable = filename in self.hashed_names
+        response = send_file(path, mimetype=mimetype, max_age=self.app.config['ASSETS_MAX_AGE'] if immutable else 0)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        if immutable:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        return response
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    built = build(static_folder, fetch='--offline' not in sys.argv[1:])
+    logger.info("Built %d assets into %s", len(built), os.path.join(static_folder, 'dist'))
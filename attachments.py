@@ -0,0 +1,371 @@
+"""
+Attachment storage for test cases, bugs and executions.
+
+Uploads are streamed in chunks into a temporary file while they are hashed,
+then stored once per distinct content under a SHA-256 key
+(sha256/ab/cd/<digest>). AttachmentBlob counts the Attachment rows that share
+a key, so identical files are stored once and removed when the last reference
+goes. Storage sits behind a backend: the local filesystem, or any
+S3-compatible API (AWS S3, MinIO). Helpers here do not commit; callers do.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+
+from flask import send_file, redirect, request, Response
+from sqlalchemy import func, case
+from werkzeug.utils import secure_filename
+
+from models import db, Attachment, AttachmentBlob, ExecutionAttachment
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class AttachmentTooLarge(ValueError):
+    pass
+
+
+def blob_key(digest):
+    """Content-addressed storage key of a SHA-256 digest"""
+    return f'sha256/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def digest_of(key):
+    return key.rsplit('/', 1)[-1]
+
+
+class LocalStorage:
+    """Blobs as files under a root directory"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        # Temporary uploads live on the same filesystem so storing is an atomic rename
+        self.temp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put_file(self, key, source_path, content_type=None):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source_path, target)
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def delete_prefix(self, prefix):
+        shutil.rmtree(self.path(prefix.rstrip('/')), ignore_errors=True)
+
+
+class S3Storage:
+    """Blobs as objects in an S3-compatible bucket"""
+
+    temp_dir = None
+
+    def __init__(self, bucket, endpoint_url=None, region=None, access_key=None, secret_key=None, prefix=''):
+        import boto3  # only needed with ATTACHMENT_STORAGE=s3
+        from botocore.exceptions import ClientError
+        self.client = boto3.client(
+            's3', endpoint_url=endpoint_url, region_name=region,
+            aws_access_key_id=access_key, aws_secret_access_key=secret_key
+        )
+        self.client_error = ClientError
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def object_key(self, key):
+        return self.prefix + key
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except self.client_error as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def put_file(self, key, source_path, content_type=None):
+        extra = {'ContentType': content_type} if content_type else None
+        # upload_file switches to multipart uploads for large files
+        self.client.upload_file(source_path, self.bucket, self.object_key(key), ExtraArgs=extra)
+        os.remove(source_path)
+
+    def get(self, key, byte_range=None):
+        """Return (body stream, content length, Content-Range or None)"""
+        params = {'Bucket': self.bucket, 'Key': self.object_key(key)}
+        if byte_range:
+            params['Range'] = byte_range
+        result = self.client.get_object(**params)
+        return result['Body'], result['ContentLength'], result.get('ContentRange')
+
+    def download(self, key, target_path):
+        self.client.download_file(self.bucket, self.object_key(key), target_path)
+
+    def presigned_url(self, key, filename, content_type, as_attachment, expires):
+        disposition = 'attachment' if as_attachment else 'inline'
+        return self.client.generate_presigned_url('get_object', Params={
+            'Bucket': self.bucket,
+            'Key': self.object_key(key),
+            'ResponseContentType': content_type,
+            'ResponseContentDisposition': f'{disposition}; filename="{filename}"'
+        }, ExpiresIn=expires)
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    def delete_prefix(self, prefix):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.object_key(prefix)):
+            objects = [{'Key': item['Key']} for item in page.get('Contents', [])]
+            if objects:
+                self.client.delete_objects(Bucket=self.bucket, Delete={'Objects': objects})
+
+
+def storage_from_config(config):
+    """Build the storage backend selected by ATTACHMENT_STORAGE"""
+    if config['ATTACHMENT_STORAGE'] == 's3':
+        return S3Storage(
+            config['ATTACHMENT_S3_BUCKET'],
+            endpoint_url=config.get('ATTACHMENT_S3_ENDPOINT'),
+            region=config.get('ATTACHMENT_S3_REGION'),
+            access_key=config.get('ATTACHMENT_S3_ACCESS_KEY'),
+            secret_key=config.get('ATTACHMENT_S3_SECRET_KEY'),
+            prefix=config.get('ATTACHMENT_S3_PREFIX', '')
+        )
+    return LocalStorage(config['ATTACHMENT_ROOT'])
+
+
+class AttachmentStore:
+    """Flask extension that stores, deduplicates and serves attachments"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ATTACHMENT_STORAGE', 'local')  # local or s3
+        app.config.setdefault('ATTACHMENT_ROOT', os.path.join(app.config.get('UPLOAD_FOLDER', 'uploads'), 'attachments'))
+        app.config.setdefault('ATTACHMENT_MAX_SIZE', 50 * 1024 * 1024)
+        # e.g. '/protected-attachments/' to let nginx serve local files via X-Accel-Redirect
+        app.config.setdefault('ATTACHMENT_X_ACCEL_PREFIX', None)
+        app.config.setdefault('ATTACHMENT_S3_REDIRECT', True)  # presigned redirects instead of proxying
+        app.config.setdefault('ATTACHMENT_CACHE_MAX_AGE', 3600)
+        self.app = app
+        app.extensions['attachments'] = self
+
+    @property
+    def backend(self):
+        # Built on first use so S3 credentials aren't needed at import time
+        if self._backend is None:
+            self._backend = storage_from_config(self.app.config)
+        return self._backend
+
+    # Storing
+
+    def store(self, stream, content_type=None):
+        """Stream a file into storage, returning its (deduplicated) AttachmentBlob
+
+        The content is hashed while it is copied to a temporary file in
+        CHUNK_SIZE pieces, so memory use does not grow with the upload.
+        """
+        max_size = self.app.config['ATTACHMENT_MAX_SIZE']
+        sha256 = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(prefix='upload-', dir=self.backend.temp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size and size > max_size:
+                        raise AttachmentTooLarge(f'Attachments are limited to {_format_size(max_size)}')
+                    sha256.update(chunk)
+                    temp.write(chunk)
+
+            digest = sha256.hexdigest()
+            key = blob_key(digest)
+            blob = AttachmentBlob.query.filter_by(sha256=digest).first()
+            if not blob:
+                self.backend.put_file(key, temp_path, content_type)
+                blob = AttachmentBlob(sha256=digest, size=size, ref_count=1)
+                db.session.add(blob)
+                return blob
+
+            # Known content: only the reference count changes
+            if not self.backend.exists(key):
+                self.backend.put_file(key, temp_path, content_type)
+            AttachmentBlob.query.filter_by(id=blob.id).update({
+                # A released blob that was not purged yet comes back with one reference
+                'ref_count': case((AttachmentBlob.ref_count < 0, 0), else_=AttachmentBlob.ref_count) + 1
+            }, synchronize_session=False)
+            return blob
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def attach(self, stream, filename, uploaded_by, content_type=None, test_case_id=None, bug_id=None,
+               test_execution_id=None):
+        """Store an upload and create its Attachment row"""
+        filename = os.path.basename(filename or 'attachment')[:255]
+        content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        blob = self.store(stream, content_type)
+        attachment = Attachment(
+            filename=filename,
+            file_path=blob_key(blob.sha256),
+            file_size=blob.size,
+            file_type=content_type[:50],
+            test_case_id=test_case_id,
+            bug_id=bug_id,
+            uploaded_by=uploaded_by
+        )
+        db.session.add(attachment)
+        if test_execution_id:
+            db.session.flush()
+            db.session.add(ExecutionAttachment(attachment_id=attachment.id, test_execution_id=test_execution_id))
+        return attachment
+
+    # Releasing
+
+    def release_keys(self, keys):
+        """Drop one reference per key; unreferenced blobs are removed by purge()"""
+        counts = {}
+        for key in keys:
+            if key and key.startswith('sha256/'):
+                counts[digest_of(key)] = counts.get(digest_of(key), 0) + 1
+        for digest, count in counts.items():
+            AttachmentBlob.query.filter_by(sha256=digest).update(
+                {'ref_count': AttachmentBlob.ref_count - count}, synchronize_session=False
+            )
+
+    def delete_attachments(self, attachment_ids):
+        """Delete Attachment rows (and execution links) and release their blobs"""
+        if not attachment_ids:
+            return 0
+        keys = [row[0] for row in db.session.query(Attachment.file_path).filter(
+            Attachment.id.in_(attachment_ids)
+        ).all()]
+        ExecutionAttachment.query.filter(ExecutionAttachment.attachment_id.in_(attachment_ids)).delete(
+            synchronize_session=False
+        )
+        deleted = Attachment.query.filter(Attachment.id.in_(attachment_ids)).delete(synchronize_session=False)
+        self.release_keys(keys)
+        return deleted
+
+    def delete_for(self, test_case_ids=(), bug_ids=(), execution_ids=()):
+        """Delete the attachments of records that are about to be deleted"""
+        conditions = []
+        if test_case_ids:
+            conditions.append(Attachment.test_case_id.in_(test_case_ids))
+        if bug_ids:
+            conditions.append(Attachment.bug_id.in_(bug_ids))
+        if execution_ids:
+            conditions.append(Attachment.id.in_(db.session.query(ExecutionAttachment.attachment_id).filter(
+                ExecutionAttachment.test_execution_id.in_(execution_ids)
+            )))
+        if not conditions:
+            return 0
+        ids = [row[0] for row in db.session.query(Attachment.id).filter(db.or_(*conditions)).all()]
+        return self.delete_attachments(ids)
+
+    def purge(self):
+        """Remove unreferenced blobs from storage; call after the releasing commit"""
+        purged = 0
+        for blob in AttachmentBlob.query.filter(AttachmentBlob.ref_count <= 0).all():
+            try:
+                self.backend.delete(blob_key(blob.sha256))
+                # Derived files (image variants) are keyed by the same digest
+                self.backend.delete_prefix(f'variants/{blob.sha256}/')
+            except Exception:
+                logger.exception("Failed to delete blob %s", blob.sha256)
+                continue
+            db.session.delete(blob)
+            purged += 1
+        db.session.commit()
+        return purged
+
+    # Serving
+
+    def send(self, key, filename, content_type, as_attachment=True, etag=None, max_age=None, immutable=False):
+        """Download response for a stored blob, honouring Range and conditional requests
+
+        immutable marks responses whose URL can never point at other content,
+        so browsers may cache them for max_age without revalidating.
+        """
+        etag = etag or digest_of(key)
+        max_age = self.app.config['ATTACHMENT_CACHE_MAX_AGE'] if max_age is None else max_age
+        cache_control = f'private, max-age={max_age}' + (', immutable' if immutable else '')
+
+        if isinstance(self.backend, LocalStorage):
+            x_accel_prefix = self.app.config['ATTACHMENT_X_ACCEL_PREFIX']
+            if x_accel_prefix:
+                # nginx serves the file (with Range support) from an internal location
+                response = Response(mimetype=content_type)
+                response.headers['X-Accel-Redirect'] = x_accel_prefix.rstrip('/') + '/' + key
+                response.headers['Content-Disposition'] = _disposition(filename, as_attachment)
+                response.headers['Cache-Control'] = cache_control
+                response.set_etag(etag)
+                return response
+            # send_file answers Range/If-None-Match itself, and uses X-Sendfile
+            # (USE_X_SENDFILE) or the server's sendfile() file wrapper
+            response = send_file(
+                self.backend.path(key), mimetype=content_type, as_attachment=as_attachment,
+                download_name=filename, conditional=True, etag=etag, max_age=max_age
+            )
+            response.headers['Cache-Control'] = cache_control
+            return response
+
+        if self.app.config['ATTACHMENT_S3_REDIRECT']:
+            # The object store handles Range requests for the presigned URL
+            return redirect(self.backend.presigned_url(key, filename, content_type, as_attachment, max_age))
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        byte_range = request.headers.get('Range')
+        body, length, content_range = self.backend.get(key, byte_range if byte_range and byte_range.startswith('bytes=') else None)
+        response = Response(body.iter_chunks(CHUNK_SIZE), status=206 if content_range else 200,
+                            mimetype=content_type, direct_passthrough=True)
+        response.headers['Content-Length'] = str(length)
+        response.headers['Accept-Ranges'] = 'bytes'
+        if content_range:
+            response.headers['Content-Range'] = content_range
+        response.headers['Content-Disposition'] = _disposition(filename, as_attachment)
+        response.headers['Cache-Control'] = cache_control
+        response.set_etag(etag)
+        return response
+
+    def storage_stats(self):
+        """Logical vs stored bytes, to show what deduplication saves"""
+        logical = db.session.query(func.coalesce(func.sum(Attachment.file_size), 0)).scalar()
+        stored = db.session.query(func.coalesce(func.sum(AttachmentBlob.size), 0)).filter(
+            AttachmentBlob.ref_count > 0
+        ).scalar()
+        return {'logical_bytes': int(logical), 'stored_bytes': int(stored)}
+
+
+def _format_size(size):
+    if size >= 1024 * 1024:
+        return f'{size / (1024 * 1024):.0f} MB'
+    return f'{size / 1024:.0f} KB' if size >= 1024 else f'{size} bytes'
+
+
+def _disposition(filename, as_attachment):
+    return f'{"attachment" if as_attachment else "inline"}; filename="{secure_filename(filename) or "download"}"'
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the web app.
+
+Each run starts a fresh interpreter (as a gunicorn worker boot or a CLI call
+does) and measures importing the app module, building the app and serving a
+first request to /healthz. Prints the median and best of the runs, and with
+--profile the slowest imports from python -X importtime.
+
+    python bench_startup.py [--runs 10] [--profile]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r'''
+import time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+application = getattr(module, 'app', None) or module.create_app()
+created = time.perf_counter()
+application.test_client().get('/healthz')
+served = time.perf_counter()
+print(imported - started, created - imported, served - created)
+'''
+
+
+def run_once(env):
+    output = subprocess.run([sys.executable, '-c', PROBE], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return [float(value) * 1000 for value in output.split()[-3:]]
+
+
+def slowest_imports(env, limit=15):
+    """(cumulative ms, module) of the slowest imports of one cold start"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], env=env, check=True,
+                            capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative) / 1000, name.rstrip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--profile', action='store_true', help='list the slowest imports')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite://')  # nothing here needs a live database
+    run_once(env)  # warm the bytecode cache so every measured run starts alike
+
+    samples = [run_once(env) for _ in range(args.runs)]
+    print(f'{"phase":<18}{"median ms":>10}{"best ms":>10}')
+    for index, phase in enumerate(('import app', 'create app', 'first request')):
+        values = [sample[index] for sample in samples]
+        print(f'{phase:<18}{statistics.median(values):>10.1f}{min(values):>10.1f}')
+    totals = [sum(sample) for sample in samples]
+    print(f'{"total":<18}{statistics.median(totals):>10.1f}{min(totals):>10.1f}')
+
+    if args.profile:
+        print('\nslowest imports (cumulative ms):')
+        for milliseconds, name in slowest_imports(env):
+            print(f'{milliseconds:>10.1f}  {name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+Bulk edits of test cases and bugs.
+
+A bulk edit names its rows by id, by a list filter (the query string of the
+list pages, see list_filters) or both, and sets a few fields on all of them:
+
+    {"filter": {"status": "Draft", "priority": ["Low", "Medium"]}, "changes": {"assigned_to": 12}}
+    {"ids": [101, 102, 103], "changes": {"status": "Closed"}}
+
+The changes are validated once. The matching ids are then updated
+CHUNK_SIZE at a time with one UPDATE ... WHERE id IN (...) per chunk, each
+chunk committed on its own so a large edit never holds its locks for long.
+Rows that already have the new values are left alone, so updated_at and the
+change log (which records Query.update() like any bulk update) only move for
+rows that really change.
+"""
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+from sqlalchemy import or_, select
+from werkzeug.datastructures import MultiDict
+
+from models import db, Bug, TestCase, TestSuite, User
+from list_filters import BUG_LISTING, TEST_CASE_LISTING
+from extensions import notifier, webhooks
+
+CHUNK_SIZE = 1000
+LEVELS = ('Low', 'Medium', 'High', 'Critical')
+CASE_STATUSES = ('Active', 'Draft', 'Deprecated')
+BUG_STATUSES = ('Open', 'In Progress', 'Resolved', 'Closed', 'Rejected')
+
+
+class BulkEditError(ValueError):
+    """The request names no rows or carries an invalid change"""
+
+
+def _int(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise BulkEditError(f'{field} must be an id') from None
+
+
+def _choice(*choices):
+    def validate(value, field):
+        if value not in choices:
+            raise BulkEditError(f'{field} must be one of {", ".join(choices)}')
+        return {field: value}
+    return validate
+
+
+def _assignee(value, field):
+    if value in (None, ''):
+        return {field: None}
+    user_id = _int(value, field)
+    if not db.session.query(User.id).filter_by(id=user_id, is_active=True).scalar():
+        raise BulkEditError(f'No active user {user_id}')
+    return {field: user_id}
+
+
+def _suite(value, field):
+    suite = db.session.get(TestSuite, _int(value, field))
+    if suite is None:
+        raise BulkEditError(f'No test suite {value}')
+    # Both suite columns are read as membership, and the case follows its suite's project
+    return {'suite_id': suite.id, 'test_suite_id': suite.id, 'project_id': suite.project_id}
+
+
+class Editable:
+    """A model that can be bulk edited: its list filter and {field: validator}"""
+
+    def __init__(self, model, listing, fields, noun):
+        self.model = model
+        self.listing = listing
+        self.fields = fields
+        self.noun = noun
+
+
+TEST_CASE_EDITS = Editable(TestCase, TEST_CASE_LISTING, {
+    'priority': _choice(*LEVELS),
+    'status': _choice(*CASE_STATUSES),
+    'assigned_to': _assignee,
+    'suite_id': _suite,
+}, 'test case')
+
+BUG_EDITS = Editable(Bug, BUG_LISTING, {
+    'status': _choice(*BUG_STATUSES),
+    'priority': _choice(*LEVELS),
+    'severity': _choice(*LEVELS),
+    'assigned_to': _assignee,
+}, 'bug')
+
+
+def _filter_args(filter):
+    """A filter given as a query string or as {name: value or [values]}"""
+    if isinstance(filter, str):
+        return MultiDict(parse_qsl(filter.lstrip('?'), keep_blank_values=True))
+    if not isinstance(filter, dict):
+        raise BulkEditError('filter must be a query string or an object')
+    args = MultiDict()
+    for name, values in filter.items():
+        for value in values if isinstance(values, list) else [values]:
+            args.add(name, '' if value is None else str(value))
+    return args
+
+
+def _differs(column, value):
+    return column.isnot(None) if value is None else or_(column != value, column.is_(None))
+
+
+class BulkEdit:
+    """One validated bulk edit; apply() runs it"""
+
+    def __init__(self, editable, data, user):
+        self.editable = editable
+        # Read now: after a chunk commits, touching user would reload it in a new transaction
+        self.user_id, self.username = user.id, user.username
+        changes = data.get('changes')
+        if not isinstance(changes, dict) or not changes:
+            raise BulkEditError('No changes given')
+        unknown = sorted(set(changes) - set(editable.fields))
+        if unknown:
+            raise BulkEditError(f'Cannot bulk edit {", ".join(unknown)}; editable: {", ".join(editable.fields)}')
+        self.changes = {}
+        for field, value in changes.items():
+            self.changes.update(editable.fields[field](value, field))
+
+        ids, filter = data.get('ids'), data.get('filter')
+        if not ids and not filter:
+            raise BulkEditError(f'No {editable.noun}s selected')
+        self.criteria = []
+        if ids:
+            if not isinstance(ids, list):
+                raise BulkEditError('ids must be a list')
+            self.criteria.append(editable.model.id.in_({_int(value, 'ids') for value in ids}))
+        if filter:
+            self.criteria.extend(editable.listing.query(_filter_args(filter)).criteria())
+        self.matched = 0
+        self.updated = 0
+
+    def ids(self):
+        model = self.editable.model
+        return db.session.execute(select(model.id).where(*self.criteria).order_by(model.id)).scalars().all()
+
+    def apply(self):
+        """Update every matching row, a chunk per transaction; returns the number changed"""
+        model = self.editable.model
+        ids = self.ids()
+        self.matched = len(ids)
+        changed = or_(*(_differs(getattr(model, field), value) for field, value in self.changes.items()))
+        bug_changes = []
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[start:start + CHUNK_SIZE]
+            if model is Bug and 'status' in self.changes:
+                bug_changes.extend(self._bug_status_events(chunk))
+            self.updated += model.query.filter(model.id.in_(chunk), changed).update(
+                dict(self.changes, updated_at=datetime.utcnow()), synchronize_session=False
+            )
+            db.session.commit()
+        self._notify(bug_changes)
+        return self.updated
+
+    def _bug_status_events(self, chunk):
+        """Queue bug.status_changed for the bugs of chunk whose status changes, as update_bug_status does"""
+        status = self.changes['status']
+        rows = db.session.execute(select(
+            Bug.id, Bug.title, Bug.status, Bug.severity, Bug.priority, Bug.test_case_id, Bug.reported_by,
+            Bug.assigned_to
+        ).where(Bug.id.in_(chunk), _differs(Bug.status, status))).all()
+        for row in rows:
+            webhooks.enqueue('bug.status_changed', {
+                'bug_id': row.id,
+                'title': row.title,
+                'old_status': row.status,
+                'status': status,
+                'severity': self.changes.get('severity', row.severity),
+                'priority': self.changes.get('priority', row.priority),
+                'test_case_id': row.test_case_id,
+                'updated_by': self.username
+            })
+        return rows
+
+    def _notify(self, bug_changes):
+        """One notification per kind of change for everyone concerned, rather than one per row"""
+        noun = self.editable.noun
+        assignee = self.changes.get('assigned_to')
+        if assignee and self.updated:
+            notifier.publish(
+                'assignment',
+                'New Assignment',
+                f'{self.username} assigned {self.updated} {noun}(s) to you',
+                recipient_ids=[assignee],
+                exclude_user_id=self.user_id
+            )
+        if bug_changes:
+            status = self.changes['status']
+            notifier.publish(
+                'bug_update',
+                f'{len(bug_changes)} bug(s) are now {status}',
+                f'{self.username} moved {len(bug_changes)} bug(s) to {status}',
+                recipient_ids=sorted({user_id for row in bug_changes for user_id in (row.reported_by, row.assigned_to)
+                                      if user_id}),
+                exclude_user_id=self.user_id
+            )
@@ -0,0 +1,181 @@
+"""
+Maintained latest-result-per-test-case table (test_case_state).
+
+Finding "the newest TestExecution of each case" is a greatest-per-group query
+over the whole execution history. test_case_state keeps the answer as one row
+per (test_case_id, environment), updated in the same transaction as the
+execution it reflects, so list pages and reports can join a 1:1 table.
+The row with environment '' holds the overall latest result. Helpers here do
+not commit; callers do.
+"""
+from datetime import datetime
+
+from sqlalchemy import func, select, insert, literal
+
+from models import db, TestCaseState, TestExecution, TestCase
+
+ALL_ENVIRONMENTS = ''
+
+STATE_COLUMNS = ['test_case_id', 'environment', 'last_execution_id', 'status',
+                 'build_version', 'executed_by', 'executed_at']
+
+
+def _environments(execution):
+    """State rows an execution feeds: overall plus its own environment"""
+    environments = [ALL_ENVIRONMENTS]
+    if execution.environment:
+        environments.append(execution.environment)
+    return environments
+
+
+def _upsert_state(values):
+    """INSERT a state row, or update the existing one unless it already holds a newer execution
+
+    One statement, so concurrent executions of a case can't both miss the
+    row and collide on uq_test_case_state. Returns False on dialects without
+    an upsert.
+    """
+    dialect = db.session.get_bind().dialect.name
+    changes = [name for name in STATE_COLUMNS if name not in ('test_case_id', 'environment')]
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(TestCaseState).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=['test_case_id', 'environment'],
+            set_={name: statement.excluded[name] for name in changes},
+            where=TestCaseState.last_execution_id < statement.excluded.last_execution_id
+        )
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        statement = dialect_insert(TestCaseState).values(values)
+        newer = TestCaseState.last_execution_id < statement.inserted.last_execution_id
+        # MySQL assigns left to right, so last_execution_id goes last: the others compare against its old value
+        statement = statement.on_duplicate_key_update([
+            (name, func.if_(newer, statement.inserted[name], TestCaseState.__table__.c[name]))
+            for name in sorted(changes, key=lambda name: name == 'last_execution_id')
+        ])
+    else:
+        return False
+    db.session.execute(statement)
+    return True
+
+
+def record_execution_state(execution):
+    """Make a newly flushed execution the latest state of its test case"""
+    if not execution.test_case_id:
+        return
+    for environment in _environments(execution):
+        values = {
+            'test_case_id': execution.test_case_id,
+            'environment': environment,
+            'last_execution_id': execution.id,
+            'status': execution.status,
+            'build_version': execution.build_version,
+            'executed_by': execution.executed_by,
+            'executed_at': execution.execution_date or datetime.utcnow(),
+        }
+        if _upsert_state(values):
+            continue
+        state = TestCaseState.query.filter_by(
+            test_case_id=execution.test_case_id, environment=environment
+        ).first()
+        if state and state.last_execution_id > execution.id:
+            continue
+        if not state:
+            state = TestCaseState(test_case_id=execution.test_case_id, environment=environment)
+            db.session.add(state)
+        for name, value in values.items():
+            setattr(state, name, value)
+
+
+def forget_case_state(test_case_ids):
+    """Delete the state rows of test cases (before they or their executions are deleted)"""
+    if not test_case_ids:
+        return
+    TestCaseState.query.filter(TestCaseState.test_case_id.in_(test_case_ids)).delete(
+        synchronize_session=False
+    )
+
+
+def _latest_select(test_case_ids=None, per_environment=False):
+    """SELECT of state rows computed from the execution history"""
+    group_columns = [TestExecution.test_case_id]
+    if per_environment:
+        group_columns.append(TestExecution.environment)
+
+    # Executions left behind by deleted test cases have no state
+    latest = select(*group_columns, func.max(TestExecution.id).label('execution_id')).join(
+        TestCase, TestCase.id == TestExecution.test_case_id
+    )
+    if per_environment:
+        latest = latest.where(TestExecution.environment.isnot(None), TestExecution.environment != '')
+    if test_case_ids is not None:
+        latest = latest.where(TestExecution.test_case_id.in_(test_case_ids))
+    latest = latest.group_by(*group_columns).subquery()
+
+    return select(
+        TestExecution.test_case_id,
+        TestExecution.environment if per_environment else literal(ALL_ENVIRONMENTS),
+        TestExecution.id, TestExecution.status, TestExecution.build_version,
+        TestExecution.executed_by, TestExecution.execution_date
+    ).join(latest, TestExecution.id == latest.c.execution_id)
+
+
+def refresh_case_state(test_case_ids=None):
+    """Recompute state rows from history for some test cases (all when None)
+
+    Runs as one DELETE plus one INSERT ... SELECT per granularity.
+    """
+    if test_case_ids is not None and not test_case_ids:
+        return
+    if test_case_ids is None:
+        TestCaseState.query.delete(synchronize_session=False)
+    else:
+        forget_case_state(test_case_ids)
+    for per_environment in (False, True):
+        db.session.execute(insert(TestCaseState).from_select(
+            STATE_COLUMNS, _latest_select(test_case_ids, per_environment)
+        ))
+
+
+def ensure_state():
+    """Populate test_case_state for executions recorded before it existed"""
+    has_executions = db.session.query(TestExecution.id).first() is not None
+    has_state = db.session.query(TestCaseState.id).first() is not None
+    if has_executions and not has_state:
+        refresh_case_state()
+        db.session.commit()
+
+
+def verify_state():
+    """Compare test_case_state against the execution history
+
+    Returns a dict with lists of (test_case_id, environment) keys that are
+    missing, stale (pointing at an older execution) or orphaned.
+    """
+    expected = {}
+    for per_environment in (False, True):
+        for row in db.session.execute(_latest_select(per_environment=per_environment)):
+            expected[(row[0], row[1])] = row[2]
+
+    stored = {(row.test_case_id, row.environment): row.last_execution_id for row in db.session.query(
+        TestCaseState.test_case_id, TestCaseState.environment, TestCaseState.last_execution_id
+    ).all()}
+
+    return {
+        'missing': sorted(key for key in expected if key not in stored),
+        'stale': sorted(key for key in expected if key in stored and stored[key] != expected[key]),
+        'orphaned': sorted(key for key in stored if key not in expected)
+    }
+
+
+def latest_states(test_case_ids, environment=ALL_ENVIRONMENTS):
+    """Return {test_case_id: TestCaseState} for the given cases"""
+    if not test_case_ids:
+        return {}
+    return {state.test_case_id: state for state in TestCaseState.query.filter(
+        TestCaseState.test_case_id.in_(test_case_ids), TestCaseState.environment == environment
+    ).all()}
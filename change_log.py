@@ -0,0 +1,241 @@
+"""
+Append-only change log behind the /api/changes feed.
+
+Every flush of the ORM session records one ChangeLogEntry per created,
+updated or deleted row of a tracked table, in the same transaction as the
+change itself. Bulk Query.update()/delete() calls are logged with one
+INSERT ... SELECT over the rows they match, and delete_rows()/update_rows()
+do the same for the cascading raw-SQL deletes and updates in the routes, so
+a cascade costs two statements however many rows it touches. Rows created
+with INSERT ... SELECT (clones) are logged by created_rows().
+
+Ids are handed out in flush order, but a later id can commit before an
+earlier one (a clone or a chunked bulk edit holds its transaction open far
+longer than a form post), so the feed's cursor is the entry's sequence
+instead: positions are given to committed entries, in one locked transaction
+at a time, each time the feed is read. An entry that commits late gets a
+position after everything already served, so no consumer can have moved past
+it. Positions follow ids where they can, so they match the ids of entries
+logged before sequences existed.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context, has_request_context
+from flask_login import current_user
+from sqlalchemy import bindparam, event, func, insert, literal, select, text, update
+
+from models import db, ChangeLogEntry
+
+# Tables whose rows are user-visible records; derived tables (closure, state,
+# progress) and plumbing (sessions, notifications, relay rows) are left out
+TRACKED_TABLES = {
+    'user', 'project', 'test_suite', 'requirement', 'test_case', 'test_execution', 'test_cycle',
+    'test_cycle_case', 'bug', 'attachment', 'comment', 'assignment', 'test_environment',
+}
+IGNORED_FIELDS = {'updated_at'}  # an update that only touches these is not a change
+SUPPRESS_KEY = 'change_log_suppressed'
+ENTRY_COLUMNS = ['entity', 'entity_id', 'action', 'fields', 'changed_by', 'changed_at']
+SEQUENCE_BATCH_SIZE = 5000
+
+
+def _changed_by():
+    if has_request_context() and current_user and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+def _active(session):
+    return has_app_context() and 'change_log' in current_app.extensions and not session.info.get(SUPPRESS_KEY)
+
+
+def _row_changes(session):
+    """(entity, id, action, fields) for the objects of one flush"""
+    for obj in session.new:
+        table = obj.__table__.name
+        if table in TRACKED_TABLES:
+            yield table, obj.id, 'created', None
+    for obj in session.dirty:
+        table = obj.__table__.name
+        if table not in TRACKED_TABLES or not session.is_modified(obj, include_collections=False):
+            continue
+        state = db.inspect(obj)
+        fields = [attr.key for attr in state.mapper.column_attrs
+                  if attr.key not in IGNORED_FIELDS and state.attrs[attr.key].history.has_changes()]
+        if fields:
+            yield table, obj.id, 'updated', ','.join(fields)
+    for obj in session.deleted:
+        table = obj.__table__.name
+        if table in TRACKED_TABLES:
+            yield table, obj.id, 'deleted', None
+
+
+def _after_flush(session, flush_context):
+    if not _active(session):
+        return
+    changed_by, changed_at = _changed_by(), datetime.utcnow()
+    rows = [dict(entity=entity, entity_id=entity_id, action=action, fields=fields,
+                 changed_by=changed_by, changed_at=changed_at)
+            for entity, entity_id, action, fields in _row_changes(session)]
+    if rows:
+        session.connection().execute(insert(ChangeLogEntry), rows)
+
+
+def _log_matching(connection, table, id_column, where, action, fields=None, params=None, changed_by=None):
+    """INSERT ... SELECT one entry per row of table matching where (a clause or SQL text)"""
+    selected = select(
+        literal(table.name), id_column, literal(action), literal(fields), literal(changed_by or _changed_by()),
+        literal(datetime.utcnow())
+    ).select_from(table)
+    if where is not None:
+        selected = selected.where(where)
+    statement = insert(ChangeLogEntry).from_select(ENTRY_COLUMNS, selected)
+    connection.execute(statement, params or {})
+
+
+def _do_orm_execute(state):
+    """Log bulk Query.update()/delete() before they run, while the rows still match"""
+    if not (state.is_update or state.is_delete) or not _active(state.session):
+        return
+    mapper = state.bind_mapper
+    if mapper is None or mapper.local_table.name not in TRACKED_TABLES:
+        return
+    statement = state.statement
+    fields = None
+    if state.is_update:
+        values = getattr(statement, '_values', None) or {}
+        fields = ','.join(sorted(
+            name for name in (str(getattr(key, 'key', key)) for key in values) if name not in IGNORED_FIELDS
+        )) or None
+    _log_matching(state.session.connection(), mapper.local_table, mapper.local_table.c.id, statement.whereclause,
+                  'deleted' if state.is_delete else 'updated', fields, state.parameters)
+
+
+def delete_rows(table, where, params):
+    """DELETE FROM table WHERE where (SQL text), recording a 'deleted' entry per row"""
+    session = db.session()
+    if _active(session) and table in TRACKED_TABLES:
+        table_clause = db.metadata.tables[table]
+        _log_matching(session.connection(), table_clause, table_clause.c.id, text(where), 'deleted', params=params)
+    return db.session.execute(text(f'DELETE FROM {table} WHERE {where}'), params)
+
+
+def update_rows(table, values, where, params):
+    """UPDATE table SET values WHERE where (SQL text), recording an 'updated' entry per row"""
+    session = db.session()
+    if _active(session) and table in TRACKED_TABLES:
+        table_clause = db.metadata.tables[table]
+        _log_matching(session.connection(), table_clause, table_clause.c.id, text(where), 'updated',
+                      ','.join(values), params)
+    assignments = ', '.join(f'{column} = :set_{column}' for column in values)
+    return db.session.execute(text(f'UPDATE {table} SET {assignments} WHERE {where}'),
+                              dict(params, **{f'set_{column}': value for column, value in values.items()}))
+
+
+def created_rows(table, where, changed_by=None):
+    """Record a 'created' entry per row of table matching where, for rows added by INSERT ... SELECT"""
+    session = db.session()
+    if _active(session) and table.name in TRACKED_TABLES:
+        _log_matching(session.connection(), table, table.c.id, where, 'created', changed_by=changed_by)
+
+
+@contextmanager
+def suppressed():
+    """Leave changes made inside the block out of the log (archival, rebuilds)"""
+    session = db.session()
+    previous = session.info.get(SUPPRESS_KEY)
+    session.info[SUPPRESS_KEY] = True
+    try:
+        yield
+    finally:
+        session.info[SUPPRESS_KEY] = previous
+
+
+class ChangeLog:
+    _listening = False
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CHANGE_FEED_PAGE_SIZE', 500)
+        app.config.setdefault('CHANGE_LOG_RETENTION_DAYS', 90)
+        app.extensions['change_log'] = self
+        if not ChangeLog._listening:
+            event.listen(db.session, 'after_flush', _after_flush)
+            event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+            ChangeLog._listening = True
+
+    @staticmethod
+    def _unsequenced(connection):
+        return connection.execute(
+            select(ChangeLogEntry.id).where(ChangeLogEntry.sequence.is_(None)).limit(1)
+        ).first() is not None
+
+    def assign_sequence(self, connection):
+        """Give every committed entry without a position the next ones, in id order; returns how many
+
+        Runs in its own write transaction on connection (the sequence index is
+        locked on MySQL, the database on SQLite), so positions only ever grow.
+        """
+        assigned = 0
+        with connection.begin():
+            table = ChangeLogEntry.__table__
+            last = connection.execute(select(table.c.sequence).where(table.c.sequence.isnot(None))
+                                      .order_by(table.c.sequence.desc()).limit(1).with_for_update()).scalar() or 0
+            while True:
+                ids = connection.execute(select(table.c.id).where(table.c.sequence.is_(None)).order_by(table.c.id)
+                                         .limit(SEQUENCE_BATCH_SIZE).with_for_update()).scalars().all()
+                if not ids:
+                    return assigned
+                positions = []
+                for entry_id in ids:
+                    last = max(last + 1, entry_id)
+                    positions.append({'entry_id': entry_id, 'position': last})
+                connection.execute(update(table).where(table.c.id == bindparam('entry_id'))
+                                   .values(sequence=bindparam('position')), positions)
+                assigned += len(ids)
+
+    def _assign(self):
+        with db.engine.connect() as connection:
+            return self.assign_sequence(connection.execution_options(begin_write=True))
+
+    def page(self, cursor=0, limit=None):
+        """Committed entries after cursor (a sequence), oldest first, plus whether more are waiting
+
+        Reads on a connection of its own, after assign_sequence(), so the page
+        sees every entry committed before it was asked for.
+        """
+        config = current_app.config
+        limit = max(1, min(limit or config['CHANGE_FEED_PAGE_SIZE'], config['CHANGE_FEED_PAGE_SIZE']))
+        with db.engine.connect() as connection:
+            if self._unsequenced(connection):
+                self._assign()
+                connection.rollback()  # a new transaction sees the positions just given
+            entries = connection.execute(
+                select(ChangeLogEntry.__table__).where(ChangeLogEntry.sequence > cursor)
+                .order_by(ChangeLogEntry.sequence).limit(limit + 1)
+            ).all()
+            # Entries committed since the positions were given count too
+            has_more = len(entries) > limit or self._unsequenced(connection)
+            connection.rollback()
+        return entries[:limit], has_more
+
+    def oldest_cursor(self):
+        """Cursors (other than 0) below this point at pruned entries; their consumers have to resync"""
+        first = db.session.query(func.min(ChangeLogEntry.sequence)).scalar()
+        return first - 1 if first else 0
+
+    def prune(self, days=None):
+        """Delete entries older than the retention period; returns how many"""
+        days = days or current_app.config['CHANGE_LOG_RETENTION_DAYS']
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        # Positioned first, so pruning follows the feed's order even if nobody has read it
+        self._assign()
+        last = db.session.query(func.max(ChangeLogEntry.sequence)).filter(ChangeLogEntry.changed_at < cutoff).scalar()
+        if last is None:
+            return 0
+        deleted = ChangeLogEntry.query.filter(ChangeLogEntry.sequence <= last).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
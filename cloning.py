@@ -0,0 +1,248 @@
+"""
+Deep copies of projects and test suite trees.
+
+A project clone copies the project's environments, requirements, suites and
+test cases; a suite clone copies a suite with every suite and case below it.
+Links between copied rows are kept: suites hang under their copied parents
+and cases sit in their copied suites and cover their copied requirements.
+Links out of the copied set (the parent of a cloned suite, the requirements
+of its cases) keep pointing at the originals. Executions, bugs and cycles are
+history rather than definitions and are not copied.
+
+Rows never pass through Python. Each table's copies get a block of new ids,
+max(id) + row_number(), recorded in clone_id_map (old id -> new id), and are
+written with INSERT ... SELECT, CLONE_BATCH_SIZE rows per statement, looking
+their foreign keys up in the map. A clone is one transaction that takes the
+write lock up front, so no other insert can claim a reserved id and a failed
+clone leaves nothing behind.
+
+Clones run as CloneJob rows on a background thread (CloneJobs.start());
+GET /clone-jobs/<id> reports their status.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from sqlalchemy import case, func, insert, literal, select
+
+from models import (db, CloneIdMap, CloneJob, Project, Requirement, TestCase, TestEnvironment, TestSuite,
+                    TestSuiteClosure)
+from database import after_request_transaction, begin_write
+from change_log import created_rows
+from suite_tree import subtree_test_cases
+from traceability import invalidate_coverage
+
+logger = logging.getLogger(__name__)
+
+CLONE_BATCH_SIZE = 10000
+KINDS = {'project': Project, 'suite': TestSuite}
+NAME_LENGTH = 100  # Project.name and TestSuite.name
+
+
+class CloneError(ValueError):
+    pass
+
+
+def copy_test_case(test_case, created_by):
+    """An unsaved copy of one test case with all of its fields"""
+    values = {column.key: getattr(test_case, column.key) for column in TestCase.__table__.columns
+              if column.key not in ('id', 'created_at', 'updated_at')}
+    values.update(title=f'Copy of {test_case.title}'[:200], created_by=created_by)
+    return TestCase(**values)
+
+
+class Clone:
+    """The copy statements of one clone job; run() returns the id of the new project or root suite"""
+
+    def __init__(self, job):
+        self.job_id = job.id
+        self.kind = job.kind
+        self.source_id = job.source_id
+        self.name = job.name
+        self.created_by = job.created_by
+        self.now = datetime.utcnow()
+        self.counts = {}
+        self._created = []  # (table, first id, count) to log once everything is copied
+
+    def new_id(self, entity, column):
+        """The copy's id for the row column points at, or the column itself when that row isn't copied"""
+        mapped = select(CloneIdMap.new_id).where(
+            CloneIdMap.job_id == self.job_id, CloneIdMap.entity == entity, CloneIdMap.old_id == column
+        ).scalar_subquery()
+        return func.coalesce(mapped, column)
+
+    def reserve(self, model, *criteria):
+        """Map the ids of model's rows matching criteria to a block of new ids; returns (first id, count)"""
+        # FOR UPDATE locks the end of the index on MySQL; SQLite already holds the write lock
+        top = db.session.execute(select(model.id).order_by(model.id.desc()).limit(1).with_for_update()).scalar() or 0
+        result = db.session.execute(insert(CloneIdMap).from_select(
+            ['job_id', 'entity', 'old_id', 'new_id'],
+            select(literal(self.job_id), literal(model.__tablename__), model.id,
+                   literal(top) + func.row_number().over(order_by=model.id)).where(*criteria)
+        ))
+        return top + 1, result.rowcount
+
+    def copy(self, model, *criteria, **values):
+        """Copy model's rows matching criteria, with values (column name -> expression) replacing columns"""
+        table = model.__table__
+        first, count = self.reserve(model, *criteria)
+        mapping = db.aliased(CloneIdMap)
+        columns = [column.name for column in table.columns]
+        selected = [mapping.new_id if name == 'id' else values.get(name, table.c[name]) for name in columns]
+        for start in range(first, first + count, CLONE_BATCH_SIZE):
+            db.session.execute(insert(table).from_select(columns, select(*selected).join(mapping, db.and_(
+                mapping.job_id == self.job_id, mapping.entity == table.name, mapping.old_id == table.c.id
+            )).where(mapping.new_id.between(start, start + CLONE_BATCH_SIZE - 1))))
+        self.counts[table.name] = count
+        self._created.append((table, first, count))
+
+    def copy_suites(self, *criteria, root=None, **values):
+        if root is not None:
+            values['name'] = case((TestSuite.id == root.id, literal(self.copy_name(root.name))), else_=TestSuite.name)
+        self.copy(TestSuite, *criteria, parent_suite_id=self.new_id('test_suite', TestSuite.parent_suite_id),
+                  created_at=literal(self.now), **values)
+        # Closure rows of the copies: copied ancestors are remapped, ancestors above the clone are kept
+        descendant = db.aliased(CloneIdMap)
+        db.session.execute(insert(TestSuiteClosure).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(self.new_id('test_suite', TestSuiteClosure.ancestor_id), descendant.new_id,
+                   TestSuiteClosure.depth).join(descendant, db.and_(
+                descendant.job_id == self.job_id, descendant.entity == 'test_suite',
+                descendant.old_id == TestSuiteClosure.descendant_id
+            ))
+        ))
+
+    def copy_cases(self, *criteria, **values):
+        self.copy(TestCase, *criteria,
+                  suite_id=self.new_id('test_suite', TestCase.suite_id),
+                  test_suite_id=self.new_id('test_suite', TestCase.test_suite_id),
+                  requirement_id=self.new_id('requirement', TestCase.requirement_id),
+                  created_by=literal(self.created_by), created_at=literal(self.now), updated_at=literal(self.now),
+                  **values)
+
+    def copy_name(self, name):
+        return (self.name or f'Copy of {name}')[:NAME_LENGTH]
+
+    def clone_project(self):
+        source = db.session.get(Project, self.source_id)
+        if source is None:
+            raise CloneError(f'No project {self.source_id}')
+        project = Project(name=self.copy_name(source.name), description=source.description, status=source.status,
+                          start_date=source.start_date, end_date=source.end_date, created_by=self.created_by)
+        db.session.add(project)
+        db.session.flush()
+        project_id = literal(project.id)
+        self.copy(TestEnvironment, TestEnvironment.project_id == source.id, project_id=project_id,
+                  created_at=literal(self.now))
+        self.copy(Requirement, Requirement.project_id == source.id, project_id=project_id,
+                  created_by=literal(self.created_by), created_at=literal(self.now))
+        self.copy_suites(TestSuite.project_id == source.id, project_id=project_id)
+        self.copy_cases(TestCase.project_id == source.id, project_id=project_id)
+        return project.id
+
+    def clone_suite(self):
+        source = db.session.get(TestSuite, self.source_id)
+        if source is None:
+            raise CloneError(f'No test suite {self.source_id}')
+        subtree = select(TestSuiteClosure.descendant_id).where(TestSuiteClosure.ancestor_id == source.id)
+        self.copy_suites(TestSuite.id.in_(subtree), root=source)
+        self.copy_cases(subtree_test_cases(source.id).whereclause)
+        return db.session.query(CloneIdMap.new_id).filter_by(
+            job_id=self.job_id, entity='test_suite', old_id=source.id
+        ).scalar()
+
+    def run(self):
+        """Copy everything in the current transaction, which should hold the write lock (begin_write)"""
+        target_id = self.clone_project() if self.kind == 'project' else self.clone_suite()
+        for table, first, count in self._created:
+            if count:
+                created_rows(table, table.c.id.between(first, first + count - 1), changed_by=self.created_by)
+        CloneIdMap.query.filter_by(job_id=self.job_id).delete(synchronize_session=False)
+        return target_id
+
+
+def job_dict(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'source_id': job.source_id,
+        'status': job.status,
+        'target_id': job.target_id,
+        'counts': json.loads(job.counts) if job.counts else {},
+        'error': job.error,
+        'created_by': job.created_by,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class CloneJobs:
+    """Flask extension that runs clone jobs on a background thread, one at a time"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.listeners = []  # called with the job_dict() of each finished job
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CLONE_ASYNC', True)  # False runs clones at the end of the calling request (tests)
+        self.app = app
+        app.extensions['clone_jobs'] = self
+
+    def _executor_(self):
+        # Created lazily so each gunicorn worker process owns its thread after fork
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='clone')
+        return self._executor
+
+    def start(self, kind, source_id, created_by, name=None):
+        """Queue a clone of a project or suite (kind) and return its committed CloneJob"""
+        model = KINDS.get(kind)
+        if model is None:
+            raise CloneError(f'Unknown clone kind {kind!r}')
+        if db.session.get(model, source_id) is None:
+            raise CloneError(f'No {kind} {source_id}')
+        job = CloneJob(kind=kind, source_id=source_id, name=(name or '').strip()[:NAME_LENGTH] or None,
+                       created_by=created_by)
+        db.session.add(job)
+        db.session.commit()
+        if self.app.config['CLONE_ASYNC']:
+            self._executor_().submit(self.run, job.id)
+        else:
+            after_request_transaction(partial(self.run, job.id))
+        return job
+
+    def run(self, job_id):
+        """Run a queued clone job in the calling thread"""
+        with self.app.app_context():
+            # Every transaction here writes, so each takes the write lock before its first read
+            begin_write(db.session)
+            job = db.session.get(CloneJob, job_id)
+            job.status, job.started_at = 'running', datetime.utcnow()
+            db.session.commit()
+            begin_write(db.session)
+            clone = Clone(job)
+            try:
+                target_id = clone.run()
+                job.status, job.target_id, job.counts = 'done', target_id, json.dumps(clone.counts)
+                job.finished_at = datetime.utcnow()
+                finished = job_dict(job)
+                invalidate_coverage()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.exception("Clone job %s failed", job_id)
+                begin_write(db.session)
+                job.status, job.error, job.finished_at = 'failed', str(e), datetime.utcnow()
+                finished = job_dict(job)
+                db.session.commit()
+            for listener in self.listeners:
+                listener(finished)
@@ -0,0 +1,186 @@
+"""
+Maintenance commands for the flask CLI (registered by create_app)
+"""
+import os
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from models import db, Attachment
+from case_state import refresh_case_state, verify_state
+from suite_tree import closure_rows, rebuild_closure
+from test_cycles import progress_rows, rebuild_progress
+from assets import build as build_assets
+from seed_data import seed, SEED_PASSWORD
+from startup import migrate
+from execution_archive import archive_executions, partition_executions
+from analytics_export import DATASETS, FORMATS, export_to_directory
+from extensions import attachment_store, change_log, image_variants, webhooks
+
+
+@click.command('rebuild-suite-tree')
+@with_appcontext
+@click.option('--check', is_flag=True, help='Only report drift (exit status 1 if any); change nothing.')
+@click.pass_context
+def rebuild_suite_tree_command(ctx, check):
+    """Rebuild the test suite closure table from parent_suite_id"""
+    stored = closure_rows()
+    rows = rebuild_closure()
+    drift = len(stored ^ closure_rows())
+    if check:
+        db.session.rollback()
+        click.echo(f"Test suite tree: {drift} closure row(s) out of date")
+        if drift:
+            ctx.exit(1)
+        return
+    db.session.commit()
+    click.echo(f"Rebuilt test suite tree ({rows} closure rows, {drift} changed)")
+
+
+@click.command('rebuild-cycle-progress')
+@with_appcontext
+@click.option('--check', is_flag=True, help='Only report drift (exit status 1 if any); change nothing.')
+@click.pass_context
+def rebuild_cycle_progress_command(ctx, check):
+    """Recompute test cycle plan statuses and progress counters from executions"""
+    stored = progress_rows()
+    cycles = rebuild_progress()
+    # A changed row shows up twice in the symmetric difference: old and new values
+    drift = len({row[:2] for row in stored ^ progress_rows()})
+    if check:
+        db.session.rollback()
+        click.echo(f"Test cycle progress: {drift} counter or plan row(s) out of date")
+        if drift:
+            ctx.exit(1)
+        return
+    db.session.commit()
+    click.echo(f"Rebuilt progress for {cycles} test cycle(s) ({drift} row(s) changed)")
+
+
+@click.command('verify-case-state')
+@with_appcontext
+@click.option('--rebuild', is_flag=True, help='Rebuild test_case_state from the execution history.')
+@click.pass_context
+def verify_case_state_command(ctx, rebuild):
+    """Check (or rebuild) the latest-result-per-test-case table; exit status 1 on drift"""
+    if rebuild:
+        refresh_case_state()
+        db.session.commit()
+        click.echo("Rebuilt test case state from execution history")
+    problems = verify_state()
+    for kind, keys in problems.items():
+        click.echo(f"{kind}: {len(keys)}" + (f" (e.g. {keys[:5]})" if keys else ''))
+    if any(problems.values()):
+        ctx.exit(1)
+    click.echo("Test case state matches execution history")
+
+
+@click.command('build-image-variants')
+@with_appcontext
+def build_image_variants_command():
+    """Generate missing resized/WebP variants for stored image attachments"""
+    keys = db.session.query(Attachment.file_path, Attachment.file_type).distinct().all()
+    scheduled = sum(1 for key, content_type in keys if image_variants.schedule(key, content_type))
+    image_variants.wait()
+    click.echo(f"Processed {scheduled} image(s)")
+
+
+@click.command('purge-attachments')
+@with_appcontext
+def purge_attachments_command():
+    """Delete stored attachment blobs that no attachment references any more"""
+    purged = attachment_store.purge()
+    stats = attachment_store.storage_stats()
+    click.echo(f"Purged {purged} blob(s); {stats['stored_bytes']} bytes stored for {stats['logical_bytes']} bytes of attachments")
+
+
+@click.command('build-assets')
+@with_appcontext
+@click.option('--offline', is_flag=True, help='Do not download missing vendor files.')
+def build_assets_command(offline):
+    """Fingerprint and precompress static assets into static/dist"""
+    manifest = build_assets(current_app.static_folder, fetch=not offline)
+    click.echo(f"Built {len(manifest)} asset(s) into {os.path.join(current_app.static_folder, 'dist')}")
+
+
+@click.command('seed-data')
+@with_appcontext
+@click.option('--executions', default=1000000, show_default=True, help='Test executions to generate; other tables scale with it.')
+@click.option('--seed', 'random_seed', default=42, show_default=True, help='Random seed (same seed, same data).')
+@click.option('--chunk-size', default=10000, show_default=True, help='Rows per INSERT batch.')
+@click.option('--days', default=365, show_default=True, help='Period the executions are spread over.')
+def seed_data_command(executions, random_seed, chunk_size, days):
+    """Fill the database with a large, realistic generated dataset"""
+    migrate(current_app._get_current_object())
+    counts, seconds, admin = seed(db.engine, executions, seed=random_seed, chunk_size=chunk_size, days=days)
+    for table, rows in counts.items():
+        click.echo(f"{table:<22}{rows:>12,}")
+    total = sum(counts.values())
+    click.echo(f"Inserted {total:,} rows in {seconds:.1f}s ({total / seconds:,.0f} rows/s); "
+               f"log in as {admin} (admin) or seed.user<id> with password '{SEED_PASSWORD}'")
+
+
+@click.command('archive-executions')
+@with_appcontext
+@click.option('--retention-days', type=int, help='Keep this many days hot (default EXECUTION_RETENTION_DAYS).')
+@click.option('--batch-size', default=50000, show_default=True, help='Rows read per batch.')
+def archive_executions_command(retention_days, batch_size):
+    """Move executions older than the retention window to Parquet files"""
+    archived = archive_executions(retention_days, batch_size)
+    for month, rows in archived.items():
+        click.echo(f"{month}{rows:>12,}")
+    click.echo(f"Archived {sum(archived.values()):,} execution(s) from {len(archived)} month(s)")
+
+
+@click.command('partition-executions')
+@with_appcontext
+def partition_executions_command():
+    """Partition test_execution by month on MySQL, adding partitions for closed months"""
+    created = partition_executions()
+    click.echo(f"Created {len(created)} partition(s)" + (f": {', '.join(created)}" if created else ''))
+
+
+@click.command('export-analytics')
+@with_appcontext
+@click.argument('directory')
+@click.option('--dataset', 'datasets', multiple=True, type=click.Choice(list(DATASETS)), help='Dataset to export (repeatable; default all).')
+@click.option('--format', 'export_format', default='parquet', show_default=True, type=click.Choice(list(FORMATS)))
+@click.option('--full', is_flag=True, help='Ignore the stored watermarks and export everything.')
+def export_analytics_command(directory, datasets, export_format, full):
+    """Export executions, test cases, bugs and requirements as Parquet/Arrow since the last run"""
+    written = export_to_directory(directory, datasets, export_format, full)
+    for name, (filename, rows) in written.items():
+        click.echo(f"{name:<18}{rows:>12,}  {filename or '(nothing new)'}")
+
+
+@click.command('prune-change-log')
+@with_appcontext
+@click.option('--days', type=int, help='Keep this many days of changes (default CHANGE_LOG_RETENTION_DAYS).')
+def prune_change_log_command(days):
+    """Delete change feed entries older than the retention period"""
+    click.echo(f"Pruned {change_log.prune(days):,} change log entries")
+
+
+@click.command('webhook-worker')
+@with_appcontext
+def webhook_worker_command():
+    """Deliver queued webhooks until interrupted (for WEBHOOK_DELIVERY=external)"""
+    click.echo(f"Delivering webhooks with {current_app.config['WEBHOOK_WORKERS']} worker(s)")
+    webhooks.run()
+
+
+COMMANDS = (
+    rebuild_suite_tree_command,
+    rebuild_cycle_progress_command,
+    verify_case_state_command,
+    build_image_variants_command,
+    purge_attachments_command,
+    build_assets_command,
+    seed_data_command,
+    archive_executions_command,
+    partition_executions_command,
+    export_analytics_command,
+    prune_change_log_command,
+    webhook_worker_command,
+)
@@ -0,0 +1,299 @@
+"""
+Response compression and HTML minification.
+
+A WSGI middleware around the Flask app that compresses eligible responses
+with the best encoding both sides support (brotli, zstd or gzip, per
+Accept-Encoding q-values and COMPRESS_ALGORITHMS order). Responses with a
+known length up to COMPRESS_BUFFER_SIZE bytes are compressed in one pass, and
+HTML among them is first stripped of indentation and comments; longer ones are
+compressed as they are read, without being held in memory. Streamed responses
+(generators without Content-Length) are compressed chunk by chunk and flushed
+after each chunk, so nothing is held back from the client.
+
+Skipped: anything not in COMPRESS_MIMETYPES (images, archives, attachments are
+already compressed), responses that already carry a Content-Encoding (the
+precompressed /assets files), partial and empty responses, HEAD requests,
+Cache-Control: no-transform, bodies under COMPRESS_MIN_SIZE bytes and file
+responses: send_file()/direct_passthrough bodies, server file wrappers,
+X-Sendfile/X-Accel-Redirect and anything that serves byte ranges, which go out
+untouched so the server's sendfile path and Range support keep working.
+"""
+import re
+import zlib
+from itertools import chain
+
+from flask import request
+from werkzeug.wsgi import FileWrapper
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/xml', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'
+}
+
+# Regions of an HTML page where whitespace is significant (or may be, in script template literals)
+PROTECTED_HTML = re.compile(r'(<(pre|textarea|script)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+LEADING_WHITESPACE = re.compile(r'\n\s+')
+
+PASSTHROUGH_KEY = 'compression.passthrough'  # environ flag set for direct_passthrough responses
+FILE_HEADERS = ('x-sendfile', 'x-accel-redirect', 'content-range')
+
+
+def minify_html(html):
+    """Drop indentation, blank lines and comments outside <pre>, <textarea> and <script>
+
+    Every run of whitespace keeps one newline, so the rendered page is unchanged.
+    """
+    parts = PROTECTED_HTML.split(html)
+    output = []
+    # split() yields text, protected block, tag name, text, ...
+    for index in range(0, len(parts), 3):
+        text = HTML_COMMENT.sub('', parts[index])
+        output.append(LEADING_WHITESPACE.sub('\n', text))
+        if index + 1 < len(parts):
+            output.append(parts[index + 1])
+    return ''.join(output)
+
+
+class GzipEncoder:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+ENCODERS = {'gzip': GzipEncoder}
+if brotli is not None:
+    ENCODERS['br'] = BrotliEncoder
+if zstandard is not None:
+    ENCODERS['zstd'] = ZstdEncoder
+
+
+def parse_accept_encoding(header):
+    """{coding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        match = re.search(r'q\s*=\s*([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(header, algorithms):
+    """Best coding acceptable to the client; ties go to the first in algorithms"""
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for coding in algorithms:
+        if coding not in ENCODERS:
+            continue
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionMiddleware:
+    """WSGI middleware; configured from the Flask config by Compression"""
+
+    def __init__(self, wsgi_app, config):
+        self.wsgi_app = wsgi_app
+        self.config = config
+
+    def __call__(self, environ, start_response):
+        config = self.config
+        if not config['COMPRESS_ENABLED'] or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.wsgi_app(environ, start_response)
+
+        encoding = choose_encoding(environ.get('HTTP_ACCEPT_ENCODING'), config['COMPRESS_ALGORITHMS'])
+        state = {}
+
+        def capture(status, headers, exc_info=None):
+            # Headers are held until the first body chunk decides how the response is sent
+            state['status'], state['headers'], state['exc_info'] = status, headers, exc_info
+            return lambda data: state.setdefault('written', []).append(data)
+
+        app_iter = self.wsgi_app(environ, capture)
+        return self._respond(app_iter, state, encoding, start_response, self._is_file(environ, app_iter))
+
+    @staticmethod
+    def _is_file(environ, app_iter):
+        """Whether the body is a file sent as is (send_file, direct_passthrough or a server file wrapper)"""
+        if environ.get(PASSTHROUGH_KEY):
+            return True
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        wrappers = (FileWrapper, file_wrapper) if isinstance(file_wrapper, type) else (FileWrapper,)
+        return isinstance(app_iter, wrappers)
+
+    def _respond(self, app_iter, state, encoding, start_response, is_file=False):
+        config = self.config
+        try:
+            status, headers = state['status'], state['headers']
+            header_map = {name.lower(): value for name, value in headers}
+            mimetype = header_map.get('content-type', '').split(';')[0].strip().lower()
+            eligible = (
+                not is_file
+                and not any(name in header_map for name in FILE_HEADERS)
+                and header_map.get('accept-ranges', '').lower() != 'bytes'
+                and mimetype in config['COMPRESS_MIMETYPES']
+                and status[:3] not in ('204', '206', '304')
+                and 'content-encoding' not in header_map
+                and 'no-transform' not in header_map.get('cache-control', '')
+            )
+            if not eligible:
+                start_response(status, headers, state['exc_info'])
+                yield from state.get('written', [])
+                yield from app_iter
+                return
+
+            headers = [(name, value) for name, value in headers if name.lower() != 'vary']
+            vary = [v.strip() for v in header_map.get('vary', '').split(',') if v.strip()]
+            if 'accept-encoding' not in {v.lower() for v in vary}:
+                vary.append('Accept-Encoding')
+            headers.append(('Vary', ', '.join(vary)))
+
+            chunks = chain(state.get('written', []), app_iter)
+            if header_map.get('content-length') is None:
+                yield from self._stream(chunks, state, status, headers, encoding, start_response)
+            else:
+                yield from self._buffered(chunks, state, status, headers, mimetype, encoding, start_response)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+    def _buffered(self, chunks, state, status, headers, mimetype, encoding, start_response):
+        config = self.config
+        buffered, size = [], 0
+        for chunk in chunks:
+            buffered.append(chunk)
+            size += len(chunk)
+            if size > config['COMPRESS_BUFFER_SIZE']:
+                # Too long to hold: compressed as it is read (no minifying), unflushed for a better ratio
+                yield from self._stream(chain(buffered, chunks), state, status, headers, encoding, start_response,
+                                        flush=False)
+                return
+        body = b''.join(buffered)
+        if mimetype == 'text/html' and config['COMPRESS_MINIFY_HTML']:
+            body = minify_html(body.decode('utf-8', 'surrogateescape')).encode('utf-8', 'surrogateescape')
+
+        if encoding and len(body) >= config['COMPRESS_MIN_SIZE']:
+            encoder = ENCODERS[encoding](config['COMPRESS_LEVELS'][encoding])
+            body = encoder.compress(body) + encoder.finish()
+            headers = self._encoded_headers(headers, encoding)
+
+        headers = [(name, value) for name, value in headers if name.lower() != 'content-length']
+        headers.append(('Content-Length', str(len(body))))
+        start_response(status, headers, state['exc_info'])
+        yield body
+
+    def _stream(self, chunks, state, status, headers, encoding, start_response, flush=True):
+        if not encoding:
+            start_response(status, headers, state['exc_info'])
+            yield from chunks
+            return
+
+        encoder = ENCODERS[encoding](self.config['COMPRESS_LEVELS'][encoding])
+        start_response(status, self._encoded_headers(headers, encoding), state['exc_info'])
+        for chunk in chunks:
+            if chunk:
+                # Flushed per chunk: a generator's output reaches the client as it is produced
+                data = encoder.compress(chunk) + encoder.flush() if flush else encoder.compress(chunk)
+                if data:
+                    yield data
+        yield encoder.finish()
+
+    @staticmethod
+    def _encoded_headers(headers, encoding):
+        encoded = []
+        for name, value in headers:
+            lowered = name.lower()
+            # Lengths and byte ranges would describe the uncompressed body
+            if lowered in ('content-length', 'content-md5', 'accept-ranges'):
+                continue
+            if lowered == 'etag' and not value.startswith('W/'):
+                value = 'W/' + value
+            encoded.append((name, value))
+        encoded.append(('Content-Encoding', encoding))
+        return encoded
+
+
+class Compression:
+    """Flask extension that installs CompressionMiddleware around app.wsgi_app"""
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_ALGORITHMS', ['br', 'zstd', 'gzip'])  # server preference
+        app.config.setdefault('COMPRESS_LEVELS', {'br': 4, 'zstd': 3, 'gzip': 6})
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)  # bytes, for responses with a known length
+        app.config.setdefault('COMPRESS_BUFFER_SIZE', 1024 * 1024)  # bytes held to compress in one pass
+        app.config.setdefault('COMPRESS_MIMETYPES', set(DEFAULT_MIMETYPES))
+        app.config.setdefault('COMPRESS_MINIFY_HTML', True)
+        self.app = app
+        app.wsgi_app = CompressionMiddleware(app.wsgi_app, app.config)
+        app.after_request(self._mark_passthrough)
+        app.extensions['compression'] = self
+
+    @staticmethod
+    def _mark_passthrough(response):
+        # The middleware only sees the WSGI body; direct_passthrough is known here
+        if response.direct_passthrough:
+            request.environ[PASSTHROUGH_KEY] = True
+        return response
@@ -0,0 +1,207 @@
+"""
+Backend-specific database setup and SQL.
+
+MySQL is the production database; SQLite serves single-node installs, CI and
+tests (DATABASE_URL=sqlite:////data/testmanagement.db). SQLite connections
+are tuned on connect: WAL so readers never wait for the writer, synchronous
+NORMAL (safe with WAL), a larger page cache, memory-mapped reads and a busy
+timeout instead of instant "database is locked" errors. Foreign keys stay
+unenforced: SQLite does not index referencing columns the way InnoDB does,
+so every parent delete would scan its child tables.
+
+pysqlite's implicit transactions are replaced by explicit ones. The session
+of a request that can write (anything but GET/HEAD/OPTIONS) starts its
+transactions with BEGIN IMMEDIATE, taking the write lock up front instead of
+failing when a read transaction later tries to upgrade; background jobs ask
+for the same with begin_write(). Every other session and connection begins a
+plain deferred transaction. Work that writes through another session while a
+request holds the lock (synchronous notification delivery, relayed live
+events) is put off with after_request_transaction() until the request's
+transaction is over. Connections are per thread, also for an in-memory database (see
+shared_memory_url), so background threads see the same data without sharing
+a transaction.
+
+date_bucket() is the date truncation both backends understand.
+"""
+import logging
+import os
+import sqlite3
+import uuid
+
+from flask import has_request_context, request
+from sqlalchemy import event, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import String
+
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # KiB, so about 64 MB
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 30000,  # ms
+}
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+WRITING_SESSION_KEY = 'writing_request'  # session.info flag of a writing request's session
+# request.environ: callbacks waiting for the request's transaction (per request, unlike g, which an
+# app context pushed inside the request replaces)
+DEFERRED_KEY = 'testmanagement.after_request_transaction'
+_memory_anchors = []
+
+logger = logging.getLogger(__name__)
+
+
+def is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def _is_memory(url):
+    return make_url(url).database in (None, '', ':memory:')
+
+
+def engine_options(url):
+    """SQLALCHEMY_ENGINE_OPTIONS for url"""
+    if not is_sqlite(url):
+        return {}
+    return {'connect_args': {'check_same_thread': False, 'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000}}
+
+
+def shared_memory_url(url):
+    """url, with an in-memory SQLite database swapped for a named memdb one every connection shares
+
+    Each connection to sqlite:// gets a private database, which Flask-SQLAlchemy
+    works around with a single connection for all threads. A memdb database
+    (SQLite 3.36+) is shared by name and locks like a file, so busy_timeout
+    applies; the anchor connection keeps it alive while pooled ones come and go.
+    """
+    if not (is_sqlite(url) and _is_memory(url)):
+        return url
+    name = f'/testmanagement-{uuid.uuid4().hex}'
+    _memory_anchors.append(sqlite3.connect(f'file:{name}?vfs=memdb', uri=True, check_same_thread=False))
+    return f'sqlite:///file:{name}?vfs=memdb&uri=true'
+
+
+def ensure_sqlite_directory(url):
+    """Create the directory of a SQLite database file, which SQLite won't do itself"""
+    if is_sqlite(url) and not _is_memory(url) and not make_url(url).database.startswith('file:'):
+        directory = os.path.dirname(os.path.abspath(make_url(url).database))
+        os.makedirs(directory, exist_ok=True)
+
+
+def _on_connect(dbapi_connection, connection_record):
+    # Autocommit at the driver level; transactions are begun explicitly in _on_begin
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    try:
+        if cursor.execute('PRAGMA database_list').fetchone()[2]:  # a file, not :memory:
+            cursor.execute('PRAGMA journal_mode=WAL')
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def _on_begin(connection):
+    begin_write = connection.get_execution_options().get('begin_write')
+    connection.exec_driver_sql('BEGIN IMMEDIATE' if begin_write else 'BEGIN')
+
+
+def _on_transaction_create(session, transaction):
+    # Only the writing request's own session: its connection is procured with begin_write
+    if transaction.parent is None and session.info.get(WRITING_SESSION_KEY):
+        begin_write(session)
+
+
+def begin_write(session):
+    """Start session's transaction holding the write lock, for jobs that read ids and then write
+
+    On SQLite this is BEGIN IMMEDIATE; elsewhere a plain transaction (lock
+    rows with SELECT ... FOR UPDATE instead).
+    """
+    return session.connection(execution_options={'begin_write': True})
+
+
+def after_request_transaction(callback):
+    """Run callback once the current request's transaction is over, or right away outside a request
+
+    For work that writes through its own session or connection: run in the
+    middle of a request it would wait on the lock the request's session holds.
+    """
+    if not has_request_context():
+        return callback()
+    request.environ.setdefault(DEFERRED_KEY, []).append(callback)
+
+
+def configure_engine(engine):
+    """Install the SQLite connection and transaction handling on engine (no-op elsewhere)"""
+    if engine.dialect.name != 'sqlite' or event.contains(engine, 'connect', _on_connect):
+        return
+    event.listen(engine, 'connect', _on_connect)
+    event.listen(engine, 'begin', _on_begin)
+    # Connections opened before the listener (e.g. by create_all) are discarded
+    engine.dispose()
+
+
+def init_request_transactions(app, session):
+    """Mark the session of writing requests and run after_request_transaction() work at teardown
+
+    session is the app's scoped session; each request gets its own.
+    """
+    if not event.contains(session, 'after_transaction_create', _on_transaction_create):
+        event.listen(session, 'after_transaction_create', _on_transaction_create)
+
+    def mark_writing_session():
+        if request.method not in READ_ONLY_METHODS and session.get_bind().dialect.name == 'sqlite':
+            session.info[WRITING_SESSION_KEY] = True
+
+    def run_deferred(exc):
+        while DEFERRED_KEY in request.environ:
+            callbacks = request.environ.pop(DEFERRED_KEY)
+            # Ends the request's transaction; anything left uncommitted is discarded at teardown anyway
+            session.close()
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception:
+                    logger.exception("Deferred work failed after the request")
+
+    app.before_request(mark_writing_session)
+    app.teardown_request(run_deferred)
+
+
+class date_bucket(FunctionElement):
+    """Start of the day, ISO week (Monday) or month of a datetime column, as 'YYYY-MM-DD'
+
+        date_bucket(TestExecution.execution_date, 'week')
+    """
+    type = String()
+    inherit_cache = False  # the unit is not part of the cache key
+    UNITS = ('day', 'week', 'month')
+
+    def __init__(self, column, unit):
+        if unit not in self.UNITS:
+            raise ValueError(f'Unknown date bucket unit {unit!r}')
+        self.unit = unit
+        super().__init__(column)
+
+
+@compiles(date_bucket, 'sqlite')
+def _date_bucket_sqlite(element, compiler, **kw):
+    column = list(element.clauses)[0]
+    if element.unit == 'day':
+        return compiler.process(func.date(column), **kw)
+    if element.unit == 'week':
+        # 'weekday 0' moves forward to Sunday (or stays on it); six days back is Monday
+        return compiler.process(func.date(column, 'weekday 0', '-6 days'), **kw)
+    return compiler.process(func.date(column, 'start of month'), **kw)
+
+
+@compiles(date_bucket, 'mysql')
+def _date_bucket_mysql(element, compiler, **kw):
+    column = list(element.clauses)[0]
+    if element.unit == 'day':
+        return compiler.process(func.date_format(column, '%Y-%m-%d'), **kw)
+    if element.unit == 'week':
+        return compiler.process(func.date_format(func.subdate(column, func.weekday(column)), '%Y-%m-%d'), **kw)
+    return compiler.process(func.date_format(column, '%Y-%m-01'), **kw)
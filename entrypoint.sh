@@ -2,20 +2,11 @@
 
 echo "Starting Test Management Tool..."
 
-# Wait for database to be ready using Python script
-echo "Waiting for database to be ready..."
-python wait_for_db.py
-
-if [ $? -ne 0 ]; then
-    echo "❌ Failed to connect to database. Exiting..."
-    exit 1
-fi
-
-echo "Database is ready!"
-
-# Initialize database tables
-echo "Initializing database tables..."
-python init_db.py
+# Wait for the database (exponential backoff on DATABASE_URL) and bring the
+# schema up to date; a no-op when the recorded schema version is current
+python startup.py || { echo "❌ Database start-up checks failed. Exiting..."; exit 1; }
 
 echo "Starting application..."
-exec gunicorn --bind 0.0.0.0:5000 --workers 2 --threads 2 --timeout 60 --keep-alive 2 --max-requests 1000 --preload app:app
+# Workers, threads and the worker class (GUNICORN_WORKER_CLASS=gevent|gthread)
+# are sized from the container's CPU and memory limits in gunicorn.conf.py
+exec gunicorn --config gunicorn.conf.py app:app
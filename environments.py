@@ -0,0 +1,127 @@
+"""
+Test environments and the test case x environment result matrix.
+
+Matrix cells come from the per-environment rows of test_case_state, so a page
+of the matrix is two indexed queries (a page of cases, then their cells)
+regardless of how much execution history exists. TestExecution.environment
+stays a free-text name; TestEnvironment gives those names a managed list.
+"""
+from sqlalchemy import func
+
+from models import db, TestEnvironment, TestCase, TestCaseState, TestExecution
+from case_state import ALL_ENVIRONMENTS, refresh_case_state
+
+MATRIX_PAGE_SIZE = 200
+MAX_MATRIX_PAGE_SIZE = 1000
+
+
+def environment_names(project_id=None, active_only=True):
+    """Managed environment names for a project (global environments included)
+
+    Falls back to the environment names seen in executions when none are
+    managed yet.
+    """
+    query = db.session.query(TestEnvironment.name)
+    if active_only:
+        query = query.filter(TestEnvironment.status == 'Active')
+    if project_id:
+        query = query.filter(db.or_(TestEnvironment.project_id == project_id,
+                                    TestEnvironment.project_id.is_(None)))
+    names = sorted(set(row[0] for row in query.all()))
+    if names:
+        return names
+
+    return [row[0] for row in db.session.query(TestCaseState.environment).filter(
+        TestCaseState.environment != ALL_ENVIRONMENTS
+    ).distinct().order_by(TestCaseState.environment).all()]
+
+
+def environment_name_error(name, project_id=None, environment_id=None):
+    """Why name can't be used for an environment of project_id (None: a global one), or None if it can
+
+    Executions record environments by name, so a name must not be shared
+    with another environment the same project sees (its own or a global one).
+    """
+    if not name:
+        return 'Environment name is required'
+    query = TestEnvironment.query.filter(TestEnvironment.name == name)
+    if project_id:
+        query = query.filter(db.or_(TestEnvironment.project_id == project_id, TestEnvironment.project_id.is_(None)))
+    if environment_id is not None:
+        query = query.filter(TestEnvironment.id != environment_id)
+    if db.session.query(query.exists()).scalar():
+        return f'An environment named {name} already exists'
+    return None
+
+
+def rename_environment(environment, new_name):
+    """Rename an environment and the execution history its project recorded against it"""
+    old_name = environment.name
+    environment.name = new_name
+    if old_name == new_name:
+        return
+    executions = TestExecution.query.filter(TestExecution.environment == old_name)
+    states = db.session.query(TestCaseState.test_case_id).filter(TestCaseState.environment == old_name)
+    if environment.project_id:
+        # A global environment's history spans every project; a project's stays in the project
+        project_cases = db.session.query(TestCase.id).filter(TestCase.project_id == environment.project_id)
+        executions = executions.filter(TestExecution.test_case_id.in_(project_cases.scalar_subquery()))
+        states = states.filter(TestCaseState.test_case_id.in_(project_cases.scalar_subquery()))
+    # The new name may already have history, so recompute the touched cases
+    affected_case_ids = [row[0] for row in states.all()]
+    executions.update({'environment': new_name}, synchronize_session=False)
+    refresh_case_state(affected_case_ids)
+
+
+def _matrix_cases(project_id=None):
+    query = db.session.query(TestCase.id, TestCase.title, TestCase.priority)
+    if project_id:
+        query = query.filter(TestCase.project_id == project_id)
+    return query
+
+
+def matrix_total(project_id=None):
+    """Number of test case rows in the matrix"""
+    return _matrix_cases(project_id).order_by(None).count()
+
+
+def matrix_page(environments, project_id=None, offset=0, limit=MATRIX_PAGE_SIZE):
+    """One page of matrix rows: test cases by id with their latest status per environment"""
+    limit = max(1, min(limit, MAX_MATRIX_PAGE_SIZE))
+    cases = _matrix_cases(project_id).order_by(TestCase.id).offset(max(offset, 0)).limit(limit).all()
+    if not cases or not environments:
+        return [{'id': tc.id, 'title': tc.title, 'priority': tc.priority, 'cells': {}} for tc in cases]
+
+    cells = {}
+    for state in db.session.query(
+        TestCaseState.test_case_id, TestCaseState.environment, TestCaseState.status,
+        TestCaseState.last_execution_id, TestCaseState.executed_at
+    ).filter(
+        TestCaseState.test_case_id.in_([tc.id for tc in cases]),
+        TestCaseState.environment.in_(environments)
+    ).all():
+        cells.setdefault(state.test_case_id, {})[state.environment] = {
+            'status': state.status,
+            'execution_id': state.last_execution_id,
+            'executed_at': state.executed_at.strftime('%Y-%m-%d %H:%M') if state.executed_at else None
+        }
+
+    return [{'id': tc.id, 'title': tc.title, 'priority': tc.priority, 'cells': cells.get(tc.id, {})}
+            for tc in cases]
+
+
+def environment_summary(environments, project_id=None):
+    """Return {environment: {status: count}} over the latest results, in one GROUP BY"""
+    if not environments:
+        return {}
+    query = db.session.query(
+        TestCaseState.environment, TestCaseState.status, func.count(TestCaseState.id)
+    ).filter(TestCaseState.environment.in_(environments))
+    if project_id:
+        query = query.join(TestCase, TestCase.id == TestCaseState.test_case_id).filter(
+            TestCase.project_id == project_id
+        )
+    summary = {name: {} for name in environments}
+    for environment, status, count in query.group_by(TestCaseState.environment, TestCaseState.status).all():
+        summary[environment][status] = count
+    return summary
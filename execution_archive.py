@@ -0,0 +1,412 @@
+"""
+Execution history archival and MySQL partitioning of test_execution.
+
+Executions older than EXECUTION_RETENTION_DAYS are moved, a calendar month
+at a time, into zstd-compressed Parquet files under EXECUTION_ARCHIVE_ROOT
+(test_execution/month=YYYY-MM/part-<first id>-<last id>.parquet), each row
+carrying its test case's project_id so archive reports need no join. Rows
+still referenced from the hot tables stay behind: the latest result of a
+case (test_case_state), cycle plans, comments and execution attachments.
+
+On MySQL, test_execution can be partitioned by month: RANGE on id, split at
+the first id of every month (ids grow with execution_date, and partitioning
+on id keeps the primary key as it is). Partitioned InnoDB tables cannot take
+part in foreign keys, so partitioning drops the ones to and from
+test_execution. Once a month is archived and its partition holds nothing
+else, the partition is dropped instead of deleting row by row.
+
+Report counts (execution_status_counts) and the dashboard trend
+(execution_trend) add the archive to the hot table. The archive side is
+aggregated once per set of files (per project and status, and per project,
+day and status) and cached per process; the cache key is the file set, so
+workers never serve counts for files that changed.
+
+    flask partition-executions   # MySQL: partition, or add partitions for closed months
+    flask archive-executions     # move executions past the retention window
+"""
+import glob
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select, text, union
+
+from change_log import suppressed
+from database import date_bucket
+from models import db, Project, TestExecution, TestCase, TestCaseState, TestCycleCase, Comment, ExecutionAttachment
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'test_execution'
+OPEN_PARTITION = 'pmax'  # holds the current month
+EXECUTION_COLUMNS = ('id', 'test_case_id', 'executed_by', 'status', 'actual_result', 'comments',
+                     'execution_date', 'environment', 'build_version', 'execution_time', 'test_cycle_id')
+DELETE_BATCH = 1000
+
+_counts_cache = {}  # archive root -> (file signature, {(project_id, status): count})
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_month(moment):
+    return month_start(month_start(moment) + timedelta(days=32))
+
+
+def archive_root():
+    return os.path.join(current_app.config['EXECUTION_ARCHIVE_ROOT'], TABLE)
+
+
+def archive_files():
+    return sorted(glob.glob(os.path.join(archive_root(), 'month=*', '*.parquet')))
+
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('pyarrow is required to read or write the execution archive')
+    return pyarrow, pyarrow.parquet
+
+
+def _schema(pa):
+    return pa.schema([
+        ('id', pa.int64()), ('test_case_id', pa.int64()), ('executed_by', pa.int64()), ('status', pa.string()),
+        ('actual_result', pa.string()), ('comments', pa.string()), ('execution_date', pa.timestamp('us')),
+        ('environment', pa.string()), ('build_version', pa.string()), ('execution_time', pa.int64()),
+        ('test_cycle_id', pa.int64()), ('project_id', pa.int64()),
+    ])
+
+
+# Archival
+
+def _pinned_ids():
+    """Executions the hot tables still point at; they are never archived"""
+    return union(
+        select(TestCaseState.last_execution_id),
+        select(TestCycleCase.last_execution_id).where(TestCycleCase.last_execution_id.isnot(None)),
+        select(Comment.test_execution_id).where(Comment.test_execution_id.isnot(None)),
+        select(ExecutionAttachment.test_execution_id),
+    )
+
+
+def _delete_ids(ids):
+    # Archived rows still exist, so they are not deletions for the change feed
+    with suppressed():
+        for start in range(0, len(ids), DELETE_BATCH):
+            TestExecution.query.filter(TestExecution.id.in_(ids[start:start + DELETE_BATCH])).delete(
+                synchronize_session=False
+            )
+            db.session.commit()
+
+
+def _reconcile(month_dir):
+    """Delete hot rows already written to this month's files by an interrupted run"""
+    _, pq = _arrow()
+    for path in glob.glob(os.path.join(month_dir, '*.parquet')):
+        ids = pq.read_table(path, columns=['id']).column('id').to_pylist()
+        _delete_ids(ids)
+
+
+def archive_month(start, batch_size=50000):
+    """Move one month of unpinned executions to a Parquet file; returns rows archived"""
+    pa, pq = _arrow()
+    end = next_month(start)
+    month_dir = os.path.join(archive_root(), f'month={start:%Y-%m}')
+    os.makedirs(month_dir, exist_ok=True)
+    _reconcile(month_dir)
+
+    query = select(*(getattr(TestExecution, column) for column in EXECUTION_COLUMNS), TestCase.project_id).outerjoin(
+        TestCase, TestCase.id == TestExecution.test_case_id
+    ).where(
+        TestExecution.execution_date >= start, TestExecution.execution_date < end,
+        TestExecution.id.notin_(_pinned_ids())
+    ).order_by(TestExecution.id)
+
+    schema = _schema(pa)
+    temp_path = os.path.join(month_dir, '.writing.parquet')
+    archived = []
+    writer = None
+    try:
+        # Streamed in batches, so a month of millions of rows never sits in memory at once
+        for rows in db.session.execute(query.execution_options(yield_per=batch_size)).partitions():
+            if writer is None:
+                writer = pq.ParquetWriter(temp_path, schema, compression='zstd')
+            columns = list(zip(*rows))
+            writer.write_batch(pa.record_batch([pa.array(values, type=field.type)
+                                                for values, field in zip(columns, schema)], schema=schema))
+            archived.extend(columns[0])
+    finally:
+        if writer is not None:
+            writer.close()
+    db.session.rollback()  # end the read transaction before deleting
+    if not archived:
+        return 0
+    os.replace(temp_path, os.path.join(month_dir, f'part-{archived[0]}-{archived[-1]}.parquet'))
+
+    partition = f'p{start:%Y%m}'
+    if partition in partition_names() and _only_archivable(partition, start, end) \
+            and _partition_count(partition) == len(archived):
+        db.session.execute(text(f'ALTER TABLE {TABLE} DROP PARTITION {partition}'))
+        db.session.commit()
+    else:
+        _delete_ids(archived)
+    logger.info("Archived %d executions of %s", len(archived), f'{start:%Y-%m}')
+    return len(archived)
+
+
+def archive_executions(retention_days=None, batch_size=50000):
+    """Archive every whole month older than the retention window; returns {month: rows}"""
+    retention_days = retention_days or current_app.config['EXECUTION_RETENTION_DAYS']
+    cutoff = month_start(datetime.utcnow() - timedelta(days=retention_days))
+    oldest = db.session.query(func.min(TestExecution.execution_date)).scalar()
+    db.session.rollback()
+    archived = {}
+    month = month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        archived[f'{month:%Y-%m}'] = archive_month(month, batch_size)
+        month = next_month(month)
+    return archived
+
+
+# Reading
+
+def _archive_aggregate(kind, compute):
+    """compute(files, pyarrow.parquet) over every archive file, cached per kind and file set"""
+    files = archive_files()
+    if not files:
+        return {}
+    signature = tuple((path, os.path.getsize(path)) for path in files)
+    key = (current_app.config['EXECUTION_ARCHIVE_ROOT'], kind)
+    cached = _counts_cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+    _, pq = _arrow()
+    value = compute(files, pq)
+    _counts_cache[key] = (signature, value)
+    return value
+
+
+def _grouped_counts(files, pq, columns, transform=None):
+    counts = {}
+    for path in files:
+        table = pq.read_table(path, columns=columns)
+        if transform:
+            table = transform(table)
+        grouped = table.group_by(columns).aggregate([([], 'count_all')])
+        for row in grouped.to_pylist():
+            key = tuple(row[column] for column in columns)
+            counts[key] = counts.get(key, 0) + row['count_all']
+    return counts
+
+
+def archived_status_counts():
+    """{(project_id, status): count} over every archive file, cached per file set"""
+    return _archive_aggregate('status', lambda files, pq: _grouped_counts(files, pq, ['project_id', 'status']))
+
+
+def archived_daily_counts():
+    """{(project_id, day, status): count} of archived passes and failures, cached per file set"""
+    def by_day(table):
+        import pyarrow.compute as pc
+        pa, _ = _arrow()
+        table = table.filter(pc.is_in(table.column('status'), value_set=pa.array(['Pass', 'Fail'])))
+        return table.set_column(table.schema.get_field_index('execution_date'), 'execution_date',
+                                pc.cast(table.column('execution_date'), pa.date32()))
+
+    return _archive_aggregate('daily', lambda files, pq: _grouped_counts(
+        files, pq, ['project_id', 'execution_date', 'status'], by_day
+    ))
+
+
+def _live_projects(archived, project_id=None):
+    """Projects whose archived history still counts: deleted projects' files stay but drop out"""
+    if not archived:
+        return set()
+    return {project_id} if project_id is not None else {row[0] for row in db.session.query(Project.id)}
+
+
+def execution_status_counts(project_id=None):
+    """{status: count} of all executions, hot and archived, optionally for one project"""
+    query = db.session.query(TestExecution.status, func.count(TestExecution.id))
+    if project_id is not None:
+        query = query.join(TestCase, TestCase.id == TestExecution.test_case_id).filter(
+            TestCase.project_id == project_id
+        )
+    counts = dict(query.group_by(TestExecution.status).all())
+    archived = archived_status_counts()
+    projects = _live_projects(archived, project_id)
+    for (archived_project_id, status), count in archived.items():
+        if archived_project_id in projects:
+            counts[status] = counts.get(status, 0) + count
+    return counts
+
+
+# Dashboard trend periods: (name, bucket unit, number of buckets, label format)
+TREND_PERIODS = (
+    ('7days', 'day', 7, '%a'),
+    ('30days', 'week', 4, '%d %b'),
+    ('3months', 'month', 3, '%b %Y'),
+)
+
+
+def _bucket_start(day, unit):
+    if unit == 'day':
+        return day
+    if unit == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _bucket_starts(unit, count, today):
+    if unit == 'day':
+        return [today - timedelta(days=offset) for offset in range(count - 1, -1, -1)]
+    if unit == 'week':
+        monday = today - timedelta(days=today.weekday())
+        return [monday - timedelta(weeks=offset) for offset in range(count - 1, -1, -1)]
+    starts = [today.replace(day=1)]
+    while len(starts) < count:
+        starts.insert(0, (starts[0] - timedelta(days=1)).replace(day=1))
+    return starts
+
+
+def execution_trend(today=None):
+    """{period: {'labels', 'passed', 'failed'}} per day, week and month, for the dashboard chart
+
+    A retention window shorter than the longest period moves part of it to
+    the archive, so archived daily counts are added to the hot ones.
+    """
+    today = today or date.today()
+    archived = archived_daily_counts()
+    projects = _live_projects(archived)
+    trend = {}
+    for period, unit, count, label_format in TREND_PERIODS:
+        starts = _bucket_starts(unit, count, today)
+        bucket = date_bucket(TestExecution.execution_date, unit)
+        counts = {
+            (start, status): total for start, status, total in db.session.query(
+                bucket, TestExecution.status, func.count(TestExecution.id)
+            ).filter(
+                TestExecution.execution_date >= datetime.combine(starts[0], datetime.min.time()),
+                TestExecution.status.in_(('Pass', 'Fail'))
+            ).group_by(bucket, TestExecution.status)
+        }
+        for (project_id, day, status), total in archived.items():
+            if project_id in projects and day >= starts[0]:
+                key = (_bucket_start(day, unit).isoformat(), status)
+                counts[key] = counts.get(key, 0) + total
+        keys = [start.isoformat() for start in starts]
+        trend[period] = {
+            'labels': [start.strftime(label_format) for start in starts],
+            'passed': [counts.get((key, 'Pass'), 0) for key in keys],
+            'failed': [counts.get((key, 'Fail'), 0) for key in keys],
+        }
+    return trend
+
+
+# MySQL partitioning
+
+def _is_mysql():
+    return db.engine.dialect.name == 'mysql'
+
+
+def partition_names():
+    """Partitions of test_execution in order; empty when not partitioned (or not MySQL)"""
+    if not _is_mysql():
+        return []
+    return [row[0] for row in db.session.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = DATABASE() "
+        "AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {'table': TABLE})]
+
+
+def _partition_count(partition):
+    return db.session.execute(text(f'SELECT COUNT(*) FROM {TABLE} PARTITION ({partition})')).scalar()
+
+
+def _only_archivable(partition, start, end):
+    """True when every row of a partition is an unpinned execution of the month [start, end)"""
+    pinned = select(_pinned_ids().subquery().c[0])
+    outside = select(TestExecution.id).with_hint(TestExecution, f'PARTITION ({partition})').where(
+        (TestExecution.execution_date.is_(None)) | (TestExecution.execution_date < start)
+        | (TestExecution.execution_date >= end) | TestExecution.id.in_(pinned)
+    ).limit(1)
+    return db.session.execute(outside).first() is None
+
+
+def _first_id_from(moment, after_id=0):
+    """Boundary for a month starting at moment: its first execution id (or the next id to be used)"""
+    first = db.session.execute(text(
+        f'SELECT MIN(id) FROM {TABLE} WHERE execution_date >= :moment AND id > :after_id'
+    ), {'moment': moment, 'after_id': after_id}).scalar()
+    if first is not None:
+        return first
+    return (db.session.execute(text(f'SELECT MAX(id) FROM {TABLE}')).scalar() or 0) + 1
+
+
+def _drop_foreign_keys():
+    """Partitioned InnoDB tables can neither have nor be the target of foreign keys"""
+    constraints = db.session.execute(text(
+        "SELECT DISTINCT TABLE_NAME, CONSTRAINT_NAME FROM information_schema.KEY_COLUMN_USAGE "
+        "WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL "
+        "AND (TABLE_NAME = :table OR REFERENCED_TABLE_NAME = :table)"
+    ), {'table': TABLE}).all()
+    for table, constraint in constraints:
+        db.session.execute(text(f'ALTER TABLE `{table}` DROP FOREIGN KEY `{constraint}`'))
+    return len(constraints)
+
+
+def partition_executions():
+    """Partition test_execution by month, or add partitions for months closed since
+
+    Returns the names of the partitions created. MySQL only.
+    """
+    if not _is_mysql():
+        raise RuntimeError('Partitioning is only supported on MySQL')
+    current_month = month_start(datetime.utcnow())
+    existing = partition_names()
+    created = []
+
+    if not existing:
+        dropped = _drop_foreign_keys()
+        oldest = db.session.execute(text(f'SELECT MIN(execution_date) FROM {TABLE}')).scalar()
+        definitions, boundary = [], 0
+        month = month_start(oldest) if oldest else current_month
+        while month < current_month:
+            boundary = max(boundary + 1, _first_id_from(next_month(month), boundary))
+            definitions.append(f'PARTITION p{month:%Y%m} VALUES LESS THAN ({boundary})')
+            created.append(f'p{month:%Y%m}')
+            month = next_month(month)
+        definitions.append(f'PARTITION {OPEN_PARTITION} VALUES LESS THAN MAXVALUE')
+        db.session.execute(text(f'ALTER TABLE {TABLE} PARTITION BY RANGE (id) ({", ".join(definitions)})'))
+        db.session.commit()
+        logger.info("Partitioned %s into %d partitions (dropped %d foreign keys)", TABLE, len(definitions), dropped)
+        return created + [OPEN_PARTITION]
+
+    # Split the open partition at the start of every month closed since the last run
+    closed = [name for name in existing if name != OPEN_PARTITION]
+    if closed:
+        last = datetime.strptime(closed[-1][1:], '%Y%m')
+        month = next_month(last)
+        boundary = db.session.execute(text(
+            "SELECT PARTITION_DESCRIPTION FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = DATABASE() "
+            "AND TABLE_NAME = :table AND PARTITION_NAME = :name"
+        ), {'table': TABLE, 'name': closed[-1]}).scalar()
+        boundary = int(boundary) - 1
+    else:
+        oldest = db.session.execute(text(f'SELECT MIN(execution_date) FROM {TABLE}')).scalar()
+        month, boundary = month_start(oldest) if oldest else current_month, 0
+    while month < current_month:
+        boundary = max(boundary + 1, _first_id_from(next_month(month), boundary))
+        db.session.execute(text(
+            f'ALTER TABLE {TABLE} REORGANIZE PARTITION {OPEN_PARTITION} INTO ('
+            f'PARTITION p{month:%Y%m} VALUES LESS THAN ({boundary}), '
+            f'PARTITION {OPEN_PARTITION} VALUES LESS THAN MAXVALUE)'
+        ))
+        created.append(f'p{month:%Y%m}')
+        month = next_month(month)
+    db.session.commit()
+    return created
@@ -0,0 +1,44 @@
+"""
+Extension instances shared by the app factory (app.py) and the route blueprints.
+"""
+from flask_login import LoginManager
+
+from notifications import NotificationDispatcher
+from live_events import LiveEventHub
+from attachments import AttachmentStore
+from images import ImageVariants
+from assets import AssetPipeline
+from compression import Compression
+from change_log import ChangeLog
+from webhooks import WebhookDispatcher
+from cloning import CloneJobs
+
+login_manager = LoginManager()
+notifier = NotificationDispatcher()
+live_events = LiveEventHub()
+attachment_store = AttachmentStore()
+image_variants = ImageVariants()
+assets = AssetPipeline()  # fingerprinted static files under /assets, cached for a year
+compression = Compression()  # gzip/brotli/zstd responses, minified HTML
+change_log = ChangeLog()  # append-only change feed for /api/changes
+webhooks = WebhookDispatcher()  # outbox and delivery workers for outbound webhooks
+clone_jobs = CloneJobs()  # background deep copies of projects and suite trees
+
+
+def push_unread_counts(user_ids):
+    for user_id in user_ids:
+        live_events.publish('notifications', {'unread_count': notifier.unread_count(user_id)}, user_id=user_id)
+
+
+def notify_clone_finished(job):
+    noun = 'Project' if job['kind'] == 'project' else 'Test suite'
+    if job['status'] == 'done':
+        notifier.publish('clone', f'{noun} copy ready', f"{noun} #{job['source_id']} was copied to #{job['target_id']}",
+                         recipient_ids=[job['created_by']], type='success')
+    else:
+        notifier.publish('clone', f'{noun} copy failed',
+                         f"Copying {noun.lower()} #{job['source_id']} failed: {job['error']}",
+                         recipient_ids=[job['created_by']], type='error')
+
+notifier.listeners.append(push_unread_counts)
+clone_jobs.listeners.append(notify_clone_finished)
@@ -0,0 +1,163 @@
+"""
+Gunicorn configuration, sized from the container's cgroup limits.
+
+Worker processes are sized from the CPU quota and the memory limit the
+container really has (cgroup v2 or v1), not from the host's CPU count, which
+inside a pod limited to 200m CPU would start one worker per host core. Every
+computed value can be pinned with an environment variable:
+
+    GUNICORN_WORKER_CLASS      gevent (default; gthread on SQLite) or gthread
+    GUNICORN_WORKERS           worker processes
+    GUNICORN_THREADS           threads per gthread worker
+    GUNICORN_WORKER_CONNECTIONS  concurrent connections per gevent worker
+    GUNICORN_WORKER_MEMORY_MB  expected resident size of one worker
+    GUNICORN_TIMEOUT, GUNICORN_MAX_REQUESTS, GUNICORN_MAX_REQUESTS_JITTER, GUNICORN_BIND
+
+gevent lets each worker hold thousands of idle live-update (SSE) streams;
+with gthread every open stream occupies one thread. gthread preloads the app
+in the master so workers share its memory; gevent cannot, because the app has
+to be imported after gevent has patched the worker. On SQLite the default is
+gthread: sqlite3 calls (and busy-timeout waits) are invisible to gevent and
+would stall every greenlet of the worker.
+"""
+import logging
+import math
+import os
+
+logger = logging.getLogger('gunicorn.error')
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+MASTER_MEMORY_MB = 64  # the arbiter (and with preload the shared app image)
+MEMORY_HEADROOM = 0.9  # fraction of the limit workers may plan to use
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit():
+    """CPUs granted by the cgroup CPU quota, or None without a quota"""
+    cpu_max = _read(os.path.join(CGROUP_ROOT, 'cpu.max'))  # v2: "<quota> <period>" or "max <period>"
+    if cpu_max:
+        quota, _, period = cpu_max.partition(' ')
+        if quota != 'max' and period:
+            return int(quota) / int(period)
+        return None
+    quota = _read(os.path.join(CGROUP_ROOT, 'cpu', 'cpu.cfs_quota_us'))  # v1: -1 means no quota
+    period = _read(os.path.join(CGROUP_ROOT, 'cpu', 'cpu.cfs_period_us'))
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def cgroup_memory_limit():
+    """Memory limit of the cgroup in bytes, or None when unlimited"""
+    limit = _read(os.path.join(CGROUP_ROOT, 'memory.max'))  # v2
+    if limit is None:
+        limit = _read(os.path.join(CGROUP_ROOT, 'memory', 'memory.limit_in_bytes'))  # v1
+    if not limit or limit == 'max':
+        return None
+    limit = int(limit)
+    # v1 reports "unlimited" as a huge page-aligned number
+    return limit if limit < 1 << 60 else None
+
+
+def available_cpus():
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_limit()
+    return min(cpus, quota) if quota else cpus
+
+
+def size_workers(worker_class, cpus, memory_limit, worker_memory_mb):
+    """Number of worker processes for the CPU and memory the container has"""
+    if worker_class == 'gevent':
+        # One event loop keeps a CPU busy; more processes would only contend for it
+        by_cpu = max(1, math.ceil(cpus))
+    else:
+        # Threads release the GIL while waiting on MySQL, so allow some oversubscription
+        by_cpu = int(cpus * 2) + 1
+    if memory_limit is None:
+        return by_cpu
+    usable_mb = memory_limit / (1024 * 1024) * MEMORY_HEADROOM - MASTER_MEMORY_MB
+    by_memory = max(1, int(usable_mb // worker_memory_mb))
+    return min(by_cpu, by_memory)
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+sqlite = os.environ.get('DATABASE_URL', '').startswith('sqlite')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread' if sqlite else 'gevent')
+cpu_limit = available_cpus()
+memory_limit = cgroup_memory_limit()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = _env_int('GUNICORN_WORKERS', size_workers(
+    worker_class, cpu_limit, memory_limit, _env_int('GUNICORN_WORKER_MEMORY_MB', 96)
+))
+if worker_class == 'gevent':
+    worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', 1000)
+    preload_app = False
+else:
+    threads = _env_int('GUNICORN_THREADS', 4)
+    preload_app = True
+timeout = _env_int('GUNICORN_TIMEOUT', 60)
+keepalive = 2
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+# Spread recycling out so the workers don't all restart (and go cold) together
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', max(1, max_requests // 10))
+
+
+def warm_up(app):
+    """Compile every template and load the asset manifest ahead of the first request"""
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+    app.extensions['assets'].manifest
+
+
+def on_starting(server):
+    memory = f'{memory_limit // (1024 * 1024)} MiB' if memory_limit else 'unlimited'
+    logger.info("Sizing for %.2f CPUs and %s memory: %d %s worker(s)%s", cpu_limit, memory, workers,
+                worker_class, f' x {threads} threads' if worker_class == 'gthread' else '')
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        # Compiled once in the master and shared with every forked worker
+        warm_up(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    from models import db
+    app = server.app.wsgi()
+    # Connections a preloaded app opened in the master must not be shared across
+    # processes; close=False leaves them to the master and gives this worker new pools
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    from sqlalchemy import text
+    from models import db
+    app = worker.wsgi
+    if not worker.cfg.preload_app:
+        warm_up(app)
+    # Open the first pooled connection now rather than during the first request
+    try:
+        with app.app_context():
+            with db.engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+    except Exception as e:
+        logger.warning("Worker %s could not open a database connection: %s", worker.pid, e)
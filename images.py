@@ -0,0 +1,190 @@
+"""
+Image variants for profile photos and screenshot attachments.
+
+Uploaded images are re-encoded off the request path into a few fixed sizes,
+as WebP plus a JPEG/PNG fallback for clients that don't accept WebP. The
+Pillow work runs in a process pool; a dispatcher thread feeds it and stores
+the results. Re-encoding drops EXIF/ICC/text metadata. Variants are keyed by
+the content hash of the original (variants/<sha256>/<variant>.<ext>) in the
+attachment storage backend, so identical uploads share them and they never
+need invalidating.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from attachments import digest_of
+
+logger = logging.getLogger(__name__)
+
+# name -> (max width, max height, crop to exactly that size)
+VARIANTS = {
+    'thumb': (64, 64, True),
+    'avatar': (160, 160, True),
+    'preview': (1280, 1280, False)
+}
+
+IMAGE_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'image/bmp'}
+MAX_IMAGE_PIXELS = 40_000_000  # refuse decompression bombs
+
+CONTENT_TYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg', 'png': 'image/png'}
+
+
+def is_image(content_type):
+    return (content_type or '').split(';')[0].strip().lower() in IMAGE_TYPES
+
+
+def variant_key(digest, variant, extension):
+    return f'variants/{digest}/{variant}.{extension}'
+
+
+def render_variants(source_path, output_dir):
+    """Write every variant of one image into output_dir (runs in a pool process)
+
+    Returns {'<variant>.<ext>': path}.
+    """
+    from PIL import Image, ImageOps  # imported in the pool process only
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    outputs = {}
+    with Image.open(source_path) as original:
+        original.seek(0)  # first frame of animated images
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        fallback = 'png' if has_alpha else 'jpg'
+
+        for name, (width, height, crop) in VARIANTS.items():
+            if crop:
+                variant = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            else:
+                variant = image.copy()
+                variant.thumbnail((width, height), Image.LANCZOS)
+
+            # Nothing from original.info is passed on, so metadata is stripped
+            path = os.path.join(output_dir, f'{name}.webp')
+            variant.save(path, 'WEBP', quality=80, method=4)
+            outputs[f'{name}.webp'] = path
+
+            path = os.path.join(output_dir, f'{name}.{fallback}')
+            if fallback == 'png':
+                variant.save(path, 'PNG', optimize=True)
+            else:
+                variant.save(path, 'JPEG', quality=85, optimize=True, progressive=True)
+            outputs[f'{name}.{fallback}'] = path
+    return outputs
+
+
+class ImageVariants:
+    """Flask extension that builds and serves image variants of stored blobs"""
+
+    def __init__(self, app=None, store=None):
+        self.app = None
+        self.store = None
+        self._pool = None
+        self._dispatcher = None
+        self._pending = set()
+        self._failed = set()  # undecodable images are not retried by this process
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, store)
+
+    def init_app(self, app, store):
+        app.config.setdefault('IMAGE_WORKERS', 2)  # pool processes; 0 renders in the dispatcher thread
+        app.config.setdefault('IMAGE_CACHE_MAX_AGE', 365 * 24 * 3600)
+        self.app = app
+        self.store = store
+        app.extensions['image_variants'] = self
+
+    # Processing
+
+    def _executors(self):
+        # Created lazily so each gunicorn worker process owns its pool after fork
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-dispatch')
+                workers = self.app.config['IMAGE_WORKERS']
+                if workers:
+                    self._pool = ProcessPoolExecutor(max_workers=workers)
+        return self._dispatcher, self._pool
+
+    def schedule(self, key, content_type):
+        """Queue variant generation for a stored image; returns immediately"""
+        if not is_image(content_type):
+            return False
+        digest = digest_of(key)
+        with self._lock:
+            if digest in self._pending or digest in self._failed:
+                return digest not in self._failed
+            self._pending.add(digest)
+        dispatcher, _ = self._executors()
+        dispatcher.submit(self._process, key)
+        return True
+
+    def _process(self, key):
+        digest = digest_of(key)
+        work_dir = tempfile.mkdtemp(prefix='variants-')
+        try:
+            backend = self.store.backend
+            if self.ready(digest, 'preview'):
+                return
+            if hasattr(backend, 'path'):
+                source_path = backend.path(key)
+            else:
+                source_path = os.path.join(work_dir, 'original')
+                backend.download(key, source_path)
+
+            _, pool = self._executors()
+            if pool:
+                outputs = pool.submit(render_variants, source_path, work_dir).result()
+            else:
+                outputs = render_variants(source_path, work_dir)
+
+            # 'preview' goes last: its presence marks the set as complete
+            for name in sorted(outputs, key=lambda name: name.startswith('preview')):
+                variant, extension = name.split('.')
+                backend.put_file(variant_key(digest, variant, extension), outputs[name], CONTENT_TYPES[extension])
+        except Exception:
+            logger.exception("Failed to render image variants of %s", digest)
+            with self._lock:
+                self._failed.add(digest)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            with self._lock:
+                self._pending.discard(digest)
+
+    def wait(self):
+        """Block until everything scheduled so far has been processed"""
+        dispatcher, _ = self._executors()
+        dispatcher.submit(lambda: None).result()
+
+    # Serving
+
+    def ready(self, digest, variant, extension='webp'):
+        return self.store.backend.exists(variant_key(digest, variant, extension))
+
+    def send(self, key, filename, content_type, variant, accept_webp):
+        """Serve a variant of a stored image, falling back to the original while it is being built"""
+        digest = digest_of(key)
+        if variant in VARIANTS and is_image(content_type):
+            extensions = ['webp'] if accept_webp else ['jpg', 'png']
+            for extension in extensions:
+                candidate = variant_key(digest, variant, extension)
+                if self.store.backend.exists(candidate):
+                    base_name = os.path.splitext(filename)[0]
+                    response = self.store.send(
+                        candidate, f'{base_name}-{variant}.{extension}', CONTENT_TYPES[extension],
+                        as_attachment=False, etag=f'{digest}-{variant}-{extension}',
+                        max_age=self.app.config['IMAGE_CACHE_MAX_AGE'], immutable=True
+                    )
+                    # The same URL serves WebP or the fallback depending on Accept
+                    response.headers['Vary'] = 'Accept'
+                    return response
+            # Not built yet (or uploaded before variants existed): build it for next time
+            self.schedule(key, content_type)
+        response = self.store.send(key, filename, content_type, as_attachment=False, max_age=60)
+        response.headers['Vary'] = 'Accept'
+        return response
@@ -2,20 +2,25 @@
 """
 Database initialization script for Test Management Tool
 """
+import logging
+import os
+import sys
 
-from app import app, db
+from startup import DEFAULT_DATABASE_URL, SCHEMA_VERSION, migrate, startup_app
 
 def init_database():
-    """Initialize database tables"""
+    """Create missing tables and backfill derived ones if the schema version changed"""
     try:
-        with app.app_context():
-            # Create all tables
-            db.create_all()
-            print("✅ Database tables created successfully!")
-            return True
+        app = startup_app(os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL))
+        if migrate(app):
+            print(f"✅ Database schema updated to version {SCHEMA_VERSION}")
+        else:
+            print(f"✅ Database schema version {SCHEMA_VERSION} is current")
+        return True
     except Exception as e:
         print(f"❌ Error creating database tables: {e}")
         return False
 
 if __name__ == '__main__':
-    init_database()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sys.exit(0 if init_database() else 1)
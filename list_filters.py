@@ -0,0 +1,283 @@
+"""
+Server-side filtering, sorting, paging and facet counts for the list pages.
+
+A Listing describes one list: its facets (columns filtered by equality, the
+selected values of one facet OR-ed together), an optional date range column
+and the columns it sorts on. ListQuery reads the query string, e.g.
+
+    /test-executions?status=Fail&status=Blocked&environment=Staging&from=2026-01-01&sort=-date&page=2
+
+into predicates the indexes in models.py serve: IN lists on the facet columns
+and half-open ranges on the raw datetime column, never a function of it. An
+empty value (?environment=) selects rows where the column is empty.
+
+Facet counts come from one GROUP BY over all facet columns with the date range
+in WHERE. Each facet's counts apply the other facets' selections but not its
+own, so a selected status still shows what the other statuses would give; the
+total of the filtered list falls out of the same grouped rows.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import cached_property
+from math import ceil
+
+from flask import request, url_for
+from sqlalchemy import case, func, or_, select
+
+from models import db, Bug, TestCase, TestExecution, User
+
+LIST_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+EMPTY = ''  # query-string value of "no value" (NULL or empty string)
+PRIORITY_ORDER = {'Critical': 0, 'High': 1, 'Medium': 2, 'Low': 3}
+
+
+class Facet:
+    """A column a list is filtered and counted by"""
+
+    def __init__(self, name, column, title, empty_label='None', users=False):
+        self.name = name
+        self.column = column
+        self.title = title
+        self.empty_label = empty_label
+        self.users = users  # values are user ids, labelled with usernames
+
+    def parse(self, values):
+        """Query-string values as column values; values the column can't hold are dropped"""
+        python_type = self.column.type.python_type
+        parsed = set()
+        for value in values:
+            if value == EMPTY:
+                parsed.add(None)
+                continue
+            try:
+                parsed.add(python_type(value))
+            except ValueError:
+                pass
+        return parsed
+
+    def predicate(self, values):
+        clauses = []
+        present = [value for value in values if value is not None]
+        if present:
+            clauses.append(self.column.in_(present))
+        if None in values:
+            clauses.append(self.column.is_(None))
+            if self.column.type.python_type is str:
+                clauses.append(self.column == EMPTY)
+        return or_(*clauses)
+
+
+class Listing:
+    """Facets, date range and sort keys of one list page"""
+
+    def __init__(self, model, facets, sorts, default_sort, date_column=None):
+        self.model = model
+        self.facets = facets
+        self.sorts = sorts
+        self.default_sort = default_sort
+        self.date_column = date_column
+
+    def query(self, args=None, criteria=()):
+        """ListQuery for a query string (the current request's by default) within criteria"""
+        return ListQuery(self, request.args if args is None else args, criteria)
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+
+def _key(value):
+    return None if value == EMPTY else value
+
+
+class ListQuery:
+    """One request's filters, sort, page and facet counts over a Listing"""
+
+    def __init__(self, listing, args, criteria=()):
+        self.listing = listing
+        self.base_criteria = list(criteria)
+        self.raw = {facet.name: args.getlist(facet.name) for facet in listing.facets}
+        self.selected = {facet.name: facet.parse(self.raw[facet.name]) for facet in listing.facets}
+        self.date_from = _parse_date(args.get('from')) if listing.date_column is not None else None
+        self.date_to = _parse_date(args.get('to')) if listing.date_column is not None else None
+        sort = args.get('sort') or listing.default_sort
+        self.sort = sort if sort.lstrip('-') in listing.sorts else listing.default_sort
+        self.per_page = min(max(args.get('per_page', LIST_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+        self.page = max(args.get('page', 1, type=int), 1)
+
+    @property
+    def facets(self):
+        return self._counts[0]
+
+    @property
+    def total(self):
+        return self._counts[1]
+
+    @property
+    def active(self):
+        return any(self.raw.values()) or self.date_from is not None or self.date_to is not None
+
+    def _range_criteria(self):
+        criteria = list(self.base_criteria)
+        column = self.listing.date_column
+        if self.date_from is not None:
+            criteria.append(column >= self.date_from)
+        if self.date_to is not None:
+            criteria.append(column < self.date_to + timedelta(days=1))  # 'to' is inclusive
+        return criteria
+
+    def criteria(self):
+        """WHERE clauses of the filtered list"""
+        criteria = self._range_criteria()
+        for facet in self.listing.facets:
+            if self.selected[facet.name]:
+                criteria.append(facet.predicate(self.selected[facet.name]))
+        return criteria
+
+    def order_by(self):
+        column, primary_key = self.listing.sorts[self.sort.lstrip('-')], self.listing.model.id
+        if self.sort.startswith('-'):
+            return [column.desc(), primary_key.desc()]
+        return [column.asc(), primary_key.asc()]
+
+    @cached_property
+    def _counts(self):
+        """(facet counts, total of the filtered list), grouped once when first needed"""
+        facets = self.listing.facets
+        columns = [facet.column for facet in facets]
+        statement = select(*columns, func.count()).where(*self._range_criteria()).group_by(*columns)
+        combos = [(tuple(_key(value) for value in row[:-1]), row[-1]) for row in db.session.execute(statement)]
+
+        def matches(values, skip=None):
+            return all(not self.selected[facet.name] or values[i] in self.selected[facet.name]
+                       for i, facet in enumerate(facets) if i != skip)
+
+        counts = []
+        for i, facet in enumerate(facets):
+            counter = Counter()
+            for values, count in combos:
+                if matches(values, skip=i):
+                    counter[values[i]] += count
+            for value in self.selected[facet.name]:
+                counter.setdefault(value, 0)  # keep selected values visible to unselect them
+            counts.append((facet, counter))
+        total = sum(count for values, count in combos if matches(values))
+        return [self._facet_values(facet, counter) for facet, counter in counts], total
+
+    def _facet_values(self, facet, counter):
+        labels = {}
+        if facet.users:
+            ids = [value for value in counter if value is not None]
+            labels = dict(db.session.query(User.id, User.username).filter(User.id.in_(ids))) if ids else {}
+        values = []
+        for value, count in sorted(counter.items(), key=lambda item: (-item[1], str(item[0]))):
+            raw = EMPTY if value is None else str(value)
+            label = facet.empty_label if value is None else labels.get(value, str(value))
+            values.append({'value': raw, 'label': label, 'count': count,
+                           'selected': raw in self.raw[facet.name]})
+        return {'name': facet.name, 'title': facet.title, 'values': values}
+
+    # Paging, as Flask-SQLAlchemy's Pagination names it
+
+    @property
+    def offset(self):
+        return (self.page - 1) * self.per_page
+
+    @property
+    def pages(self):
+        return max(ceil(self.total / self.per_page), 1)
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+    def args(self, **changes):
+        """Query-string arguments of this list, with changes applied (None drops one)"""
+        args = {name: values for name, values in self.raw.items() if values}
+        if self.date_from is not None:
+            args['from'] = self.date_from.strftime('%Y-%m-%d')
+        if self.date_to is not None:
+            args['to'] = self.date_to.strftime('%Y-%m-%d')
+        if self.sort != self.listing.default_sort:
+            args['sort'] = self.sort
+        if self.per_page != LIST_PAGE_SIZE:
+            args['per_page'] = self.per_page
+        if self.page > 1:
+            args['page'] = self.page
+        args.update(changes)
+        return {name: value for name, value in args.items() if value is not None}
+
+    def url(self, **changes):
+        """URL of the current page with changes, e.g. filters.url(page=2)"""
+        return url_for(request.endpoint, **(request.view_args or {}), **self.args(**changes))
+
+    def to_dict(self):
+        return {
+            'total': self.total,
+            'page': self.page,
+            'pages': self.pages,
+            'per_page': self.per_page,
+            'sort': self.sort,
+            'facets': self.facets,
+        }
+
+
+def _rank(column, order):
+    return case(order, value=column, else_=len(order))
+
+
+EXECUTION_LISTING = Listing(
+    TestExecution,
+    facets=[
+        Facet('status', TestExecution.status, 'Status'),
+        Facet('environment', TestExecution.environment, 'Environment', empty_label='Not specified'),
+        Facet('executed_by', TestExecution.executed_by, 'Executed by', empty_label='Unknown', users=True),
+    ],
+    sorts={'date': TestExecution.execution_date, 'id': TestExecution.id, 'status': TestExecution.status,
+           'environment': TestExecution.environment},
+    default_sort='-date',
+    date_column=TestExecution.execution_date,
+)
+
+TEST_CASE_LISTING = Listing(
+    TestCase,
+    facets=[
+        Facet('status', TestCase.status, 'Status'),
+        Facet('priority', TestCase.priority, 'Priority'),
+        Facet('type', TestCase.type, 'Type'),
+        Facet('assigned_to', TestCase.assigned_to, 'Assignee', empty_label='Unassigned', users=True),
+    ],
+    sorts={'id': TestCase.id, 'title': TestCase.title, 'priority': _rank(TestCase.priority, PRIORITY_ORDER),
+           'status': TestCase.status, 'created': TestCase.created_at},
+    default_sort='id',
+)
+
+BUG_LISTING = Listing(
+    Bug,
+    facets=[
+        Facet('status', Bug.status, 'Status'),
+        Facet('severity', Bug.severity, 'Severity'),
+        Facet('priority', Bug.priority, 'Priority'),
+        Facet('assigned_to', Bug.assigned_to, 'Assignee', empty_label='Unassigned', users=True),
+        Facet('environment', Bug.environment, 'Environment', empty_label='Not specified'),
+    ],
+    sorts={'id': Bug.id, 'title': Bug.title, 'severity': _rank(Bug.severity, PRIORITY_ORDER),
+           'priority': _rank(Bug.priority, PRIORITY_ORDER), 'status': Bug.status, 'created': Bug.created_at},
+    default_sort='id',
+)
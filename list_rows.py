@@ -0,0 +1,82 @@
+"""
+Read-only rows for the list pages.
+
+List templates show a handful of short columns per record. Loading ORM
+objects for them reads every TEXT column (a test case has six), builds
+identity-map state per row and keeps all of it alive until the request ends.
+These queries select only what each page shows, through Core, into
+namedtuples: one tuple per row and nothing for the session to track. Long
+text a list only previews is cut down in SQL, so the blob never leaves the
+database.
+
+Rows are for display; edits still load the object by id. The paged lists
+take their criteria, order and page from list_filters.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from sqlalchemy import func, select
+
+from case_state import ALL_ENVIRONMENTS
+from models import db, Bug, Requirement, TestCase, TestCaseState, TestExecution
+
+PREVIEW_LENGTH = 100  # characters of a description shown in a list
+
+CASE_COLUMNS = (TestCase.id, TestCase.title, TestCase.type, TestCase.priority, TestCase.status,
+                TestCase.created_at)
+CASE_STATE_COLUMNS = (TestCaseState.status.label('last_status'),
+                      TestCaseState.executed_at.label('last_executed_at'),
+                      TestCaseState.build_version.label('last_build_version'))
+EXECUTION_COLUMNS = (TestExecution.id, TestExecution.test_case_id, TestExecution.executed_by, TestExecution.status,
+                     TestExecution.execution_date, TestExecution.environment, TestExecution.execution_time)
+BUG_COLUMNS = (Bug.id, Bug.title, Bug.severity, Bug.priority, Bug.status, Bug.type, Bug.test_case_id,
+               Bug.created_at)
+REQUIREMENT_COLUMNS = (Requirement.id, Requirement.title, Requirement.type, Requirement.priority,
+                       Requirement.status, Requirement.project_id, Requirement.created_at)
+
+
+@lru_cache(maxsize=None)
+def row_type(name, fields):
+    return namedtuple(name, fields)
+
+
+def rows(name, statement):
+    """Execute statement and return its rows as namedtuples called name"""
+    result = db.session.execute(statement)
+    make = row_type(name, tuple(result.keys()))._make
+    return [make(row) for row in result]
+
+
+def preview(column, length=PREVIEW_LENGTH):
+    """The first length characters of a text column, plus one so templates can tell it was cut"""
+    return func.substr(column, 1, length + 1).label(column.key)
+
+
+def _page(statement, order_by, limit, offset):
+    return statement.order_by(*order_by).limit(limit).offset(offset)
+
+
+def test_case_rows(*criteria, with_state=False, with_preview=False, order_by=(TestCase.id,), limit=None, offset=None):
+    """Test cases matching criteria, with their latest result across environments if with_state"""
+    columns = CASE_COLUMNS + ((preview(TestCase.description),) if with_preview else ())
+    statement = select(*columns)
+    if with_state:
+        statement = statement.add_columns(*CASE_STATE_COLUMNS).outerjoin(
+            TestCaseState, db.and_(TestCaseState.test_case_id == TestCase.id,
+                                   TestCaseState.environment == ALL_ENVIRONMENTS)
+        )
+    return rows('TestCaseRow', _page(statement.where(*criteria), order_by, limit, offset))
+
+
+def execution_rows(*criteria, order_by=(TestExecution.execution_date.desc(),), limit=None, offset=None):
+    """Executions matching criteria, newest first by default"""
+    statement = select(*EXECUTION_COLUMNS).where(*criteria)
+    return rows('TestExecutionRow', _page(statement, order_by, limit, offset))
+
+
+def bug_rows(*criteria, order_by=(Bug.id,), limit=None, offset=None):
+    return rows('BugRow', _page(select(*BUG_COLUMNS).where(*criteria), order_by, limit, offset))
+
+
+def requirement_rows(*criteria, order_by=(Requirement.id,), limit=None, offset=None):
+    return rows('RequirementRow', _page(select(*REQUIREMENT_COLUMNS).where(*criteria), order_by, limit, offset))
@@ -0,0 +1,269 @@
+"""
+Live updates over Server-Sent Events.
+
+Routes publish small JSON events (new executions, bug status changes,
+session and unread-count updates). Each process fans them out to its
+connected SSE streams through an in-process hub. With the 'db' broker every
+event is also written to the live_event relay table, which a poller thread in
+each process tails, so streams connected to other gunicorn workers or pods
+receive it too. The 'local' broker skips the relay and suits a single process.
+
+Relay ids are allocated before the insert commits, so a row can become
+visible after a higher id was already read. The poller remembers the ids it
+skipped over and keeps re-reading them for GAP_TIMEOUT seconds; most gaps
+are inserts that rolled back, but a late commit is still delivered.
+"""
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, delete, func
+
+from models import db, LiveEvent
+from database import after_request_transaction
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+HEARTBEAT_INTERVAL = 15  # seconds; keeps proxies from closing idle streams
+RECONNECT_DELAY_MS = 5000
+REPLAY_LIMIT = 200
+POLL_BATCH_SIZE = 500
+PRUNE_INTERVAL = 60  # seconds
+GAP_TIMEOUT = 30  # seconds an id skipped by the relay is re-read in case its insert commits late
+MAX_PENDING_GAPS = 1000
+
+LiveMessage = namedtuple('LiveMessage', ['id', 'type', 'user_id', 'data'])
+
+
+def format_event(message):
+    """Encode a message as one SSE frame"""
+    lines = []
+    if message.id is not None:
+        lines.append(f'id: {message.id}')
+    lines.append(f'event: {message.type}')
+    lines.append('data: ' + json.dumps(message.data, default=str))
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    """One connected stream's bounded inbox"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def wants(self, message):
+        return message.user_id is None or message.user_id == self.user_id
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LiveEventHub:
+    """Flask extension: in-process pub/sub with an optional database relay"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._local_ids = itertools.count(1)
+        self._own_ids = set()
+        self._poller = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LIVE_EVENTS_BROKER', 'local')  # local or db
+        app.config.setdefault('LIVE_EVENTS_POLL_INTERVAL', 1.0)  # seconds
+        app.config.setdefault('LIVE_EVENTS_RETENTION', 300)  # seconds relay rows are kept for replay
+        self.app = app
+        app.extensions['live_events'] = self
+
+    @property
+    def relayed(self):
+        return self.app.config['LIVE_EVENTS_BROKER'] == 'db'
+
+    # Subscribers
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        if self.relayed:
+            self._ensure_poller()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    # Publishing
+
+    def publish(self, type, data, user_id=None):
+        """Send an event to every stream (or only the streams of user_id)"""
+        if self.relayed:
+            # The relay row is written on its own connection, after the request's transaction
+            after_request_transaction(lambda: self._publish(type, data, user_id))
+        else:
+            self._publish(type, data, user_id)
+
+    def _publish(self, type, data, user_id):
+        try:
+            if self.relayed:
+                with db.engine.begin() as connection:
+                    result = connection.execute(insert(LiveEvent).values(
+                        type=type, user_id=user_id, payload=json.dumps(data, default=str),
+                        created_at=datetime.utcnow()
+                    ))
+                event_id = result.inserted_primary_key[0]
+                # Delivered locally right away; the poller skips it
+                with self._lock:
+                    self._own_ids.add(event_id)
+            else:
+                event_id = next(self._local_ids)
+            self.dispatch(LiveMessage(event_id, type, user_id, data))
+        except Exception:
+            # Live updates are best effort and must never fail the request
+            logger.exception("Failed to publish live event %s", type)
+
+    def dispatch(self, message):
+        """Hand a message to the matching streams of this process"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if not subscription.wants(message):
+                continue
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                # A stalled client; its stream closes and it reconnects with Last-Event-ID
+                subscription.overflowed = True
+
+    def replay(self, user_id, last_event_id):
+        """Relayed events a reconnecting stream missed since last_event_id"""
+        if not self.relayed or last_event_id is None:
+            return []
+        with db.engine.connect() as connection:
+            rows = connection.execute(select(
+                LiveEvent.id, LiveEvent.type, LiveEvent.user_id, LiveEvent.payload
+            ).where(
+                LiveEvent.id > last_event_id,
+                db.or_(LiveEvent.user_id.is_(None), LiveEvent.user_id == user_id)
+            ).order_by(LiveEvent.id).limit(REPLAY_LIMIT)).all()
+        return [LiveMessage(row.id, row.type, row.user_id, json.loads(row.payload)) for row in rows]
+
+    # Database relay
+
+    def _ensure_poller(self):
+        # Started lazily so each gunicorn worker process gets its own thread after fork
+        if self._poller and self._poller.is_alive():
+            return
+        with self._lock:
+            if not (self._poller and self._poller.is_alive()):
+                self._poller = threading.Thread(target=self._poll, name='live-event-relay', daemon=True)
+                self._poller.start()
+
+    def _poll(self):
+        interval = self.app.config['LIVE_EVENTS_POLL_INTERVAL']
+        retention = self.app.config['LIVE_EVENTS_RETENTION']
+        with self.app.app_context():
+            with db.engine.connect() as connection:
+                last_id = connection.execute(select(func.max(LiveEvent.id))).scalar() or 0
+            last_prune = 0
+            pending = {}  # skipped id -> monotonic deadline
+            while True:
+                time.sleep(interval)
+                try:
+                    now = time.monotonic()
+                    pending = {event_id: deadline for event_id, deadline in pending.items() if deadline > now}
+                    condition = LiveEvent.id > last_id
+                    if pending:
+                        condition = db.or_(condition, LiveEvent.id.in_(list(pending)))
+                    with db.engine.connect() as connection:
+                        rows = connection.execute(select(
+                            LiveEvent.id, LiveEvent.type, LiveEvent.user_id, LiveEvent.payload
+                        ).where(condition).order_by(LiveEvent.id).limit(POLL_BATCH_SIZE)).all()
+                    for row in rows:
+                        if row.id > last_id:
+                            for skipped in range(last_id + 1, min(row.id, last_id + 1 + MAX_PENDING_GAPS)):
+                                if len(pending) >= MAX_PENDING_GAPS:
+                                    break
+                                pending[skipped] = now + GAP_TIMEOUT
+                            last_id = row.id
+                        else:
+                            pending.pop(row.id, None)
+                        with self._lock:
+                            own = row.id in self._own_ids
+                            self._own_ids.discard(row.id)
+                        if not own:
+                            self.dispatch(LiveMessage(row.id, row.type, row.user_id, json.loads(row.payload)))
+
+                    if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                        last_prune = time.monotonic()
+                        with db.engine.begin() as connection:
+                            connection.execute(delete(LiveEvent).where(
+                                LiveEvent.created_at < datetime.utcnow() - timedelta(seconds=retention)
+                            ))
+                except Exception:
+                    logger.exception("Live event relay poll failed")
+
+    # Streaming
+
+    def stream(self, subscription, session_remaining=None, warning_seconds=300, replay=()):
+        """Generator of SSE frames for one connection
+
+        session_remaining (seconds) drives 'session' events: one warning
+        before the session times out and one when it has expired, after which
+        the stream ends. A 'session' event addressed to the user (e.g. after
+        the session was extended) moves the deadline.
+        """
+        expires_at = time.monotonic() + session_remaining if session_remaining is not None else None
+        warned = False
+        try:
+            yield f'retry: {RECONNECT_DELAY_MS}\n\n'
+            for message in replay:
+                yield format_event(message)
+
+            while True:
+                timeout = HEARTBEAT_INTERVAL
+                if expires_at is not None:
+                    remaining = expires_at - time.monotonic()
+                    if remaining <= 0:
+                        yield format_event(LiveMessage(None, 'session', subscription.user_id, {
+                            'state': 'expired', 'time_remaining_seconds': 0
+                        }))
+                        return
+                    if not warned and remaining <= warning_seconds:
+                        warned = True
+                        yield format_event(LiveMessage(None, 'session', subscription.user_id, {
+                            'state': 'warning', 'time_remaining_seconds': int(remaining)
+                        }))
+                    next_check = remaining if warned else remaining - warning_seconds
+                    timeout = max(0.1, min(timeout, next_check))
+
+                message = subscription.get(timeout)
+                if subscription.overflowed:
+                    return
+                if message is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                if message.type == 'session' and 'time_remaining_seconds' in message.data:
+                    expires_at = time.monotonic() + message.data['time_remaining_seconds']
+                    warned = False
+                yield format_event(message)
+        finally:
+            self.unsubscribe(subscription)
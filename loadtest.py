@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Load test: concurrent users walking the tester's day, with latency baselines.
+
+Every virtual user repeats one journey with a fresh session: log in, open the
+dashboard, list test cases, execute one, file a bug, view the reports and the
+execution history. Each request is timed on its own (redirects are not
+followed), and the run reports p50/p95/p99 latency and throughput per route.
+
+Targets:
+    --url http://localhost:5000   a running stack (docker compose, k8s port-forward)
+    --sqlite                      a throwaway app on a seeded SQLite file,
+                                  served by a separate process on --port
+
+A run can be stored as the baseline (--save-baseline) and later runs compared
+against it; a route whose p95 grew by more than --tolerance (and by more than
+--min-delta ms) counts as a regression and the exit status is 1, so the check
+can gate a deploy. Baselines only compare like with like: record them on the
+machine and target the check runs on.
+
+    python loadtest.py --sqlite --users 4 --duration 30 --save-baseline
+    python loadtest.py --sqlite --users 4 --duration 30
+    python loadtest.py --url http://localhost:5000 --username admin --password admin123
+"""
+import argparse
+import gzip
+import http.cookiejar
+import json
+import math
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loadtest_baseline.json')
+SEED_PASSWORD = 'loadtest'
+CASE_LINK = re.compile(r'/test-cases/(\d+)/execute')
+
+SERVER = r'''
+import logging
+import sys
+from werkzeug.serving import make_server
+logging.getLogger('werkzeug').setLevel(logging.WARNING)
+import loadtest
+from app import app
+loadtest.seed(app, cases=int(sys.argv[2]))
+make_server('127.0.0.1', int(sys.argv[1]), app, threaded=True).serve_forever()
+'''
+
+
+# SQLite target
+
+def seed(app, cases=300, executions_per_case=10, bugs=100):
+    """Create the schema and a loadtest user, projects, test cases, executions and bugs"""
+    from werkzeug.security import generate_password_hash
+    from models import db, User, Project, TestSuite, TestCase, TestExecution, Bug
+    from case_state import ensure_state
+    from suite_tree import ensure_closure
+
+    rng = random.Random(42)
+    with app.app_context():
+        db.create_all()
+        user = User(username='loadtest', email='loadtest@example.com', role='admin',
+                    password_hash=generate_password_hash(SEED_PASSWORD))
+        db.session.add(user)
+        db.session.flush()
+
+        projects = [Project(name=f'Load project {n}', created_by=user.id) for n in range(2)]
+        db.session.add_all(projects)
+        db.session.flush()
+        suites = [TestSuite(name=f'Suite {n}', project_id=projects[n % 2].id) for n in range(6)]
+        db.session.add_all(suites)
+        db.session.flush()
+
+        test_cases = []
+        for n in range(cases):
+            suite = suites[n % len(suites)]
+            test_cases.append(TestCase(
+                title=f'Load case {n}', description='Generated by loadtest.py', test_steps='1. Step',
+                expected_result='Works', priority=rng.choice(['Low', 'Medium', 'High', 'Critical']),
+                project_id=suite.project_id, suite_id=suite.id, test_suite_id=suite.id,
+                created_by=user.id, assigned_to=user.id
+            ))
+        db.session.add_all(test_cases)
+        db.session.flush()
+
+        db.session.add_all([
+            TestExecution(test_case_id=case.id, executed_by=user.id,
+                          status=rng.choices(['Pass', 'Fail', 'Blocked'], [80, 15, 5])[0],
+                          environment=rng.choice(['Chrome', 'Firefox', 'Safari']))
+            for case in test_cases for _ in range(executions_per_case)
+        ])
+        db.session.add_all([
+            Bug(title=f'Load bug {n}', description='Generated by loadtest.py', severity='Medium',
+                priority='Medium', status='Open', test_case_id=rng.choice(test_cases).id, reported_by=user.id)
+            for n in range(bugs)
+        ])
+        db.session.commit()
+        ensure_closure()
+        ensure_state()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_sqlite_server(port, cases):
+    """Seed a temporary SQLite database and serve the app from a child process"""
+    directory = tempfile.mkdtemp(prefix='loadtest-')
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': 'sqlite:///' + os.path.join(directory, 'loadtest.db'),
+        'ATTACHMENT_ROOT': os.path.join(directory, 'attachments'),
+        'NOTIFICATION_EMAIL_BACKEND': 'memory',
+    })
+    process = subprocess.Popen([sys.executable, '-c', SERVER, str(port), str(cases)], env=env,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('the load test server exited during start-up')
+        try:
+            urllib.request.urlopen(base_url + '/healthz', timeout=1).close()
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('the load test server did not start within 60s')
+
+
+# Client
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None  # every request is timed on its own
+
+
+class Session:
+    """One virtual user's cookie jar, timing every request into recorder"""
+
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect
+        )
+
+    def request(self, route, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, headers={'Accept-Encoding': 'gzip'})
+        started = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                status, content, encoding = response.status, response.read(), response.headers.get('Content-Encoding')
+        except urllib.error.HTTPError as e:
+            status, content, encoding = e.code, e.read(), e.headers.get('Content-Encoding')
+        except OSError:
+            status, content, encoding = None, b'', None
+        self.recorder.record(route, (time.perf_counter() - started) * 1000, status is not None and status < 400)
+        if encoding == 'gzip':
+            content = gzip.decompress(content)
+        return status, content.decode('utf-8', 'replace')
+
+
+def journey(session, username, password, rng):
+    """login -> dashboard -> list cases -> execute a case -> file a bug -> reports -> history"""
+    session.request('POST /login', '/login', {'username': username, 'password': password})
+    session.request('GET /dashboard', '/dashboard')
+    _, page = session.request('GET /test-cases', '/test-cases')
+    case_ids = CASE_LINK.findall(page)
+    if not case_ids:
+        return
+    case_id = rng.choice(case_ids)
+    session.request('GET /test-cases/<id>/execute', f'/test-cases/{case_id}/execute')
+    session.request('POST /test-cases/<id>/execute', f'/test-cases/{case_id}/execute', {
+        'status': 'Fail', 'actual_result': 'Recorded by loadtest.py', 'comments': '', 'environment': 'Chrome'
+    })
+    session.request('GET /bugs/create', '/bugs/create')
+    session.request('POST /bugs/create', '/bugs/create', {
+        'title': f'Load test failure in case {case_id}', 'description': 'Recorded by loadtest.py',
+        'severity': 'Medium', 'priority': 'Medium', 'test_case_id': case_id
+    })
+    session.request('GET /reports', '/reports')
+    session.request('GET /test-executions', '/test-executions')
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, route, milliseconds, ok):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(milliseconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an unsorted list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def check_login(base_url, username, password):
+    """Fail early when the credentials don't work (every journey would measure redirects)"""
+    status, _ = Session(base_url, Recorder()).request('POST /login', '/login',
+                                                     {'username': username, 'password': password})
+    if status != 302:
+        raise SystemExit(f'Logging in to {base_url} as {username} failed (HTTP {status})')
+
+
+def run(base_url, users, duration, username, password):
+    """Run the journeys for duration seconds; returns {route: stats}"""
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    def user(number):
+        rng = random.Random(number)
+        while time.monotonic() < deadline:
+            journey(Session(base_url, recorder), username, password, rng)
+
+    threads = [threading.Thread(target=user, args=(n,), daemon=True) for n in range(users)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    results = {}
+    for route, values in sorted(recorder.latencies.items()):
+        results[route] = {
+            'requests': len(values),
+            'errors': recorder.errors.get(route, 0),
+            'rps': round(len(values) / elapsed, 2),
+            'p50': round(statistics.median(values), 1),
+            'p95': round(percentile(values, 95), 1),
+            'p99': round(percentile(values, 99), 1),
+        }
+    return results
+
+
+# Reporting
+
+def print_results(results, baseline=None):
+    print(f'{"route":<34}{"reqs":>7}{"err":>5}{"req/s":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+          + (f'{"base p95":>10}' if baseline else ''))
+    for route, stats in results.items():
+        line = (f'{route:<34}{stats["requests"]:>7}{stats["errors"]:>5}{stats["rps"]:>8.1f}'
+                f'{stats["p50"]:>9.1f}{stats["p95"]:>9.1f}{stats["p99"]:>9.1f}')
+        if baseline and route in baseline:
+            line += f'{baseline[route]["p95"]:>10.1f}'
+        print(line)
+
+
+def regressions(results, baseline, tolerance, min_delta):
+    """Routes whose p95 grew beyond tolerance, or that started failing"""
+    found = []
+    for route, stats in results.items():
+        before = baseline.get(route)
+        if before is None:
+            continue
+        grown = stats['p95'] - before['p95']
+        if grown > min_delta and stats['p95'] > before['p95'] * (1 + tolerance):
+            found.append(f'{route}: p95 {before["p95"]:.1f} -> {stats["p95"]:.1f} ms')
+        if stats['errors'] and not before.get('errors'):
+            found.append(f'{route}: {stats["errors"]} failed requests')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='base URL of a running stack')
+    target.add_argument('--sqlite', action='store_true', help='serve a seeded SQLite app for the run')
+    parser.add_argument('--port', type=int, help='port for --sqlite (default: a free one)')
+    parser.add_argument('--cases', type=int, default=300, help='test cases seeded for --sqlite')
+    parser.add_argument('--username', default='loadtest')
+    parser.add_argument('--password', default=SEED_PASSWORD)
+    parser.add_argument('--users', type=int, default=4, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load after warm-up')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds of unrecorded load first')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth (0.25 = 25%%)')
+    parser.add_argument('--min-delta', type=float, default=5.0, help='ignore p95 growth below this many ms')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url.rstrip('/') if args.url else None
+    if args.sqlite:
+        server, base_url = start_sqlite_server(args.port or free_port(), args.cases)
+    try:
+        check_login(base_url, args.username, args.password)
+        if args.warmup:
+            run(base_url, args.users, args.warmup, args.username, args.password)
+        results = run(base_url, args.users, args.duration, args.username, args.password)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'users': args.users, 'routes': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print_results(results)
+        print(f'\nBaseline saved to {args.baseline}')
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored.get('users') == args.users:
+            baseline = stored['routes']
+        else:
+            print(f'Baseline was recorded with {stored.get("users")} users; not comparing')
+    print_results(results, baseline)
+    if not baseline:
+        return 0
+    found = regressions(results, baseline, args.tolerance, args.min_delta)
+    if found:
+        print('\nRegressions against the baseline:')
+        for line in found:
+            print('  ' + line)
+        return 1
+    print('\nNo regressions against the baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
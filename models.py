@@ -67,6 +67,16 @@ class TestSuite(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     parent_suite_id = db.Column(db.Integer, db.ForeignKey('test_suite.id'))
 
+class TestSuiteClosure(db.Model):
+    # One row per (ancestor, descendant) pair, including (suite, suite) at depth 0
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('test_suite.id'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('test_suite.id'), primary_key=True, index=True)
+    depth = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_test_suite_closure_ancestor_depth', 'ancestor_id', 'depth'),
+    )
+
 class Requirement(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -101,6 +111,12 @@ class TestCase(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     estimated_time = db.Column(db.Integer)  # in minutes
 
+    __table_args__ = (
+        # Filters and facet counts of the test case list (list_filters.py)
+        db.Index('ix_test_case_facets', 'status', 'priority', 'type', 'assigned_to'),
+        db.Index('ix_test_case_priority', 'priority'),
+    )
+
 class TestExecution(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     test_case_id = db.Column(db.Integer, db.ForeignKey('test_case.id'))
@@ -114,6 +130,32 @@ class TestExecution(db.Model):
     execution_time = db.Column(db.Integer)  # in minutes
     test_cycle_id = db.Column(db.Integer, db.ForeignKey('test_cycle.id'))
 
+    __table_args__ = (
+        # Newest-first pages, alone or within a status or environment, and the covering
+        # index the execution list's facet counts are grouped on (list_filters.py)
+        db.Index('ix_test_execution_date', 'execution_date'),
+        db.Index('ix_test_execution_status_date', 'status', 'execution_date'),
+        db.Index('ix_test_execution_environment_date', 'environment', 'execution_date'),
+        db.Index('ix_test_execution_facets', 'status', 'environment', 'executed_by', 'execution_date'),
+    )
+
+class TestCaseState(db.Model):
+    # Latest execution per test case: environment '' holds the overall latest result,
+    # other rows hold the latest result per TestExecution.environment
+    id = db.Column(db.Integer, primary_key=True)
+    test_case_id = db.Column(db.Integer, db.ForeignKey('test_case.id'), nullable=False)
+    environment = db.Column(db.String(50), nullable=False, default='')
+    last_execution_id = db.Column(db.Integer, db.ForeignKey('test_execution.id'), nullable=False)
+    status = db.Column(db.String(20))
+    build_version = db.Column(db.String(50))
+    executed_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    executed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint('test_case_id', 'environment', name='uq_test_case_state'),
+        db.Index('ix_test_case_state_environment_status', 'environment', 'status'),
+    )
+
 class TestCycle(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -125,6 +167,34 @@ class TestCycle(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class TestCycleCase(db.Model):
+    # Planned test case snapshot for a cycle, with its latest status in that cycle
+    id = db.Column(db.Integer, primary_key=True)
+    test_cycle_id = db.Column(db.Integer, db.ForeignKey('test_cycle.id'), nullable=False)
+    test_case_id = db.Column(db.Integer, db.ForeignKey('test_case.id'), nullable=False)
+    status = db.Column(db.String(20), default='Not Run')
+    last_execution_id = db.Column(db.Integer, db.ForeignKey('test_execution.id'))
+
+    __table_args__ = (
+        db.UniqueConstraint('test_cycle_id', 'test_case_id', name='uq_test_cycle_case'),
+    )
+
+class TestCycleProgress(db.Model):
+    # Per-cycle counters, updated incrementally as executions are recorded
+    test_cycle_id = db.Column(db.Integer, db.ForeignKey('test_cycle.id'), primary_key=True)
+    planned = db.Column(db.Integer, default=0, nullable=False)
+    not_run = db.Column(db.Integer, default=0, nullable=False)
+    passed = db.Column(db.Integer, default=0, nullable=False)
+    failed = db.Column(db.Integer, default=0, nullable=False)
+    blocked = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CoverageVersion(db.Model):
+    # Bumped in every transaction that changes a project's requirement coverage; the per-process
+    # coverage caches compare against it. project_id 0 counts changes whose project is unknown.
+    project_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, default=0, nullable=False)
+
 class Bug(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -144,6 +214,11 @@ class Bug(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_bug_facets', 'status', 'severity', 'priority', 'assigned_to', 'environment'),
+        db.Index('ix_bug_priority', 'priority'),
+    )
+
 class Attachment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
@@ -191,6 +266,16 @@ class Notification(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_notification_user_read', 'user_id', 'is_read'),
+    )
+
+class NotificationCounter(db.Model):
+    # Unread notifications per user, adjusted in the transactions that add or mark notifications;
+    # created on a user's first delivery
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, autoincrement=False)
+    unread = db.Column(db.Integer, default=0, nullable=False)
+
 class TestEnvironment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -199,3 +284,100 @@ class TestEnvironment(db.Model):
     status = db.Column(db.String(20), default='Active')
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class LiveEvent(db.Model):
+    # Short-lived relay rows that carry live events between processes
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    user_id = db.Column(db.Integer)  # None = every connected user
+    payload = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class ChangeLogEntry(db.Model):
+    # Append-only record of created/updated/deleted rows; sequence is the /api/changes cursor
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)  # table name
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # created, updated, deleted
+    fields = db.Column(db.Text)  # comma-separated columns an update changed
+    changed_by = db.Column(db.Integer)  # no foreign key: deleting a user keeps their history
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    sequence = db.Column(db.Integer, unique=True)  # feed position, given once committed; None until then
+
+class WebhookEndpoint(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(500), nullable=False)
+    secret = db.Column(db.String(64), nullable=False)  # HMAC key for the signature header
+    events = db.Column(db.String(200), nullable=False)  # comma-separated event types
+    is_active = db.Column(db.Boolean, default=True)
+    created_by = db.Column(db.Integer)  # no foreign key: endpoints outlive the admin who added them
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Delivery health: the circuit opens after repeated failures and is retried after a cool-down
+    consecutive_failures = db.Column(db.Integer, default=0, nullable=False)
+    circuit_open_until = db.Column(db.DateTime)
+    last_success_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    dropped_events = db.Column(db.Integer, default=0, nullable=False)  # refused while the backlog was full
+
+class WebhookOutbox(db.Model):
+    # One row per event and subscribed endpoint, written in the transaction that caused the event
+    id = db.Column(db.Integer, primary_key=True)
+    endpoint_id = db.Column(db.Integer, db.ForeignKey('webhook_endpoint.id'), nullable=False)
+    event = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON of the event's data
+    status = db.Column(db.String(10), default='pending', nullable=False)  # pending, delivered, dead
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    lease_token = db.Column(db.String(32))  # set by the worker that claimed the row
+    lease_until = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    delivered_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_webhook_outbox_due', 'status', 'next_attempt_at', 'endpoint_id'),
+    )
+
+class CloneJob(db.Model):
+    # A project or suite tree being copied in the background (cloning.py); polled by whoever started it
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # project, suite
+    source_id = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(100))  # of the copy; 'Copy of ...' when empty
+    status = db.Column(db.String(10), default='queued', nullable=False)  # queued, running, done, failed
+    target_id = db.Column(db.Integer)  # the new project or root suite
+    counts = db.Column(db.Text)  # JSON of rows copied per table
+    error = db.Column(db.Text)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+class CloneIdMap(db.Model):
+    # Old id -> new id of every row a clone job copies, so the copies can be linked to each other
+    job_id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), primary_key=True)
+    old_id = db.Column(db.Integer, primary_key=True)
+    new_id = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_clone_id_map_new', 'job_id', 'entity', 'new_id'),
+    )
+
+class AttachmentBlob(db.Model):
+    # One row per distinct file content; Attachment.file_path holds its storage key
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ExecutionAttachment(db.Model):
+    attachment_id = db.Column(db.Integer, db.ForeignKey('attachment.id'), primary_key=True)
+    test_execution_id = db.Column(db.Integer, db.ForeignKey('test_execution.id'), nullable=False, index=True)
+
+class SchemaVersion(db.Model):
+    # Fingerprint of the model metadata the database was last brought up to (see startup.py)
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.String(64), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,332 @@
+"""
+Notification pipeline.
+
+Routes publish events (test failures, assignments, bug status changes) without
+touching the database. A background worker per process collects events for a
+short digest window, resolves recipients and their preferences with one
+query, coalesces bursts into one digest per recipient and event kind, writes
+all Notification rows with a single bulk INSERT and hands the matching emails
+to a pluggable sender. Unread counts live in notification_counter, adjusted
+in the same transaction that inserts or marks notifications, so page loads
+read one row instead of running COUNT(*) and every worker sees the same
+number.
+"""
+import logging
+import queue
+import smtplib
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from email.message import EmailMessage
+
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Notification, NotificationCounter, User
+from database import after_request_transaction
+
+logger = logging.getLogger(__name__)
+
+# Event kind -> User flag that opts a recipient in
+PREFERENCES = {
+    'test_failure': 'test_failure_alerts',
+    'assignment': 'assignment_notifications',
+    'bug_update': 'bug_update_notifications'
+}
+
+DIGEST_TITLES = {
+    'test_failure': '{count} test failures',
+    'assignment': '{count} new assignments',
+    'bug_update': '{count} bug updates',
+    'clone': '{count} copies finished'
+}
+
+DIGEST_MAX_LINES = 10
+
+NotificationEvent = namedtuple('NotificationEvent', [
+    'kind', 'title', 'message', 'type', 'recipient_ids', 'recipient_roles', 'exclude_user_id', 'created_at'
+])
+
+
+class ConsoleEmailSender:
+    """Logs emails instead of sending them (default for development)"""
+
+    def send(self, messages):
+        for message in messages:
+            logger.info("Notification email to %s: %s", message['To'], message['Subject'])
+
+
+class MemoryEmailSender:
+    """Keeps sent emails in memory, for tests"""
+
+    def __init__(self):
+        self.outbox = []
+
+    def send(self, messages):
+        self.outbox.extend(messages)
+
+
+class SmtpEmailSender:
+    """Sends emails over one SMTP connection per batch
+
+    Any SMTP server works; `python -m aiosmtpd -n -l localhost:1025` is a
+    local stand-in.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=False):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+
+    def send(self, messages):
+        if not messages:
+            return
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            for message in messages:
+                smtp.send_message(message)
+
+
+def email_sender_from_config(config):
+    """Build the email sender selected by NOTIFICATION_EMAIL_BACKEND"""
+    backend = config.get('NOTIFICATION_EMAIL_BACKEND', 'console')
+    if backend == 'smtp':
+        return SmtpEmailSender(
+            config.get('MAIL_SERVER', 'localhost'),
+            int(config.get('MAIL_PORT', 1025)),
+            config.get('MAIL_USERNAME'),
+            config.get('MAIL_PASSWORD'),
+            config.get('MAIL_USE_TLS', False)
+        )
+    if backend == 'memory':
+        return MemoryEmailSender()
+    return ConsoleEmailSender()
+
+
+class NotificationDispatcher:
+    """Flask extension that queues, coalesces and delivers notifications"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.sender = None
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self.listeners = []  # called with the ids of users who received notifications
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('NOTIFICATIONS_ASYNC', True)
+        app.config.setdefault('NOTIFICATION_DIGEST_WINDOW', 5)  # seconds
+        app.config.setdefault('NOTIFICATION_EMAIL_BACKEND', 'console')
+        app.config.setdefault('MAIL_SENDER', 'testpro@localhost')
+        self.app = app
+        self.sender = email_sender_from_config(app.config)
+        app.extensions['notifications'] = self
+
+    # Publishing
+
+    def publish(self, kind, title, message, recipient_ids=(), recipient_roles=(), type='info',
+                exclude_user_id=None):
+        """Queue a notification event; never blocks the request on delivery"""
+        event = NotificationEvent(
+            kind, title, message, type,
+            tuple(uid for uid in recipient_ids if uid), tuple(recipient_roles),
+            exclude_user_id, datetime.utcnow()
+        )
+        if not self.app.config['NOTIFICATIONS_ASYNC']:
+            # Its own session writes; inside a request that waits for the request's transaction
+            after_request_transaction(lambda: self.deliver([event]))
+            return
+        self._queue.put(event)
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        # Started lazily so each gunicorn worker process gets its own thread after fork
+        if self._worker and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if not (self._worker and self._worker.is_alive()):
+                self._worker = threading.Thread(target=self._run, name='notification-worker', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        window = self.app.config['NOTIFICATION_DIGEST_WINDOW']
+        while True:
+            events = [self._queue.get()]
+            # Collect the rest of the burst so it becomes one digest per recipient
+            deadline = time.monotonic() + window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    events.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.deliver(events)
+            except Exception:
+                logger.exception("Failed to deliver %d notification event(s)", len(events))
+
+    def flush(self):
+        """Deliver everything queued so far in the calling thread"""
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if events:
+            self.deliver(events)
+        return len(events)
+
+    # Delivery
+
+    def deliver(self, events):
+        """Fan a batch of events out to recipients: one user query, one bulk insert"""
+        with self.app.app_context():
+            ids = set(uid for event in events for uid in event.recipient_ids)
+            roles = set(role for event in events for role in event.recipient_roles)
+            if not ids and not roles:
+                return
+
+            conditions = []
+            if ids:
+                conditions.append(User.id.in_(ids))
+            if roles:
+                conditions.append(User.role.in_(roles))
+            users = User.query.filter(db.or_(*conditions), User.is_active.is_(True)).all()
+
+            # (user, kind) -> events, respecting each user's preferences
+            groups = {}
+            for event in events:
+                preference = PREFERENCES.get(event.kind)
+                for user in users:
+                    if user.id == event.exclude_user_id:
+                        continue
+                    if user.id not in event.recipient_ids and user.role not in event.recipient_roles:
+                        continue
+                    if preference and not getattr(user, preference):
+                        continue
+                    groups.setdefault((user.id, event.kind), []).append(event)
+
+            if not groups:
+                return
+
+            rows = [self._notification_row(user_id, kind, grouped)
+                    for (user_id, kind), grouped in groups.items()]
+            db.session.execute(insert(Notification), rows)
+            per_user = {}
+            for row in rows:
+                per_user.setdefault(row['user_id'], []).append(row)
+            self._add_unread({user_id: len(user_rows) for user_id, user_rows in per_user.items()})
+            db.session.commit()
+
+            for listener in self.listeners:
+                try:
+                    listener(list(per_user))
+                except Exception:
+                    logger.exception("Notification listener failed")
+
+            self._send_emails([user for user in users if user.id in per_user], per_user)
+
+    def _notification_row(self, user_id, kind, events):
+        if len(events) == 1:
+            event = events[0]
+            title, message, type = event.title, event.message, event.type
+        else:
+            title = DIGEST_TITLES.get(kind, '{count} notifications').format(count=len(events))
+            lines = [f"- {event.title}: {event.message}" for event in events[:DIGEST_MAX_LINES]]
+            if len(events) > DIGEST_MAX_LINES:
+                lines.append(f"... and {len(events) - DIGEST_MAX_LINES} more")
+            message = '\n'.join(lines)
+            # A digest is as severe as its most severe event
+            types = set(event.type for event in events)
+            type = 'error' if 'error' in types else 'warning' if 'warning' in types else events[0].type
+        return {
+            'title': title[:200],
+            'message': message,
+            'type': type,
+            'user_id': user_id,
+            'is_read': False,
+            'created_at': min(event.created_at for event in events)
+        }
+
+    def _send_emails(self, users, per_user):
+        messages = []
+        for user in users:
+            if not user.email_notifications or not user.email:
+                continue
+            user_rows = per_user[user.id]
+            email = EmailMessage()
+            email['From'] = self.app.config['MAIL_SENDER']
+            email['To'] = user.email
+            email['Subject'] = user_rows[0]['title'] if len(user_rows) == 1 else f"{len(user_rows)} new notifications"
+            email.set_content('\n\n'.join(f"{row['title']}\n{row['message'] or ''}" for row in user_rows))
+            messages.append(email)
+        try:
+            self.sender.send(messages)
+        except Exception:
+            logger.exception("Failed to send %d notification email(s)", len(messages))
+
+    # Unread counters
+
+    def unread_count(self, user_id):
+        """Unread notification count: one primary-key read, or a COUNT for users never notified"""
+        count = db.session.query(NotificationCounter.unread).filter(NotificationCounter.user_id == user_id).scalar()
+        if count is not None:
+            return count
+        return db.session.query(func.count(Notification.id)).filter(
+            Notification.user_id == user_id, Notification.is_read.is_(False)
+        ).scalar()
+
+    def _add_unread(self, added):
+        """Raise the counters of {user_id: new notifications} in the delivering transaction"""
+        existing = {row[0] for row in db.session.query(NotificationCounter.user_id).filter(
+            NotificationCounter.user_id.in_(added)
+        ).with_for_update()}
+        missing = [user_id for user_id in added if user_id not in existing]
+        if missing:
+            try:
+                with db.session.begin_nested():
+                    # Counted after the insert, so the new notifications are included
+                    db.session.execute(insert(NotificationCounter).from_select(
+                        ['user_id', 'unread'],
+                        select(Notification.user_id, func.count(Notification.id)).where(
+                            Notification.user_id.in_(missing), Notification.is_read.is_(False)
+                        ).group_by(Notification.user_id)
+                    ))
+            except IntegrityError:
+                # A concurrent delivery created some of them; its count can't include this one's rows
+                existing.update(missing)
+        by_amount = defaultdict(list)
+        for user_id in existing:
+            by_amount[added[user_id]].append(user_id)
+        for amount, user_ids in by_amount.items():
+            NotificationCounter.query.filter(NotificationCounter.user_id.in_(user_ids)).update(
+                {'unread': NotificationCounter.unread + amount}, synchronize_session=False
+            )
+
+    def mark_read(self, user_id, notification_ids=None):
+        """Mark some (or all) of a user's notifications read; the caller commits"""
+        query = Notification.query.filter(Notification.user_id == user_id, Notification.is_read.is_(False))
+        if notification_ids is not None:
+            query = query.filter(Notification.id.in_(notification_ids))
+        marked = query.update({'is_read': True}, synchronize_session=False)
+        if marked:
+            NotificationCounter.query.filter(NotificationCounter.user_id == user_id).update({
+                'unread': case((NotificationCounter.unread > marked, NotificationCounter.unread - marked), else_=0)
+            }, synchronize_session=False)
+        return marked
+
+    def forget_user(self, user_id):
+        """Drop a user's counter before the user row is deleted; the caller commits"""
+        NotificationCounter.query.filter(NotificationCounter.user_id == user_id).delete(synchronize_session=False)
@@ -0,0 +1,442 @@
+"""
+User and webhook administration
+"""
+from datetime import datetime
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from werkzeug.security import generate_password_hash
+from models import Attachment, Bug, Notification, TestExecution, User, WebhookEndpoint, WebhookOutbox, db
+from case_state import forget_case_state, refresh_case_state
+from change_log import delete_rows, update_rows
+from test_cycles import rebuild_progress, release_executions
+from traceability import invalidate_coverage
+from webhooks import EVENTS as WEBHOOK_EVENTS, new_secret
+from extensions import attachment_store, notifier, webhooks
+from routes.auth import profile_photo_id
+
+bp = Blueprint('admin', __name__)
+
+@bp.route('/admin')
+@login_required
+def admin():
+    # Only admin can access admin panel
+    if current_user.role != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('projects.dashboard'))
+    
+    users = User.query.all()
+    user_stats = {
+        'total_users': len(users),
+        'active_users': len([u for u in users if u.is_active]),
+        'admins': len([u for u in users if u.role == 'admin']),
+        'managers': len([u for u in users if u.role == 'manager']),
+        'developers': len([u for u in users if u.role == 'developer']),
+        'testers': len([u for u in users if u.role == 'tester'])
+    }
+    return render_template('admin.html', users=users, user_stats=user_stats)
+
+@bp.route('/admin/create-user', methods=['GET', 'POST'])
+@login_required
+def admin_create_user():
+    # Only admin can create users
+    if current_user.role != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('projects.dashboard'))
+    
+    if request.method == 'POST':
+        username = request.form['username']
+        email = request.form['email']
+        password = request.form['password']
+        role = request.form['role']
+        
+        # Prevent creating multiple admins
+        if role == 'admin':
+            flash('Cannot create another admin. Only one admin is allowed.', 'error')
+            return render_template('admin_create_user.html')
+        
+        # Check if username already exists
+        if User.query.filter_by(username=username).first():
+            flash('Username already exists', 'error')
+            return render_template('admin_create_user.html')
+        
+        # Check if email already exists
+        if User.query.filter_by(email=email).first():
+            flash('Email already exists', 'error')
+            return render_template('admin_create_user.html')
+        
+        user = User(
+            username=username,
+            email=email,
+            password_hash=generate_password_hash(password),
+            role=role
+        )
+        db.session.add(user)
+        db.session.commit()
+        
+        flash(f'{role.title()} account created successfully', 'success')
+        return redirect(url_for('admin.admin'))
+    
+    return render_template('admin_create_user.html')
+
+@bp.route('/admin/cleanup-admins', methods=['POST'])
+@login_required
+def cleanup_admins():
+    # Only admin can cleanup
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Access denied'})
+    
+    try:
+        # Get all admin users
+        admin_users = User.query.filter_by(role='admin').all()
+        
+        if len(admin_users) <= 1:
+            return jsonify({'success': True, 'message': 'Only one admin exists, no cleanup needed'})
+        
+        # Keep the current admin and delete others
+        for admin in admin_users:
+            if admin.id != current_user.id:
+                db.session.delete(admin)
+        
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': f'Cleaned up {len(admin_users) - 1} extra admin accounts'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/admin/users/<int:user_id>/toggle', methods=['POST'])
+@login_required
+def toggle_user_status(user_id):
+    # Only admin can toggle user status
+    if current_user.role != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('projects.dashboard'))
+    
+    user = User.query.get_or_404(user_id)
+    
+    # Prevent admin from deactivating themselves
+    if user.id == current_user.id:
+        flash('You cannot deactivate your own admin account', 'error')
+        return redirect(url_for('admin.admin'))
+    
+    # Prevent deactivating the only admin
+    if user.role == 'admin':
+        flash('Cannot deactivate the admin account', 'error')
+        return redirect(url_for('admin.admin'))
+    
+    user.is_active = not user.is_active
+    db.session.commit()
+    
+    status = 'activated' if user.is_active else 'deactivated'
+    flash(f'User {user.username} has been {status}', 'success')
+    return redirect(url_for('admin.admin'))
+
+@bp.route('/admin/users/<int:user_id>/delete', methods=['POST'])
+@login_required
+def delete_user(user_id):
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Access denied. Only admin can delete users.'})
+    
+    try:
+        user = User.query.get_or_404(user_id)
+        
+        # Prevent admin from deleting themselves
+        if user.id == current_user.id:
+            return jsonify({'success': False, 'message': 'You cannot delete your own account.'})
+        
+        # Enhanced deletion logic to handle legacy data and missing foreign keys
+        
+        # 1. Delete test executions created by this user (handle missing executed_by column)
+        affected_cycles = release_executions([row[0] for row in db.session.query(TestExecution.id).filter_by(
+            executed_by=user_id).all()])
+        affected_case_ids = [row[0] for row in db.session.query(TestExecution.test_case_id).filter_by(
+            executed_by=user_id).distinct().all()]
+        forget_case_state(affected_case_ids)
+        release_user_attachments(user_id)
+        try:
+            delete_rows('test_execution', 'executed_by = :user_id', 
+                             {'user_id': user_id})
+        except:
+            # Column might not exist in legacy data, skip
+            pass
+        for cycle_id in affected_cycles:
+            rebuild_progress(cycle_id)
+        refresh_case_state(affected_case_ids)
+        if affected_case_ids:
+            invalidate_coverage()
+        
+        # 2. Delete bugs reported by this user (handle missing reported_by column)
+        try:
+            delete_rows('bug', 'reported_by = :user_id', 
+                             {'user_id': user_id})
+        except:
+            # Column might not exist in legacy data, skip
+            pass
+        
+        # 3. Delete assignments assigned to this user
+        try:
+            delete_rows('assignment', 'assigned_to = :user_id', 
+                             {'user_id': user_id})
+        except:
+            # Handle legacy data without proper foreign keys
+            pass
+        
+        # 4. Delete assignments created by this user (handle missing created_by column)
+        try:
+            delete_rows('assignment', 'created_by = :user_id', 
+                             {'user_id': user_id})
+        except:
+            # Column might not exist in legacy data, skip
+            pass
+        
+        # 5. Update test cases assigned to this user (set to NULL) - handle missing columns
+        try:
+            update_rows('test_case', {'assigned_to': None}, 'assigned_to = :user_id', 
+                             {'user_id': user_id})
+        except:
+            # Column might not exist in legacy data, skip
+            pass
+        
+        # 6. Update test cases created by this user (set to NULL) - handle missing columns
+        try:
+            update_rows('test_case', {'created_by': None}, 'created_by = :user_id', 
+                             {'user_id': user_id})
+        except:
+            # Column might not exist in legacy data, skip
+            pass
+        
+        # 7. Update projects created by this user (set to NULL) - handle missing columns
+        try:
+            update_rows('project', {'created_by': None}, 'created_by = :user_id', 
+                             {'user_id': user_id})
+        except:
+            # Column might not exist in legacy data, skip
+            pass
+        
+        # 8. Handle any other legacy references
+        try:
+            # Update any other tables that might reference this user
+            update_rows('bug', {'assigned_to': None}, 'assigned_to = :user_id', 
+                             {'user_id': user_id})
+        except:
+            pass
+        
+        # 9. Delete the user's notifications
+        Notification.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        notifier.forget_user(user_id)
+        
+        # 10. Finally delete the user
+        db.session.delete(user)
+        db.session.commit()
+        attachment_store.purge()
+        
+        return jsonify({'success': True, 'message': f'User "{user.username}" and all related data deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error deleting user: {str(e)}'})
+
+@bp.route('/admin/users/bulk-delete', methods=['POST'])
+@login_required
+def bulk_delete_users():
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Access denied. Only admin can delete users.'})
+    
+    try:
+        data = request.get_json()
+        user_ids = data.get('user_ids', [])
+        
+        if not user_ids:
+            return jsonify({'success': False, 'message': 'No users selected'})
+        
+        # Prevent admin from deleting themselves
+        if current_user.id in user_ids:
+            return jsonify({'success': False, 'message': 'You cannot delete your own account.'})
+        
+        deleted_count = 0
+        errors = []
+        
+        for user_id in user_ids:
+            try:
+                user = User.query.get(user_id)
+                if user and user.id != current_user.id:
+                    # Enhanced deletion logic to handle legacy data
+                    
+                    # Delete related records with error handling for missing columns
+                    affected_cycles = release_executions([row[0] for row in db.session.query(TestExecution.id).filter_by(
+                        executed_by=user_id).all()])
+                    affected_case_ids = [row[0] for row in db.session.query(TestExecution.test_case_id).filter_by(
+                        executed_by=user_id).distinct().all()]
+                    forget_case_state(affected_case_ids)
+                    release_user_attachments(user_id)
+                    try:
+                        delete_rows('test_execution', 'executed_by = :user_id', 
+                                         {'user_id': user_id})
+                    except:
+                        pass
+                    for cycle_id in affected_cycles:
+                        rebuild_progress(cycle_id)
+                    refresh_case_state(affected_case_ids)
+                    if affected_case_ids:
+                        invalidate_coverage()
+                    
+                    try:
+                        delete_rows('bug', 'reported_by = :user_id', 
+                                         {'user_id': user_id})
+                    except:
+                        pass
+                    
+                    try:
+                        delete_rows('assignment', 'assigned_to = :user_id', 
+                                         {'user_id': user_id})
+                    except:
+                        pass
+                    
+                    try:
+                        delete_rows('assignment', 'created_by = :user_id', 
+                                         {'user_id': user_id})
+                    except:
+                        pass
+                    
+                    try:
+                        update_rows('test_case', {'assigned_to': None}, 'assigned_to = :user_id', 
+                                         {'user_id': user_id})
+                    except:
+                        pass
+                    
+                    try:
+                        update_rows('test_case', {'created_by': None}, 'created_by = :user_id', 
+                                         {'user_id': user_id})
+                    except:
+                        pass
+                    
+                    try:
+                        update_rows('project', {'created_by': None}, 'created_by = :user_id', 
+                                         {'user_id': user_id})
+                    except:
+                        pass
+                    
+                    try:
+                        update_rows('bug', {'assigned_to': None}, 'assigned_to = :user_id', 
+                                         {'user_id': user_id})
+                    except:
+                        pass
+                    
+                    Notification.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+                    notifier.forget_user(user_id)
+                    
+                    db.session.delete(user)
+                    deleted_count += 1
+            except Exception as e:
+                errors.append(f"Error deleting user {user_id}: {str(e)}")
+        
+        db.session.commit()
+        attachment_store.purge()
+        
+        if errors:
+            return jsonify({
+                'success': True, 
+                'deleted_count': deleted_count, 
+                'message': f'Successfully deleted {deleted_count} user(s). Some errors occurred: {"; ".join(errors[:3])}'
+            })
+        else:
+            return jsonify({
+                'success': True, 
+                'deleted_count': deleted_count, 
+                'message': f'Successfully deleted {deleted_count} user(s)'
+            })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error deleting users: {str(e)}'})
+
+@bp.route('/admin/webhooks', methods=['GET', 'POST'])
+@login_required
+def webhook_endpoints():
+    """List webhook endpoints with their delivery state, or add one (JSON: url, events, optional secret)"""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Access denied. Only admin can manage webhooks.'})
+    if request.method == 'GET':
+        stats = webhooks.stats()
+        return jsonify({'success': True, 'endpoints': [{
+            'id': endpoint.id,
+            'url': endpoint.url,
+            'events': endpoint.events.split(','),
+            'is_active': endpoint.is_active,
+            'consecutive_failures': endpoint.consecutive_failures,
+            'circuit_open_until': endpoint.circuit_open_until.isoformat() + 'Z' if endpoint.circuit_open_until else None,
+            'last_success_at': endpoint.last_success_at.isoformat() + 'Z' if endpoint.last_success_at else None,
+            'last_error': endpoint.last_error,
+            'dropped_events': endpoint.dropped_events,
+            'outbox': stats.get(endpoint.id, {})
+        } for endpoint in WebhookEndpoint.query.order_by(WebhookEndpoint.id).all()]})
+    try:
+        data = request.get_json() or {}
+        url = (data.get('url') or '').strip()
+        events = data.get('events') or list(WEBHOOK_EVENTS)
+        if not url.startswith(('http://', 'https://')):
+            return jsonify({'success': False, 'message': 'Webhook URL must start with http:// or https://'})
+        unknown = [event for event in events if event not in WEBHOOK_EVENTS]
+        if unknown:
+            return jsonify({'success': False, 'message': f'Unknown event(s): {", ".join(unknown)}'})
+        endpoint = WebhookEndpoint(url=url, events=','.join(events), secret=data.get('secret') or new_secret(),
+                                   created_by=current_user.id)
+        db.session.add(endpoint)
+        db.session.commit()
+        webhooks.invalidate()
+        # The secret is only ever shown here
+        return jsonify({'success': True, 'message': 'Webhook endpoint added', 'id': endpoint.id,
+                        'secret': endpoint.secret})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/admin/webhooks/<int:endpoint_id>/toggle', methods=['POST'])
+@login_required
+def toggle_webhook_endpoint(endpoint_id):
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Access denied. Only admin can manage webhooks.'})
+    endpoint = WebhookEndpoint.query.get_or_404(endpoint_id)
+    endpoint.is_active = not endpoint.is_active
+    db.session.commit()
+    webhooks.invalidate()
+    return jsonify({'success': True, 'message': f"Webhook endpoint {'enabled' if endpoint.is_active else 'disabled'}"})
+
+@bp.route('/admin/webhooks/<int:endpoint_id>/retry', methods=['POST'])
+@login_required
+def retry_webhook_endpoint(endpoint_id):
+    """Close the endpoint's circuit and requeue its dead events"""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Access denied. Only admin can manage webhooks.'})
+    endpoint = WebhookEndpoint.query.get_or_404(endpoint_id)
+    endpoint.consecutive_failures = 0
+    endpoint.circuit_open_until = None
+    requeued = WebhookOutbox.query.filter_by(endpoint_id=endpoint.id, status='dead').update(
+        {'status': 'pending', 'attempts': 0, 'next_attempt_at': datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+    return jsonify({'success': True, 'message': f'Requeued {requeued} event(s)'})
+
+@bp.route('/admin/webhooks/<int:endpoint_id>/delete', methods=['POST'])
+@login_required
+def delete_webhook_endpoint(endpoint_id):
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Access denied. Only admin can manage webhooks.'})
+    try:
+        endpoint = WebhookEndpoint.query.get_or_404(endpoint_id)
+        WebhookOutbox.query.filter_by(endpoint_id=endpoint.id).delete(synchronize_session=False)
+        db.session.delete(endpoint)
+        db.session.commit()
+        webhooks.invalidate()
+        return jsonify({'success': True, 'message': 'Webhook endpoint deleted'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+
+def release_user_attachments(user_id):
+    """Drop the attachments of a deleted user's bugs, executions and profile photo"""
+    user = User.query.get(user_id)
+    attachment_store.delete_for(
+        bug_ids=[row[0] for row in db.session.query(Bug.id).filter_by(reported_by=user_id).all()],
+        execution_ids=[row[0] for row in db.session.query(TestExecution.id).filter_by(executed_by=user_id).all()]
+    )
+    if user and profile_photo_id(user):
+        attachment_store.delete_attachments([profile_photo_id(user)])
+    Attachment.query.filter_by(uploaded_by=user_id).update({'uploaded_by': None}, synchronize_session=False)
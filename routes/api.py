@@ -0,0 +1,396 @@
+"""
+JSON API, health probes, the live event stream and attachments
+"""
+import csv
+from datetime import datetime
+from flask import Blueprint, Response, jsonify, request, send_file, stream_with_context, url_for
+from flask_login import current_user, login_required
+from models import (Attachment, Bug, ExecutionAttachment, Notification, Project, TestCase, TestExecution,
+                    TestSuite, db)
+from analytics_export import Export, ExportError
+from attachments import AttachmentTooLarge
+from environments import MATRIX_PAGE_SIZE, environment_names, matrix_page
+from images import VARIANTS, is_image
+from list_filters import BUG_LISTING, EXECUTION_LISTING, TEST_CASE_LISTING
+from list_rows import bug_rows, execution_rows, test_case_rows
+from startup import SCHEMA_VERSION, stored_version
+from suite_tree import ancestor_ids, tree_nodes
+from test_cycles import cycle_progress
+from traceability import build_traceability_matrix, project_coverage
+from extensions import attachment_store, change_log, image_variants, live_events, notifier
+from routes.auth import session_time_remaining
+
+bp = Blueprint('api', __name__)
+
+@bp.route('/healthz')
+def healthz():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+@bp.route('/readyz')
+def readyz():
+    """Readiness probe: the database answers and its schema matches the models"""
+    try:
+        with db.engine.connect() as connection:
+            version = stored_version(connection)
+    except Exception as e:
+        return jsonify({'status': 'unavailable', 'message': f'Database unavailable: {type(e).__name__}'}), 503
+    if version != SCHEMA_VERSION:
+        return jsonify({'status': 'unavailable', 'message': 'Schema migration pending',
+                        'schema_version': version, 'expected_schema_version': SCHEMA_VERSION}), 503
+    return jsonify({'status': 'ok', 'schema_version': version})
+
+@bp.route('/events/stream')
+@login_required
+def event_stream():
+    """Server-Sent Events stream of live updates for the current user"""
+    user_id = current_user.id
+    time_remaining = session_time_remaining()
+    subscription = live_events.subscribe(user_id)
+    replay = live_events.replay(user_id, request.headers.get('Last-Event-ID', type=int))
+    
+    # The stream can stay open for a long time, so don't hold a pooled DB connection
+    db.session.remove()
+    
+    response = Response(live_events.stream(subscription, time_remaining, replay=replay),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/api/test-cycles/<int:cycle_id>/progress')
+@login_required
+def api_test_cycle_progress(cycle_id):
+    """Cycle progress counters, read from test_cycle_progress without touching executions"""
+    return jsonify({'success': True, 'progress': cycle_progress(cycle_id)})
+
+@bp.route('/api/reports/environment-matrix')
+@login_required
+def api_environment_matrix():
+    """One page of environment matrix rows"""
+    try:
+        project_id = request.args.get('project_id', type=int)
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', MATRIX_PAGE_SIZE, type=int)
+        environment_list = environment_names(project_id)
+        return jsonify({
+            'success': True,
+            'environments': environment_list,
+            'offset': offset,
+            'rows': matrix_page(environment_list, project_id, offset, limit)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error loading environment matrix: {str(e)}'})
+
+@bp.route('/api/test-suites/tree')
+@login_required
+def api_test_suite_tree():
+    """Lazy tree expansion: children of parent_id (or project roots) with subtree rollups"""
+    try:
+        project_id = request.args.get('project_id', type=int)
+        parent_id = request.args.get('parent_id', type=int)
+        return jsonify({'success': True, 'nodes': tree_nodes(project_id=project_id, parent_id=parent_id)})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error loading test suite tree: {str(e)}'})
+
+@bp.route('/api/test-suites/<int:suite_id>/stats')
+@login_required
+def api_test_suite_stats(suite_id):
+    """Subtree case count and pass rate for a single suite"""
+    try:
+        suite = TestSuite.query.get_or_404(suite_id)
+        node = tree_nodes(suite_ids=[suite.id])[0]
+        node['description'] = suite.description
+        node['ancestor_ids'] = ancestor_ids(suite.id)
+        return jsonify({'success': True, 'suite': node})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error loading test suite stats: {str(e)}'})
+
+@bp.route('/api/requirements/traceability')
+@login_required
+def api_traceability_matrix():
+    """JSON traceability matrix, optionally filtered by project"""
+    try:
+        project_id = request.args.get('project_id', type=int)
+        return jsonify({'success': True, 'matrix': build_traceability_matrix(project_id)})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error building traceability matrix: {str(e)}'})
+
+@bp.route('/api/requirements/coverage')
+@login_required
+def api_requirement_coverage():
+    """Cached per-requirement coverage percentages for a project"""
+    try:
+        project_id = request.args.get('project_id', type=int)
+        return jsonify({'success': True, 'coverage': project_coverage(project_id)})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error fetching coverage: {str(e)}'})
+
+ATTACHMENT_TARGETS = ('test_case_id', 'bug_id', 'test_execution_id')
+
+def attachment_dict(attachment):
+    return {
+        'id': attachment.id,
+        'filename': attachment.filename,
+        'file_size': attachment.file_size,
+        'file_type': attachment.file_type,
+        'uploaded_by': attachment.uploaded_by,
+        'uploaded_at': attachment.uploaded_at.strftime('%Y-%m-%d %H:%M') if attachment.uploaded_at else None,
+        'download_url': url_for('api.download_attachment', attachment_id=attachment.id),
+        'thumbnail_url': url_for('api.attachment_image', attachment_id=attachment.id, variant='thumb') if is_image(attachment.file_type) else None,
+        'preview_url': url_for('api.attachment_image', attachment_id=attachment.id, variant='preview') if is_image(attachment.file_type) else None
+    }
+
+def attachment_target(values):
+    """The test case / bug / execution an upload belongs to, validated to exist"""
+    target = {field: values.get(field, type=int) for field in ATTACHMENT_TARGETS}
+    if not any(target.values()):
+        raise ValueError('Attach the file to a test case, bug or test execution')
+    if target['test_case_id']:
+        TestCase.query.get_or_404(target['test_case_id'])
+    if target['bug_id']:
+        Bug.query.get_or_404(target['bug_id'])
+    if target['test_execution_id']:
+        TestExecution.query.get_or_404(target['test_execution_id'])
+    return target
+
+@bp.route('/attachments/upload', methods=['POST'])
+@login_required
+def upload_attachment():
+    """Multipart upload of one or more files"""
+    try:
+        target = attachment_target(request.form)
+        files = [file for file in request.files.getlist('file') if file.filename]
+        if not files:
+            return jsonify({'success': False, 'message': 'No file selected'})
+        
+        attachments = [attachment_store.attach(file.stream, file.filename, current_user.id, file.mimetype, **target)
+                       for file in files]
+        db.session.commit()
+        for attachment in attachments:
+            image_variants.schedule(attachment.file_path, attachment.file_type)
+        return jsonify({
+            'success': True,
+            'message': f'{len(attachments)} file(s) attached',
+            'attachments': [attachment_dict(attachment) for attachment in attachments]
+        })
+    except AttachmentTooLarge as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 413
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/api/attachments', methods=['PUT'])
+@login_required
+def put_attachment():
+    """Raw-body upload (?filename=...&test_case_id=...), streamed straight from the socket"""
+    try:
+        target = attachment_target(request.args)
+        attachment = attachment_store.attach(
+            request.stream, request.args.get('filename', 'attachment'), current_user.id,
+            request.mimetype if request.mimetype != 'application/octet-stream' else None, **target
+        )
+        db.session.commit()
+        image_variants.schedule(attachment.file_path, attachment.file_type)
+        return jsonify({'success': True, 'message': 'File attached', 'attachment': attachment_dict(attachment)})
+    except AttachmentTooLarge as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 413
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/api/attachments')
+@login_required
+def list_attachments():
+    query = Attachment.query
+    if request.args.get('test_execution_id', type=int):
+        query = query.join(ExecutionAttachment, ExecutionAttachment.attachment_id == Attachment.id).filter(
+            ExecutionAttachment.test_execution_id == request.args.get('test_execution_id', type=int)
+        )
+    elif request.args.get('test_case_id', type=int):
+        query = query.filter(Attachment.test_case_id == request.args.get('test_case_id', type=int))
+    elif request.args.get('bug_id', type=int):
+        query = query.filter(Attachment.bug_id == request.args.get('bug_id', type=int))
+    else:
+        return jsonify({'success': False, 'message': 'Specify a test case, bug or test execution'})
+    attachments = query.order_by(Attachment.uploaded_at.desc(), Attachment.id.desc()).all()
+    return jsonify({'success': True, 'attachments': [attachment_dict(attachment) for attachment in attachments]})
+
+@bp.route('/attachments/<int:attachment_id>/download')
+@login_required
+def download_attachment(attachment_id):
+    attachment = Attachment.query.get_or_404(attachment_id)
+    return attachment_store.send(attachment.file_path, attachment.filename, attachment.file_type,
+                                 as_attachment=request.args.get('inline') != '1')
+
+@bp.route('/attachments/<int:attachment_id>/image/<variant>')
+@login_required
+def attachment_image(attachment_id, variant):
+    """Resized, metadata-free rendition of an image attachment (WebP when accepted)"""
+    if variant not in VARIANTS:
+        return jsonify({'success': False, 'message': f'Unknown image size: {variant}'}), 404
+    attachment = Attachment.query.get_or_404(attachment_id)
+    accept_webp = 'image/webp' in request.headers.get('Accept', '')
+    return image_variants.send(attachment.file_path, attachment.filename, attachment.file_type, variant, accept_webp)
+
+@bp.route('/attachments/<int:attachment_id>/delete', methods=['POST'])
+@login_required
+def delete_attachment(attachment_id):
+    try:
+        attachment = Attachment.query.get_or_404(attachment_id)
+        if current_user.role not in ['admin', 'manager'] and attachment.uploaded_by != current_user.id:
+            return jsonify({'success': False, 'message': 'Access denied. Only admin, manager, or the uploader can delete attachments.'})
+        attachment_store.delete_attachments([attachment.id])
+        db.session.commit()
+        attachment_store.purge()
+        return jsonify({'success': True, 'message': 'Attachment deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/api/notifications')
+@login_required
+def api_notifications():
+    limit = min(request.args.get('limit', 10, type=int), 100)
+    items = Notification.query.filter_by(user_id=current_user.id).order_by(
+        Notification.created_at.desc(), Notification.id.desc()
+    ).limit(limit).all()
+    return jsonify({
+        'unread_count': notifier.unread_count(current_user.id),
+        'notifications': [{
+            'id': n.id,
+            'title': n.title,
+            'message': n.message,
+            'type': n.type,
+            'is_read': n.is_read,
+            'created_at': n.created_at.strftime('%Y-%m-%d %H:%M') if n.created_at else None
+        } for n in items]
+    })
+
+@bp.route('/api/notifications/unread-count')
+@login_required
+def notification_unread_count():
+    return jsonify({'unread_count': notifier.unread_count(current_user.id)})
+
+@bp.route('/api/export-data')
+@login_required
+def export_data():
+    # Create CSV export of test data
+    import io
+    output = io.StringIO()
+    writer = csv.writer(output)
+    
+    # Write headers
+    writer.writerow(['Test Case ID', 'Title', 'Status', 'Priority', 'Created Date'])
+    
+    # Write test case data
+    test_cases = TestCase.query.all()
+    for case in test_cases:
+        writer.writerow([case.id, case.title, case.status, case.priority, case.created_at.strftime('%Y-%m-%d')])
+    
+    # Create response
+    output.seek(0)
+    return send_file(
+        io.BytesIO(output.getvalue().encode('utf-8')),
+        mimetype='text/csv',
+        as_attachment=True,
+        download_name='test_cases_export.csv'
+    )
+
+@bp.route('/api/export/<dataset>')
+@login_required
+def export_analytics(dataset):
+    """Stream a dataset as Parquet or Arrow, optionally only what changed since a watermark"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied. Only admin or manager can export analytics data.'}), 403
+    try:
+        export = Export(dataset, request.args.get('format', 'parquet'), since=request.args.get('since'))
+    except ExportError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    response = Response(stream_with_context(iter(export)), mimetype=export.mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{export.filename}"'
+    response.headers['X-Export-Since'] = export.dataset.format_watermark(export.since)
+    response.headers['X-Export-Watermark'] = export.dataset.format_watermark(export.until)
+    return response
+
+@bp.route('/api/changes')
+@login_required
+def changes():
+    """Page through the change log: everything created, updated or deleted after ?cursor="""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied. Only admin or manager can read the change feed.'}), 403
+    cursor = request.args.get('cursor', 0, type=int)
+    oldest_cursor = change_log.oldest_cursor()
+    if 0 < cursor < oldest_cursor:
+        # The entries after this cursor have been pruned; the consumer has to resync from scratch
+        return jsonify({'success': False, 'message': 'Cursor is older than the retained change log.',
+                        'oldest_cursor': oldest_cursor}), 410
+    entries, has_more = change_log.page(cursor, request.args.get('limit', type=int))
+    return jsonify({
+        'changes': [{
+            'cursor': entry.sequence,
+            'entity': entry.entity,
+            'id': entry.entity_id,
+            'action': entry.action,
+            'fields': entry.fields.split(',') if entry.fields else [],
+            'changed_by': entry.changed_by,
+            'changed_at': entry.changed_at.isoformat() + 'Z'
+        } for entry in entries],
+        'cursor': entries[-1].sequence if entries else cursor,
+        'has_more': has_more
+    })
+
+# Filtered lists, taking the same query string as their pages: {name: (listing, rows)}
+LISTS = {
+    'test-executions': (EXECUTION_LISTING, execution_rows),
+    'test-cases': (TEST_CASE_LISTING, test_case_rows),
+    'bugs': (BUG_LISTING, bug_rows),
+}
+
+@bp.route('/api/lists/<name>')
+@login_required
+def api_list(name):
+    """One page of a filtered, sorted list with its facet counts"""
+    if name not in LISTS:
+        return jsonify({'success': False, 'message': f'Unknown list {name!r}'}), 404
+    listing, list_rows = LISTS[name]
+    filters = listing.query()
+    rows = list_rows(*filters.criteria(), order_by=filters.order_by(), limit=filters.per_page, offset=filters.offset)
+    return jsonify(dict(filters.to_dict(), success=True, rows=[
+        {field: value.isoformat() if isinstance(value, datetime) else value for field, value in row._asdict().items()}
+        for row in rows
+    ]))
+
+@bp.route('/api/quick-add', methods=['POST'])
+@login_required
+def quick_add():
+    item_type = request.json.get('type')
+    
+    if item_type == 'test_case':
+        # Create a quick test case
+        test_case = TestCase(
+            title=f"Quick Test Case - {datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            description="Quick test case created from dashboard",
+            test_steps="1. Define test steps\n2. Execute test\n3. Verify results",
+            expected_result="Expected result to be defined",
+            created_by=current_user.id,
+            suite_id=1 if TestSuite.query.first() else None
+        )
+        db.session.add(test_case)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Quick test case created', 'id': test_case.id})
+    
+    elif item_type == 'project':
+        # Create a quick project
+        project = Project(
+            name=f"Quick Project - {datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            description="Quick project created from dashboard",
+            created_by=current_user.id
+        )
+        db.session.add(project)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Quick project created', 'id': project.id})
+    
+    return jsonify({'success': False, 'message': 'Invalid item type'})
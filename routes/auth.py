@@ -0,0 +1,462 @@
+"""
+Login, sign-up, session timeout, profile, settings and notification pages
+"""
+from datetime import datetime, timedelta
+from io import BytesIO
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, session, url_for
+from flask_login import current_user, login_required, login_user, logout_user
+from werkzeug.security import check_password_hash, generate_password_hash
+from models import Notification, User, db
+from attachments import AttachmentTooLarge
+from extensions import (attachment_store, image_variants, live_events, login_manager, notifier,
+                        push_unread_counts)
+
+bp = Blueprint('auth', __name__)
+
+@bp.before_app_request
+def check_session_timeout():
+    """Check if user session has expired due to inactivity"""
+    
+    # Skip timeout check for static files and login/logout routes
+    if (request.endpoint and 
+        (request.endpoint.startswith('static') or 
+         request.endpoint in ['auth.login', 'auth.logout', 'auth.signup', 'auth.check_session_status',
+                              'auth.extend_session', 'api.event_stream', 'api.healthz', 'api.readyz'])):
+        return
+    
+    # Skip if user is not logged in
+    if not current_user.is_authenticated:
+        return
+    
+    # Check if session has last_activity timestamp
+    if 'last_activity' in session:
+        last_activity = datetime.fromisoformat(session['last_activity'])
+        timeout_duration = timedelta(minutes=current_app.config['SESSION_TIMEOUT_MINUTES'])
+        
+        # Check if session has expired
+        if datetime.now() - last_activity > timeout_duration:
+            # Clear the session
+            session.clear()
+            logout_user()
+            flash('Your session has expired due to inactivity. Please log in again.', 'warning')
+            return redirect(url_for('auth.login'))
+    
+    # Update last activity timestamp
+    session['last_activity'] = datetime.now().isoformat()
+    session.permanent = True
+
+def session_time_remaining():
+    """Seconds left before the current session times out, or None without activity data"""
+    if 'last_activity' not in session:
+        return None
+    last_activity = datetime.fromisoformat(session['last_activity'])
+    timeout_duration = timedelta(minutes=current_app.config['SESSION_TIMEOUT_MINUTES'])
+    return int((timeout_duration - (datetime.now() - last_activity)).total_seconds())
+
+@bp.route('/check-session-status')
+@login_required
+def check_session_status():
+    """API endpoint to check session status for client-side timeout warnings"""
+    time_remaining = session_time_remaining()
+    if time_remaining is not None:
+        return jsonify({
+            'authenticated': True,
+            'time_remaining_seconds': time_remaining,
+            'timeout_minutes': current_app.config['SESSION_TIMEOUT_MINUTES']
+        })
+    
+    return jsonify({
+        'authenticated': False,
+        'time_remaining_seconds': 0,
+        'timeout_minutes': current_app.config['SESSION_TIMEOUT_MINUTES']
+    })
+
+@bp.route('/extend-session', methods=['POST'])
+@login_required
+def extend_session():
+    """API endpoint to extend user session"""
+    # Update last activity timestamp to extend session
+    session['last_activity'] = datetime.now().isoformat()
+    session.permanent = True
+    
+    # Move the session deadline of the user's open streams
+    live_events.publish('session', {
+        'state': 'active', 'time_remaining_seconds': current_app.config['SESSION_TIMEOUT_MINUTES'] * 60
+    }, user_id=current_user.id)
+    
+    return jsonify({
+        'success': True,
+        'message': 'Session extended successfully',
+        'new_timeout_minutes': current_app.config['SESSION_TIMEOUT_MINUTES']
+    })
+
+@login_manager.user_loader
+def load_user(user_id):
+    return User.query.get(int(user_id))
+
+@bp.route('/')
+def index():
+    if current_user.is_authenticated:
+        return redirect(url_for('projects.dashboard'))
+    return redirect(url_for('auth.login'))
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        user = User.query.filter_by(username=username).first()
+        
+        if user and check_password_hash(user.password_hash, password):
+            if not user.is_active:
+                flash('Your account has been deactivated. Please contact administrator.', 'error')
+                return render_template('login.html')
+            
+            login_user(user)
+            
+            # Set session as permanent and initialize activity timestamp
+            session.permanent = True
+            session['last_activity'] = datetime.now().isoformat()
+            session['login_time'] = datetime.now().isoformat()
+            
+            flash('Login successful', 'success')
+            return redirect(url_for('projects.dashboard'))
+        flash('Invalid credentials', 'error')
+    
+    return render_template('login.html')
+
+@bp.route('/signup', methods=['GET', 'POST'])
+def signup():
+    if request.method == 'POST':
+        username = request.form['username']
+        email = request.form['email']
+        password = request.form['password']
+        role = request.form.get('role', 'tester')
+        
+        # Check if username already exists
+        if User.query.filter_by(username=username).first():
+            flash('Username already exists', 'error')
+            return render_template('signup.html')
+        
+        # Check if email already exists
+        if User.query.filter_by(email=email).first():
+            flash('Email already exists', 'error')
+            return render_template('signup.html')
+        
+        # IMPORTANT: Prevent multiple admin creation
+        if role == 'admin':
+            existing_admin = User.query.filter_by(role='admin').first()
+            if existing_admin:
+                flash('Admin already exists. Only one admin is allowed in the system.', 'error')
+                return render_template('signup.html')
+        
+        user = User(
+            username=username,
+            email=email,
+            password_hash=generate_password_hash(password),
+            role=role
+        )
+        db.session.add(user)
+        db.session.commit()
+        
+        login_user(user)
+        
+        # Set session as permanent and initialize activity timestamp
+        session.permanent = True
+        session['last_activity'] = datetime.now().isoformat()
+        session['login_time'] = datetime.now().isoformat()
+        
+        flash('Account created successfully', 'success')
+        return redirect(url_for('projects.dashboard'))
+    
+    # Check if admin exists for signup form
+    admin_exists = User.query.filter_by(role='admin').first() is not None
+    return render_template('signup.html', admin_exists=admin_exists)
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    return redirect(url_for('auth.login'))
+
+@bp.route('/switch-host')
+def switch_host():
+    """Helper route to switch between localhost and 127.0.0.1"""
+    current_host = request.host
+    if 'localhost' in current_host:
+        new_host = current_host.replace('localhost', '127.0.0.1')
+    else:
+        new_host = current_host.replace('127.0.0.1', 'localhost')
+    
+    return redirect(f"http://{new_host}{request.path}")
+
+@bp.route('/debug/session')
+def debug_session():
+    """Debug route to check session status"""
+    return {
+        'authenticated': current_user.is_authenticated,
+        'username': current_user.username if current_user.is_authenticated else None,
+        'role': current_user.role if current_user.is_authenticated else None,
+        'session_keys': list(session.keys()),
+        'host': request.host,
+        'url': request.url,
+        'remote_addr': request.remote_addr
+    }
+
+@bp.route('/profile')
+@login_required
+def profile():
+    return render_template('profile.html')
+
+@bp.route('/profile/edit', methods=['GET', 'POST'])
+@login_required
+def edit_profile():
+    if request.method == 'POST':
+        current_user.email = request.form['email']
+        current_user.phone = request.form.get('phone', '')
+        current_user.department = request.form.get('department', '')
+        db.session.commit()
+        flash('Profile updated successfully', 'success')
+        return redirect(url_for('auth.profile'))
+    
+    return render_template('edit_profile.html')
+
+@bp.route('/profile/change-password', methods=['POST'])
+@login_required
+def change_password():
+    current_password = request.form['current_password']
+    new_password = request.form['new_password']
+    confirm_password = request.form['confirm_password']
+    
+    if not check_password_hash(current_user.password_hash, current_password):
+        flash('Current password is incorrect', 'error')
+        return redirect(url_for('auth.edit_profile'))
+    
+    if new_password != confirm_password:
+        flash('New passwords do not match', 'error')
+        return redirect(url_for('auth.edit_profile'))
+    
+    if len(new_password) < 6:
+        flash('Password must be at least 6 characters long', 'error')
+        return redirect(url_for('auth.edit_profile'))
+    
+    current_user.password_hash = generate_password_hash(new_password)
+    db.session.commit()
+    flash('Password changed successfully', 'success')
+    return redirect(url_for('auth.profile'))
+
+@bp.route('/profile/enable-2fa', methods=['POST'])
+@login_required
+def enable_2fa():
+    import secrets
+    import base64
+    import pyotp
+    import qrcode
+    import qrcode.image.svg
+    
+    if current_user.two_factor_enabled:
+        flash('Two-factor authentication is already enabled', 'info')
+        return redirect(url_for('auth.edit_profile'))
+    
+    # Generate a secret key for 2FA
+    secret = pyotp.random_base32()
+    current_user.two_factor_secret = secret
+    current_user.two_factor_enabled = True
+    db.session.commit()
+    
+    # Generate QR code URL
+    totp = pyotp.TOTP(secret)
+    qr_url = totp.provisioning_uri(
+        name=current_user.email,
+        issuer_name="TestPro"
+    )
+    
+    # Render the QR code here rather than via a third-party service (works offline, keeps the secret private)
+    qr_svg = BytesIO()
+    qrcode.make(qr_url, image_factory=qrcode.image.svg.SvgPathImage).save(qr_svg)
+    
+    flash('Two-factor authentication enabled successfully', 'success')
+    return jsonify({
+        'success': True,
+        'secret': secret,
+        'qr_url': qr_url,
+        'qr_image': 'data:image/svg+xml;base64,' + base64.b64encode(qr_svg.getvalue()).decode('ascii'),
+        'message': 'Please scan the QR code with your authenticator app'
+    })
+
+@bp.route('/profile/disable-2fa', methods=['POST'])
+@login_required
+def disable_2fa():
+    current_user.two_factor_enabled = False
+    current_user.two_factor_secret = None
+    db.session.commit()
+    flash('Two-factor authentication disabled', 'success')
+    return redirect(url_for('auth.edit_profile'))
+
+@bp.route('/profile/upload-photo', methods=['POST'])
+@login_required
+def upload_profile_photo():
+    if 'photo' not in request.files:
+        flash('No photo selected', 'error')
+        return redirect(url_for('auth.edit_profile'))
+    
+    file = request.files['photo']
+    if file.filename == '':
+        flash('No photo selected', 'error')
+        return redirect(url_for('auth.edit_profile'))
+    
+    if file and allowed_file(file.filename):
+        try:
+            # Stored like any other attachment (deduplicated, on the configured backend)
+            old_photo_id = profile_photo_id(current_user)
+            photo = attachment_store.attach(
+                file.stream, f"profile_{current_user.id}.{file.filename.rsplit('.', 1)[1].lower()}",
+                current_user.id, file.mimetype
+            )
+            db.session.flush()
+            current_user.profile_picture = f'attachments/{photo.id}'
+            if old_photo_id:
+                attachment_store.delete_attachments([old_photo_id])
+            db.session.commit()
+            attachment_store.purge()
+            image_variants.schedule(photo.file_path, photo.file_type)
+            flash('Profile photo updated successfully', 'success')
+        except AttachmentTooLarge as e:
+            db.session.rollback()
+            flash(str(e), 'error')
+    else:
+        flash('Invalid file type. Please upload an image file.', 'error')
+    
+    return redirect(url_for('auth.edit_profile'))
+
+def allowed_file(filename):
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def profile_photo_id(user):
+    """Attachment id of a user's profile photo, if it was uploaded to attachment storage"""
+    if user.profile_picture and user.profile_picture.startswith('attachments/'):
+        return int(user.profile_picture.split('/', 1)[1])
+    return None
+
+@bp.app_template_global()
+def avatar_url(user, variant='avatar'):
+    """URL of a resized profile photo; it changes whenever the photo does, so it caches forever"""
+    photo_id = profile_photo_id(user)
+    if photo_id:
+        return url_for('api.attachment_image', attachment_id=photo_id, variant=variant)
+    if user.profile_picture:
+        return url_for('static', filename='uploads/' + user.profile_picture)
+    return None
+
+@bp.route('/users/<int:user_id>/photo')
+@login_required
+def user_photo(user_id):
+    user = User.query.get_or_404(user_id)
+    if not profile_photo_id(user):
+        return jsonify({'success': False, 'message': 'No profile photo'}), 404
+    return redirect(avatar_url(user, request.args.get('variant', 'avatar')))
+
+@bp.route('/settings/general', methods=['POST'])
+@login_required
+def update_general_settings():
+    current_user.language = request.form.get('language', 'en')
+    current_user.timezone = request.form.get('timezone', 'UTC')
+    current_user.date_format = request.form.get('date_format', 'MM/DD/YYYY')
+    current_user.items_per_page = int(request.form.get('items_per_page', 25))
+    
+    db.session.commit()
+    flash('General settings updated successfully', 'success')
+    return redirect(url_for('auth.settings'))
+
+@bp.route('/settings/notifications', methods=['POST'])
+@login_required
+def update_notification_settings():
+    current_user.email_notifications = 'email_notifications' in request.form
+    current_user.test_failure_alerts = 'test_failure_alerts' in request.form
+    current_user.assignment_notifications = 'assignment_notifications' in request.form
+    current_user.bug_update_notifications = 'bug_update_notifications' in request.form
+    
+    db.session.commit()
+    flash('Notification settings updated successfully', 'success')
+    return redirect(url_for('auth.settings'))
+
+@bp.route('/settings/security', methods=['POST'])
+@login_required
+def update_security_settings():
+    current_password = request.form['current_password']
+    new_password = request.form['new_password']
+    confirm_password = request.form['confirm_password']
+    
+    if not check_password_hash(current_user.password_hash, current_password):
+        flash('Current password is incorrect', 'error')
+        return redirect(url_for('auth.settings'))
+    
+    if new_password != confirm_password:
+        flash('New passwords do not match', 'error')
+        return redirect(url_for('auth.settings'))
+    
+    if len(new_password) < 6:
+        flash('Password must be at least 6 characters long', 'error')
+        return redirect(url_for('auth.settings'))
+    
+    current_user.password_hash = generate_password_hash(new_password)
+    db.session.commit()
+    flash('Password updated successfully', 'success')
+    return redirect(url_for('auth.settings'))
+
+@bp.route('/settings/preferences', methods=['POST'])
+@login_required
+def update_preferences():
+    current_user.theme = request.form.get('theme', 'light')
+    current_user.compact_view = 'compact_view' in request.form
+    current_user.animations_enabled = 'animations_enabled' in request.form
+    
+    db.session.commit()
+    flash('Display preferences updated successfully', 'success')
+    return redirect(url_for('auth.settings'))
+
+@bp.route('/settings')
+@login_required
+def settings():
+    return render_template('settings.html')
+
+@bp.app_context_processor
+def inject_unread_notifications():
+    # Served from the notifier's cached counter, not a COUNT(*) per page
+    if current_user.is_authenticated:
+        return {'unread_notifications': notifier.unread_count(current_user.id)}
+    return {'unread_notifications': 0}
+
+@bp.route('/notifications')
+@login_required
+def notifications():
+    page = request.args.get('page', 1, type=int)
+    pagination = Notification.query.filter_by(user_id=current_user.id).order_by(
+        Notification.created_at.desc(), Notification.id.desc()
+    ).paginate(page=page, per_page=50, error_out=False)
+    return render_template('notifications.html', pagination=pagination, notifications=pagination.items)
+
+@bp.route('/notifications/<int:notification_id>/read', methods=['POST'])
+@login_required
+def mark_notification_read(notification_id):
+    try:
+        notifier.mark_read(current_user.id, [notification_id])
+        db.session.commit()
+        push_unread_counts([current_user.id])
+        return jsonify({'success': True, 'unread_count': notifier.unread_count(current_user.id)})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/notifications/read-all', methods=['POST'])
+@login_required
+def mark_all_notifications_read():
+    try:
+        marked = notifier.mark_read(current_user.id)
+        db.session.commit()
+        push_unread_counts([current_user.id])
+        return jsonify({'success': True, 'message': f'{marked} notification(s) marked as read', 'unread_count': 0})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
@@ -0,0 +1,145 @@
+"""
+Bug tracking
+"""
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from models import Bug, Comment, TestCase, db
+from list_filters import BUG_LISTING
+from list_rows import bug_rows
+from bulk_edit import BUG_EDITS, BulkEdit, BulkEditError
+from extensions import attachment_store, live_events, notifier, webhooks
+
+bp = Blueprint('bugs', __name__)
+
+@bp.route('/bugs')
+@login_required
+def bugs():
+    filters = BUG_LISTING.query()
+    bugs = bug_rows(*filters.criteria(), order_by=filters.order_by(), limit=filters.per_page, offset=filters.offset)
+    return render_template('bugs.html', bugs=bugs, filters=filters)
+
+@bp.route('/bugs/<int:bug_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_bug(bug_id):
+    bug = Bug.query.get_or_404(bug_id)
+    
+    if request.method == 'POST':
+        bug.title = request.form['title']
+        bug.description = request.form['description']
+        bug.severity = request.form['severity']
+        bug.priority = request.form['priority']
+        bug.status = request.form['status']
+        bug.type = request.form['type']
+        db.session.commit()
+        flash('Bug updated successfully', 'success')
+        return redirect(url_for('bugs.bugs'))
+    
+    test_cases = TestCase.query.all()
+    return render_template('edit_bug.html', bug=bug, test_cases=test_cases)
+
+@bp.route('/bugs/<int:bug_id>/update-status', methods=['POST'])
+@login_required
+def update_bug_status(bug_id):
+    try:
+        data = request.get_json()
+        bug = Bug.query.get_or_404(bug_id)
+        old_status = bug.status
+        bug.status = data.get('status')
+        if bug.status != old_status:
+            webhooks.enqueue('bug.status_changed', {
+                'bug_id': bug.id,
+                'title': bug.title,
+                'old_status': old_status,
+                'status': bug.status,
+                'severity': bug.severity,
+                'priority': bug.priority,
+                'test_case_id': bug.test_case_id,
+                'updated_by': current_user.username
+            })
+        db.session.commit()
+        
+        if bug.status != old_status:
+            live_events.publish('bug_status', {
+                'id': bug.id,
+                'title': bug.title,
+                'old_status': old_status,
+                'status': bug.status,
+                'updated_by': current_user.username
+            })
+            notifier.publish(
+                'bug_update',
+                f'Bug #{bug.id} is now {bug.status}',
+                f'{current_user.username} moved "{bug.title}" from {old_status} to {bug.status}',
+                recipient_ids=[bug.reported_by, bug.assigned_to],
+                exclude_user_id=current_user.id
+            )
+        
+        # Add comment if provided
+        if data.get('comments'):
+            comment = Comment(
+                content=data.get('comments'),
+                bug_id=bug_id,
+                created_by=current_user.id
+            )
+            db.session.add(comment)
+            db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Bug status updated successfully'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/bugs/bulk-edit', methods=['POST'])
+@login_required
+def bulk_edit_bugs():
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied. Only admin or manager can bulk edit bugs.'}), 403
+    try:
+        edit = BulkEdit(BUG_EDITS, request.get_json() or {}, current_user)
+        updated_count = edit.apply()
+        return jsonify({'success': True, 'matched_count': edit.matched, 'updated_count': updated_count,
+                        'message': f'Updated {updated_count} bug(s)'})
+    except BulkEditError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error updating bugs: {str(e)}'})
+
+@bp.route('/bugs/<int:bug_id>/delete', methods=['POST'])
+@login_required
+def delete_bug(bug_id):
+    try:
+        bug = Bug.query.get_or_404(bug_id)
+        attachment_store.delete_for(bug_ids=[bug.id])
+        db.session.delete(bug)
+        db.session.commit()
+        attachment_store.purge()
+        return jsonify({'success': True, 'message': 'Bug deleted successfully'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/bugs/create', methods=['GET', 'POST'])
+@login_required
+def create_bug():
+    if request.method == 'POST':
+        bug = Bug(
+            title=request.form['title'],
+            description=request.form['description'],
+            severity=request.form['severity'],
+            priority=request.form['priority'],
+            type=request.form.get('type', 'Functional'),
+            test_case_id=request.form.get('test_case_id') if request.form.get('test_case_id') else None,
+            steps_to_reproduce=request.form.get('steps_to_reproduce'),
+            expected_result=request.form.get('expected_result'),
+            actual_result=request.form.get('actual_result'),
+            environment=request.form.get('environment'),
+            status='Open',
+            reported_by=current_user.id
+        )
+        db.session.add(bug)
+        db.session.commit()
+        flash('Bug reported successfully', 'success')
+        return redirect(url_for('bugs.bugs'))
+    
+    execution_id = request.args.get('execution_id')
+    test_cases = TestCase.query.all()
+    return render_template('create_bug.html', execution_id=execution_id, test_cases=test_cases)
@@ -0,0 +1,357 @@
+"""
+Test cases, test cycles and assignments
+"""
+from datetime import datetime
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from models import (Assignment, Bug, Project, TestCase, TestCycle, TestCycleCase, TestCycleProgress, TestSuite,
+                    User, db)
+from case_state import forget_case_state
+from test_cycles import (CYCLE_FILTERS, CYCLE_STATUSES, create_cycle, cycle_progress, delete_cycle,
+                         progress_dict, remove_cases_from_cycles)
+from list_filters import TEST_CASE_LISTING
+from list_rows import test_case_rows
+from bulk_edit import TEST_CASE_EDITS, BulkEdit, BulkEditError
+from cloning import copy_test_case
+from traceability import invalidate_case_coverage
+from extensions import attachment_store, notifier
+
+bp = Blueprint('cases', __name__)
+
+@bp.route('/test-cases')
+@login_required
+def test_cases():
+    filters = TEST_CASE_LISTING.query()
+    cases = test_case_rows(*filters.criteria(), with_state=True, order_by=filters.order_by(), limit=filters.per_page,
+                           offset=filters.offset)
+    return render_template('test_cases.html', cases=cases, filters=filters)
+
+@bp.route('/test-cases/create', methods=['GET', 'POST'])
+@login_required
+def create_test_case():
+    if request.method == 'POST':
+        test_case = TestCase(
+            title=request.form['title'],
+            description=request.form['description'],
+            preconditions=request.form['preconditions'],
+            test_steps=request.form['test_steps'],
+            expected_result=request.form['expected_result'],
+            test_data=request.form['test_data'],
+            priority=request.form['priority'],
+            suite_id=request.form['suite_id'],
+            created_by=current_user.id
+        )
+        db.session.add(test_case)
+        db.session.commit()
+        flash('Test case created successfully')
+        
+        # If suite_id was provided, redirect back to the suite's test cases page
+        if request.form.get('suite_id'):
+            return redirect(url_for('projects.test_suite_test_cases', suite_id=request.form['suite_id']))
+        else:
+            return redirect(url_for('cases.test_cases'))
+    
+    suites = TestSuite.query.all()
+    # Get the pre-selected suite_id from URL parameters
+    selected_suite_id = request.args.get('suite_id', type=int)
+    return render_template('create_test_case.html', suites=suites, selected_suite_id=selected_suite_id)
+
+@bp.route('/test-cases/<int:case_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_test_case(case_id):
+    test_case = TestCase.query.get_or_404(case_id)
+    
+    if request.method == 'POST':
+        test_case.title = request.form['title']
+        test_case.description = request.form['description']
+        test_case.preconditions = request.form['preconditions']
+        test_case.test_steps = request.form['test_steps']
+        test_case.expected_result = request.form['expected_result']
+        test_case.test_data = request.form['test_data']
+        test_case.priority = request.form['priority']
+        test_case.suite_id = request.form['suite_id']
+        test_case.updated_at = datetime.utcnow()
+        
+        db.session.commit()
+        flash('Test case updated successfully')
+        return redirect(url_for('cases.test_cases'))
+    
+    suites = TestSuite.query.all()
+    return render_template('edit_test_case.html', test_case=test_case, suites=suites)
+
+@bp.route('/test-cases/<int:case_id>/delete', methods=['POST'])
+@login_required
+def delete_test_case(case_id):
+    try:
+        test_case = TestCase.query.get_or_404(case_id)
+        invalidate_case_coverage(test_case)
+        remove_cases_from_cycles([test_case.id])
+        forget_case_state([test_case.id])
+        attachment_store.delete_for(test_case_ids=[test_case.id])
+        db.session.delete(test_case)
+        db.session.commit()
+        attachment_store.purge()
+        
+        # Check if it's an AJAX request
+        if request.headers.get('Content-Type') == 'application/json':
+            return jsonify({'success': True, 'message': 'Test case deleted successfully'})
+        else:
+            flash('Test case deleted successfully')
+            return redirect(url_for('cases.test_cases'))
+    except Exception as e:
+        if request.headers.get('Content-Type') == 'application/json':
+            return jsonify({'success': False, 'message': str(e)})
+        else:
+            flash(f'Error deleting test case: {str(e)}', 'error')
+            return redirect(url_for('cases.test_cases'))
+
+@bp.route('/test-cycles')
+@login_required
+def test_cycles():
+    # Cycles with their progress counters in one query
+    cycles = db.session.query(TestCycle, TestCycleProgress, Project.name).outerjoin(
+        TestCycleProgress, TestCycleProgress.test_cycle_id == TestCycle.id
+    ).outerjoin(Project, Project.id == TestCycle.project_id).order_by(TestCycle.created_at.desc()).all()
+    cycles = [{'cycle': cycle, 'progress': progress_dict(progress), 'project_name': project_name}
+              for cycle, progress, project_name in cycles]
+    return render_template('test_cycles.html', cycles=cycles)
+
+@bp.route('/test-cycles/create', methods=['GET', 'POST'])
+@login_required
+def create_test_cycle():
+    if request.method == 'POST':
+        filters = {field: request.form.get(field) for field in CYCLE_FILTERS}
+        cycle = create_cycle(
+            name=request.form['name'],
+            description=request.form.get('description'),
+            project_id=request.form.get('project_id') or None,
+            suite_id=request.form.get('suite_id', type=int),
+            filters=filters,
+            start_date=datetime.strptime(request.form['start_date'], '%Y-%m-%d') if request.form.get('start_date') else None,
+            end_date=datetime.strptime(request.form['end_date'], '%Y-%m-%d') if request.form.get('end_date') else None,
+            created_by=current_user.id
+        )
+        db.session.commit()
+        flash(f'Test cycle created with {cycle_progress(cycle.id)["planned"]} planned test case(s)', 'success')
+        return redirect(url_for('cases.view_test_cycle', cycle_id=cycle.id))
+    
+    projects = Project.query.all()
+    suites = TestSuite.query.all()
+    return render_template('create_test_cycle.html', projects=projects, suites=suites)
+
+@bp.route('/test-cycles/<int:cycle_id>')
+@login_required
+def view_test_cycle(cycle_id):
+    cycle = TestCycle.query.get_or_404(cycle_id)
+    progress = cycle_progress(cycle_id)
+    
+    status_filter = request.args.get('status')
+    planned = db.session.query(TestCycleCase, TestCase.title, TestCase.priority).join(
+        TestCase, TestCase.id == TestCycleCase.test_case_id
+    ).filter(TestCycleCase.test_cycle_id == cycle_id)
+    if status_filter:
+        planned = planned.filter(TestCycleCase.status == status_filter)
+    planned = planned.order_by(TestCycleCase.id).all()
+    
+    return render_template('test_cycle.html', cycle=cycle, progress=progress, planned=planned, status_filter=status_filter)
+
+@bp.route('/test-cycles/<int:cycle_id>/status', methods=['POST'])
+@login_required
+def update_test_cycle_status(cycle_id):
+    try:
+        cycle = TestCycle.query.get_or_404(cycle_id)
+        data = request.get_json() or {}
+        status = data.get('status', cycle.status)
+        if status not in CYCLE_STATUSES:
+            return jsonify({'success': False, 'message': f'Status must be one of {", ".join(CYCLE_STATUSES)}'}), 400
+        cycle.status = status
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Test cycle status updated successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/test-cycles/<int:cycle_id>/delete', methods=['POST'])
+@login_required
+def delete_test_cycle(cycle_id):
+    try:
+        cycle = TestCycle.query.get_or_404(cycle_id)
+        
+        if current_user.role not in ['admin', 'manager'] and cycle.created_by != current_user.id:
+            return jsonify({'success': False, 'message': 'Access denied. Only admin, manager, or cycle creator can delete test cycles.'})
+        
+        delete_cycle(cycle)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Test cycle deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error deleting test cycle: {str(e)}'})
+
+@bp.route('/test-cases/bulk-edit', methods=['POST'])
+@login_required
+def bulk_edit_test_cases():
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied. Only admin or manager can bulk edit test cases.'}), 403
+    try:
+        edit = BulkEdit(TEST_CASE_EDITS, request.get_json() or {}, current_user)
+        updated_count = edit.apply()
+        return jsonify({'success': True, 'matched_count': edit.matched, 'updated_count': updated_count,
+                        'message': f'Updated {updated_count} test case(s)'})
+    except BulkEditError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error updating test cases: {str(e)}'})
+
+@bp.route('/test-cases/<int:case_id>/duplicate', methods=['POST'])
+@login_required
+def duplicate_test_case(case_id):
+    try:
+        original_case = TestCase.query.get_or_404(case_id)
+        new_case = copy_test_case(original_case, current_user.id)
+        
+        db.session.add(new_case)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Test case duplicated successfully'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/test-cases/<int:case_id>/delete', methods=['POST'])
+@login_required
+def delete_test_case_ajax(case_id):
+    try:
+        test_case = TestCase.query.get_or_404(case_id)
+        invalidate_case_coverage(test_case)
+        remove_cases_from_cycles([test_case.id])
+        forget_case_state([test_case.id])
+        attachment_store.delete_for(test_case_ids=[test_case.id])
+        db.session.delete(test_case)
+        db.session.commit()
+        attachment_store.purge()
+        return jsonify({'success': True, 'message': 'Test case deleted successfully'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/assignments/<int:assignment_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_assignment(assignment_id):
+    assignment = Assignment.query.get_or_404(assignment_id)
+    
+    if request.method == 'POST':
+        assignment.title = request.form['title']
+        assignment.description = request.form['description']
+        assignment.priority = request.form['priority']
+        assignment.due_date = datetime.strptime(request.form['due_date'], '%Y-%m-%d') if request.form['due_date'] else None
+        db.session.commit()
+        flash('Assignment updated successfully', 'success')
+        return redirect(url_for('cases.assignments'))
+    
+    users = User.query.filter_by(is_active=True).all()
+    return render_template('edit_assignment.html', assignment=assignment, users=users)
+
+@bp.route('/assignments/<int:assignment_id>/complete', methods=['POST'])
+@login_required
+def complete_assignment(assignment_id):
+    try:
+        assignment = Assignment.query.get_or_404(assignment_id)
+        assignment.status = 'Completed'
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Assignment marked as complete'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/assignments')
+@login_required
+def assignments():
+    if current_user.role not in ['manager', 'admin']:
+        flash('Access denied', 'error')
+        return redirect(url_for('projects.dashboard'))
+    
+    assignments = Assignment.query.all()
+    users = User.query.filter_by(is_active=True).all()
+    return render_template('assignments.html', assignments=assignments, users=users)
+
+@bp.route('/assignments/create', methods=['GET', 'POST'])
+@login_required
+def create_assignment():
+    if current_user.role not in ['manager', 'admin']:
+        flash('Access denied', 'error')
+        return redirect(url_for('projects.dashboard'))
+    
+    if request.method == 'POST':
+        assignment = Assignment(
+            title=request.form['title'],
+            description=request.form['description'],
+            type=request.form['type'],
+            assigned_to=request.form['assigned_to'],
+            assigned_by=current_user.id,
+            due_date=datetime.strptime(request.form['due_date'], '%Y-%m-%d') if request.form['due_date'] else None,
+            priority=request.form['priority'],
+            test_case_id=request.form.get('test_case_id') if request.form.get('test_case_id') else None,
+            bug_id=request.form.get('bug_id') if request.form.get('bug_id') else None
+        )
+        db.session.add(assignment)
+        db.session.commit()
+        
+        notifier.publish(
+            'assignment',
+            'New Assignment',
+            f'You have been assigned: {assignment.title}',
+            recipient_ids=[int(assignment.assigned_to)]
+        )
+        
+        flash('Assignment created successfully', 'success')
+        return redirect(url_for('cases.assignments'))
+    
+    users = User.query.filter_by(is_active=True).all()
+    test_cases = TestCase.query.all()
+    bugs = Bug.query.all()
+    return render_template('create_assignment.html', users=users, test_cases=test_cases, bugs=bugs)
+
+@bp.route('/assignments/<int:assignment_id>/delete', methods=['POST'])
+@login_required
+def delete_assignment(assignment_id):
+    try:
+        assignment = Assignment.query.get_or_404(assignment_id)
+        
+        # Check permissions - admin, manager, assignment creator, or assigned user can delete
+        if (current_user.role not in ['admin', 'manager'] and 
+            assignment.created_by != current_user.id and 
+            assignment.assigned_to != current_user.id):
+            return jsonify({'success': False, 'message': 'Access denied. Only admin, manager, assignment creator, or assigned user can delete assignments.'})
+        
+        db.session.delete(assignment)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Assignment deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error deleting assignment: {str(e)}'})
+
+@bp.route('/assignments/bulk-delete', methods=['POST'])
+@login_required
+def bulk_delete_assignments():
+    try:
+        data = request.get_json()
+        assignment_ids = data.get('assignment_ids', [])
+        
+        if not assignment_ids:
+            return jsonify({'success': False, 'message': 'No assignments selected'})
+        
+        deleted_count = 0
+        for assignment_id in assignment_ids:
+            try:
+                assignment = Assignment.query.get(assignment_id)
+                if assignment and (current_user.role in ['admin', 'manager'] or 
+                                 assignment.created_by == current_user.id or 
+                                 assignment.assigned_to == current_user.id):
+                    db.session.delete(assignment)
+                    deleted_count += 1
+            except:
+                pass
+        
+        db.session.commit()
+        return jsonify({'success': True, 'deleted_count': deleted_count, 'message': f'Successfully deleted {deleted_count} assignment(s)'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error deleting assignments: {str(e)}'})
@@ -0,0 +1,191 @@
+"""
+Test execution and the execution history
+"""
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from models import Bug, Comment, TestCase, TestCycle, TestCycleCase, TestExecution, db
+from case_state import forget_case_state, record_execution_state, refresh_case_state
+from environments import environment_names
+from list_filters import EXECUTION_LISTING
+from list_rows import execution_rows
+from test_cycles import forget_execution, record_execution
+from traceability import invalidate_case_coverage, invalidate_coverage
+from extensions import attachment_store, live_events, notifier, webhooks
+
+bp = Blueprint('executions', __name__)
+
+@bp.route('/test-cases/<int:case_id>/execute', methods=['GET', 'POST'])
+@login_required
+def execute_test_case(case_id):
+    test_case = TestCase.query.get_or_404(case_id)
+    
+    if request.method == 'POST':
+        execution = TestExecution(
+            test_case_id=case_id,
+            executed_by=current_user.id,
+            status=request.form['status'],
+            actual_result=request.form['actual_result'],
+            comments=request.form['comments'],
+            environment=request.form['environment'],
+            test_cycle_id=request.form.get('test_cycle_id') or None
+        )
+        db.session.add(execution)
+        db.session.flush()
+        # Latest-result state, cycle plan and progress counters change in the same transaction
+        record_execution_state(execution)
+        record_execution(execution)
+        if execution.status == 'Fail':
+            webhooks.enqueue('execution.failed', {
+                'execution_id': execution.id,
+                'test_case_id': case_id,
+                'test_case_title': test_case.title,
+                'project_id': test_case.project_id,
+                'status': execution.status,
+                'actual_result': execution.actual_result,
+                'environment': execution.environment,
+                'test_cycle_id': execution.test_cycle_id,
+                'executed_by': current_user.username,
+                'executed_at': execution.execution_date.isoformat() + 'Z'
+            })
+        invalidate_case_coverage(test_case)
+        db.session.commit()
+        
+        if request.form['status'] == 'Fail' and request.form.get('create_bug'):
+            bug = Bug(
+                title=f"Bug from test case: {test_case.title}",
+                description=request.form['actual_result'],
+                test_case_id=case_id,
+                reported_by=current_user.id
+            )
+            db.session.add(bug)
+            db.session.commit()
+        
+        live_events.publish('execution', {
+            'id': execution.id,
+            'test_case_id': case_id,
+            'test_case_title': test_case.title,
+            'status': execution.status,
+            'environment': execution.environment,
+            'test_cycle_id': execution.test_cycle_id,
+            'executed_by': current_user.username
+        })
+        
+        if execution.status == 'Fail':
+            notifier.publish(
+                'test_failure',
+                f'Test failed: {test_case.title}',
+                f'{current_user.username} recorded a failure'
+                + (f' on {execution.environment}' if execution.environment else '')
+                + (f': {execution.actual_result}' if execution.actual_result else ''),
+                recipient_ids=[test_case.created_by, test_case.assigned_to],
+                recipient_roles=['manager', 'admin'],
+                type='error',
+                exclude_user_id=current_user.id
+            )
+        
+        flash('Test execution recorded successfully')
+        if execution.test_cycle_id:
+            return redirect(url_for('cases.view_test_cycle', cycle_id=execution.test_cycle_id))
+        return redirect(url_for('cases.test_cases'))
+    
+    # Cycles that plan this case, so the execution can be recorded against one
+    cycles = TestCycle.query.join(TestCycleCase, TestCycleCase.test_cycle_id == TestCycle.id).filter(
+        TestCycleCase.test_case_id == case_id, TestCycle.status != 'Completed'
+    ).order_by(TestCycle.created_at.desc()).all()
+    selected_cycle_id = request.args.get('cycle_id', type=int)
+    environments = environment_names(test_case.project_id)
+    return render_template('execute_test_case.html', test_case=test_case, cycles=cycles,
+                           selected_cycle_id=selected_cycle_id, environments=environments)
+
+@bp.route('/test-executions')
+@login_required
+def test_executions():
+    filters = EXECUTION_LISTING.query()
+    executions = execution_rows(*filters.criteria(), order_by=filters.order_by(), limit=filters.per_page,
+                                offset=filters.offset)
+    return render_template('test_executions.html', executions=executions, filters=filters)
+
+@bp.route('/api/add-execution-comment', methods=['POST'])
+@login_required
+def add_execution_comment():
+    try:
+        data = request.get_json()
+        execution_id = data.get('execution_id')
+        comment_text = data.get('comment')
+        
+        if not execution_id or not comment_text:
+            return jsonify({'success': False, 'message': 'Missing required data'})
+        
+        comment = Comment(
+            content=comment_text,
+            test_execution_id=execution_id,
+            created_by=current_user.id
+        )
+        db.session.add(comment)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Comment added successfully'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/test-executions/<int:execution_id>/delete', methods=['POST'])
+@login_required
+def delete_test_execution(execution_id):
+    try:
+        execution = TestExecution.query.get_or_404(execution_id)
+        
+        # Check permissions - admin, manager, or execution creator can delete
+        if current_user.role not in ['admin', 'manager'] and execution.executed_by != current_user.id:
+            return jsonify({'success': False, 'message': 'Access denied. Only admin, manager, or execution creator can delete test executions.'})
+        
+        test_case = TestCase.query.get(execution.test_case_id) if execution.test_case_id else None
+        forget_execution(execution)
+        forget_case_state([execution.test_case_id])
+        attachment_store.delete_for(execution_ids=[execution.id])
+        db.session.delete(execution)
+        db.session.flush()
+        refresh_case_state([execution.test_case_id])
+        invalidate_case_coverage(test_case)
+        db.session.commit()
+        attachment_store.purge()
+        
+        return jsonify({'success': True, 'message': 'Test execution deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error deleting test execution: {str(e)}'})
+
+@bp.route('/test-executions/bulk-delete', methods=['POST'])
+@login_required
+def bulk_delete_test_executions():
+    try:
+        data = request.get_json()
+        execution_ids = data.get('execution_ids', [])
+        
+        if not execution_ids:
+            return jsonify({'success': False, 'message': 'No test executions selected'})
+        
+        deleted_count = 0
+        affected_case_ids = set()
+        for execution_id in execution_ids:
+            try:
+                execution = TestExecution.query.get(execution_id)
+                if execution and (current_user.role in ['admin', 'manager'] or execution.executed_by == current_user.id):
+                    forget_execution(execution)
+                    affected_case_ids.add(execution.test_case_id)
+                    forget_case_state([execution.test_case_id])
+                    attachment_store.delete_for(execution_ids=[execution.id])
+                    db.session.delete(execution)
+                    deleted_count += 1
+            except:
+                pass
+        
+        # Recompute latest state of the touched cases in one pass
+        db.session.flush()
+        refresh_case_state(list(affected_case_ids))
+        invalidate_coverage()
+        db.session.commit()
+        attachment_store.purge()
+        return jsonify({'success': True, 'deleted_count': deleted_count, 'message': f'Successfully deleted {deleted_count} test execution(s)'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error deleting test executions: {str(e)}'})
@@ -0,0 +1,714 @@
+"""
+Dashboard, projects, test suites, requirements, environments and reports
+"""
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from sqlalchemy import text
+from models import (Bug, CloneJob, Project, Requirement, TestCase, TestCycle, TestEnvironment, TestExecution,
+                    TestSuite, db)
+from case_state import forget_case_state
+from cloning import CloneError, job_dict
+from change_log import delete_rows
+from environments import (MATRIX_PAGE_SIZE, environment_name_error, environment_names, environment_summary,
+                          matrix_total, rename_environment)
+from execution_archive import execution_status_counts, execution_trend
+from list_rows import requirement_rows, test_case_rows
+from suite_tree import (add_suite, move_suite, remove_suite, subtree_case_counts, subtree_ids,
+                        subtree_test_cases, tree_nodes)
+from test_cycles import delete_cycle, rebuild_progress, release_executions, remove_cases_from_cycles
+from traceability import (apply_requirement_links, build_traceability_matrix, invalidate_coverage,
+                          project_coverage)
+from extensions import attachment_store, clone_jobs
+
+bp = Blueprint('projects', __name__)
+
+@bp.route('/dashboard')
+@login_required
+def dashboard():
+    execution_counts = execution_status_counts()
+    total_executions = sum(execution_counts.values())
+    stats = {
+        'total_test_cases': TestCase.query.count(),
+        'total_executions': total_executions,
+        'total_bugs': Bug.query.count(),
+        'pass_rate': 0
+    }
+    
+    if total_executions > 0:
+        passed_executions = execution_counts.get('Pass', 0)
+        stats['pass_rate'] = round((passed_executions / total_executions) * 100, 2)
+    
+    recent_executions = TestExecution.query.order_by(TestExecution.execution_date.desc()).limit(5).all()
+    
+    return render_template('dashboard.html', stats=stats, recent_executions=recent_executions,
+                           trend=execution_trend())
+
+@bp.route('/projects')
+@login_required
+def projects():
+    projects = Project.query.all()
+    return render_template('projects.html', projects=projects)
+
+@bp.route('/projects/create', methods=['GET', 'POST'])
+@login_required
+def create_project():
+    if request.method == 'POST':
+        project = Project(
+            name=request.form['name'],
+            description=request.form['description'],
+            created_by=current_user.id
+        )
+        db.session.add(project)
+        db.session.commit()
+        flash('Project created successfully')
+        return redirect(url_for('projects.projects'))
+    
+    return render_template('create_project.html')
+
+@bp.route('/test-suites')
+@login_required
+def test_suites():
+    suites = TestSuite.query.all()
+    projects = Project.query.all()
+    # Test cases in each suite's subtree, counted in one grouped query
+    case_counts = subtree_case_counts()
+    return render_template('test_suites.html', suites=suites, projects=projects, case_counts=case_counts)
+
+@bp.route('/test-suites/create', methods=['GET', 'POST'])
+@login_required
+def create_test_suite():
+    if request.method == 'POST':
+        suite = TestSuite(
+            name=request.form['name'],
+            description=request.form['description'],
+            project_id=request.form['project_id'],
+            parent_suite_id=request.form.get('parent_suite_id') or None
+        )
+        db.session.add(suite)
+        db.session.flush()
+        add_suite(suite)
+        db.session.commit()
+        flash('Test suite created successfully')
+        return redirect(url_for('projects.test_suites'))
+    
+    projects = Project.query.all()
+    suites = TestSuite.query.all()
+    selected_parent_id = request.args.get('parent_suite_id', type=int)
+    return render_template('create_test_suite.html', projects=projects, suites=suites, selected_parent_id=selected_parent_id)
+
+@bp.route('/environments', methods=['GET', 'POST'])
+@login_required
+def environments():
+    if request.method == 'POST':
+        if current_user.role not in ['admin', 'manager']:
+            flash('Access denied. Only admin and manager can manage environments.', 'error')
+            return redirect(url_for('projects.environments'))
+        
+        name = request.form.get('name', '').strip()
+        project_id = request.form.get('project_id', type=int)
+        error = environment_name_error(name, project_id)
+        if error:
+            flash(error, 'error')
+            return redirect(url_for('projects.environments'))
+        environment = TestEnvironment(
+            name=name,
+            description=request.form.get('description'),
+            url=request.form.get('url'),
+            status=request.form.get('status', 'Active'),
+            project_id=project_id
+        )
+        db.session.add(environment)
+        db.session.commit()
+        flash('Environment created successfully', 'success')
+        return redirect(url_for('projects.environments'))
+    
+    environment_list = db.session.query(TestEnvironment, Project.name).outerjoin(
+        Project, Project.id == TestEnvironment.project_id
+    ).order_by(TestEnvironment.name).all()
+    projects = Project.query.all()
+    return render_template('environments.html', environments=environment_list, projects=projects)
+
+@bp.route('/environments/<int:environment_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_environment(environment_id):
+    environment = TestEnvironment.query.get_or_404(environment_id)
+    
+    if request.method == 'POST':
+        if current_user.role not in ['admin', 'manager']:
+            flash('Access denied. Only admin and manager can manage environments.', 'error')
+            return redirect(url_for('projects.environments'))
+        
+        name = request.form.get('name', '').strip()
+        project_id = request.form.get('project_id', type=int)
+        error = environment_name_error(name, project_id, environment.id)
+        if error:
+            flash(error, 'error')
+            return redirect(url_for('projects.edit_environment', environment_id=environment.id))
+        # Executions recorded against the old name follow the rename (in the environment's current project)
+        rename_environment(environment, name)
+        environment.description = request.form.get('description')
+        environment.url = request.form.get('url')
+        environment.status = request.form.get('status', 'Active')
+        environment.project_id = project_id
+        db.session.commit()
+        flash('Environment updated successfully', 'success')
+        return redirect(url_for('projects.environments'))
+    
+    projects = Project.query.all()
+    return render_template('edit_environment.html', environment=environment, projects=projects)
+
+@bp.route('/environments/<int:environment_id>/delete', methods=['POST'])
+@login_required
+def delete_environment(environment_id):
+    try:
+        if current_user.role not in ['admin', 'manager']:
+            return jsonify({'success': False, 'message': 'Access denied. Only admin and manager can delete environments.'})
+        
+        environment = TestEnvironment.query.get_or_404(environment_id)
+        db.session.delete(environment)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Environment deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error deleting environment: {str(e)}'})
+
+@bp.route('/reports/environment-matrix')
+@login_required
+def environment_matrix():
+    """Test cases x environments with the latest status in each cell; rows load as they scroll into view"""
+    project_id = request.args.get('project_id', type=int)
+    environment_list = environment_names(project_id)
+    return render_template('environment_matrix.html',
+                           environments=environment_list,
+                           summary=environment_summary(environment_list, project_id),
+                           total=matrix_total(project_id),
+                           page_size=MATRIX_PAGE_SIZE,
+                           projects=Project.query.all(),
+                           selected_project_id=project_id)
+
+@bp.route('/reports')
+@login_required
+def reports():
+    if current_user.role not in ['manager', 'admin']:
+        flash('Access denied')
+        return redirect(url_for('projects.dashboard'))
+    
+    # Generate report data
+    total_cases = TestCase.query.count()
+    execution_counts = execution_status_counts()
+    total_executions = sum(execution_counts.values())
+    passed = execution_counts.get('Pass', 0)
+    failed = execution_counts.get('Fail', 0)
+    blocked = execution_counts.get('Blocked', 0)
+    
+    pass_rate = (passed / total_executions * 100) if total_executions > 0 else 0
+    
+    report_data = {
+        'total_cases': total_cases,
+        'total_executions': total_executions,
+        'passed': passed,
+        'failed': failed,
+        'blocked': blocked,
+        'pass_rate': round(pass_rate, 2)
+    }
+    
+    return render_template('reports.html', report_data=report_data)
+
+@bp.route('/projects/<int:project_id>/test-cases')
+@login_required
+def project_test_cases(project_id):
+    project = Project.query.get_or_404(project_id)
+    test_cases = test_case_rows(TestCase.project_id == project_id)
+    test_suites = TestSuite.query.filter_by(project_id=project_id).all()
+    return render_template('project_test_cases.html', project=project, test_cases=test_cases, test_suites=test_suites)
+
+@bp.route('/projects/<int:project_id>/reports')
+@login_required
+def project_reports(project_id):
+    project = Project.query.get_or_404(project_id)
+    
+    # Get project statistics
+    total_test_cases = TestCase.query.filter_by(project_id=project_id).count()
+    execution_counts = execution_status_counts(project_id)
+    total_executions = sum(execution_counts.values())
+    passed_executions = execution_counts.get('Pass', 0)
+    failed_executions = execution_counts.get('Fail', 0)
+    total_bugs = Bug.query.join(TestCase).filter(TestCase.project_id == project_id).count()
+    total_requirements = Requirement.query.filter_by(project_id=project_id).count()
+    
+    stats = {
+        'total_test_cases': total_test_cases,
+        'total_executions': total_executions,
+        'passed_executions': passed_executions,
+        'failed_executions': failed_executions,
+        'total_bugs': total_bugs,
+        'total_requirements': total_requirements,
+        'pass_rate': (passed_executions / total_executions * 100) if total_executions > 0 else 0
+    }
+    
+    return render_template('project_reports.html', project=project, stats=stats)
+
+@bp.route('/projects/<int:project_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_project(project_id):
+    project = Project.query.get_or_404(project_id)
+    
+    if request.method == 'POST':
+        project.name = request.form['name']
+        project.description = request.form['description']
+        project.status = request.form.get('status', 'Active')
+        db.session.commit()
+        flash('Project updated successfully', 'success')
+        return redirect(url_for('projects.projects'))
+    
+    return render_template('edit_project.html', project=project)
+
+@bp.route('/projects/bulk-delete', methods=['POST'])
+@login_required
+def bulk_delete_projects():
+    try:
+        # Check if user has permission
+        if current_user.role not in ['admin', 'manager']:
+            return jsonify({'success': False, 'message': 'Access denied. Only admin and manager can bulk delete projects.'})
+        
+        data = request.get_json()
+        project_ids = data.get('project_ids', [])
+        
+        if not project_ids:
+            return jsonify({'success': False, 'message': 'No projects selected'})
+        
+        deleted_count = 0
+        for project_id in project_ids:
+            project = Project.query.get(project_id)
+            if project:
+                # Allow admin/manager or project creator to delete
+                if current_user.role in ['admin', 'manager'] or project.created_by == current_user.id:
+                    db.session.delete(project)
+                    deleted_count += 1
+        
+        db.session.commit()
+        return jsonify({'success': True, 'deleted_count': deleted_count, 'message': f'Successfully deleted {deleted_count} project(s)'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error deleting projects: {str(e)}'})
+
+@bp.route('/projects/<int:project_id>/delete', methods=['POST'])
+@login_required
+def delete_project(project_id):
+    try:
+        # Check if user has permission (admin, manager, or project owner)
+        project = Project.query.get_or_404(project_id)
+        
+        # Allow admin, manager, or project creator to delete
+        if current_user.role not in ['admin', 'manager'] and project.created_by != current_user.id:
+            return jsonify({'success': False, 'message': 'Access denied. Only admin, manager, or project creator can delete projects.'})
+        
+        # FIXED: Enhanced deletion logic with proper order to handle foreign key constraints
+        
+        # 1. First, get all test cases for this project
+        test_case_ids = [tc[0] for tc in db.session.execute(
+            text("SELECT id FROM test_case WHERE project_id = :project_id"), 
+            {'project_id': project_id}
+        ).fetchall()]
+        
+        # 2. Delete test executions (they reference test cases), releasing cycle plans first
+        remove_cases_from_cycles(test_case_ids)
+        affected_cycles = release_executions([row[0] for row in db.session.query(TestExecution.id).filter(
+            TestExecution.test_case_id.in_(test_case_ids)).all()]) if test_case_ids else []
+        forget_case_state(test_case_ids)
+        if test_case_ids:
+            attachment_store.delete_for(
+                test_case_ids=test_case_ids,
+                bug_ids=[row[0] for row in db.session.query(Bug.id).filter(Bug.test_case_id.in_(test_case_ids)).all()],
+                execution_ids=[row[0] for row in db.session.query(TestExecution.id).filter(
+                    TestExecution.test_case_id.in_(test_case_ids)).all()]
+            )
+        for test_case_id in test_case_ids:
+            try:
+                delete_rows('test_execution', 'test_case_id = :test_case_id', 
+                                 {'test_case_id': test_case_id})
+            except:
+                pass  # Handle missing columns gracefully
+        
+        # 3. Delete bugs (they reference test cases)
+        for test_case_id in test_case_ids:
+            try:
+                delete_rows('bug', 'test_case_id = :test_case_id', 
+                                 {'test_case_id': test_case_id})
+            except:
+                pass
+        
+        # 4. Delete assignments (they might reference test cases or project)
+        try:
+            delete_rows('assignment', 'project_id = :project_id', 
+                             {'project_id': project_id})
+        except:
+            # Fallback - delete assignments related to test cases
+            for test_case_id in test_case_ids:
+                try:
+                    delete_rows('assignment', 'test_case_id = :test_case_id', 
+                                     {'test_case_id': test_case_id})
+                except:
+                    pass
+        
+        # 5. Delete requirements (they reference project)
+        try:
+            delete_rows('requirement', 'project_id = :project_id', 
+                             {'project_id': project_id})
+        except:
+            pass  # Requirements table might not exist
+        
+        # 6. Delete test cases (they reference project and test suites)
+        try:
+            delete_rows('test_case', 'project_id = :project_id', 
+                             {'project_id': project_id})
+        except:
+            pass
+        
+        # 6b. Delete the project's managed environments (execution history keeps the names)
+        try:
+            delete_rows('test_environment', 'project_id = :project_id', 
+                             {'project_id': project_id})
+        except:
+            pass
+        
+        # 7. CRITICAL: Delete test suites BEFORE deleting project (they reference project)
+        try:
+            db.session.execute(text("""DELETE FROM test_suite_closure
+                WHERE ancestor_id IN (SELECT id FROM test_suite WHERE project_id = :project_id)
+                   OR descendant_id IN (SELECT id FROM test_suite WHERE project_id = :project_id)"""),
+                             {'project_id': project_id})
+            delete_rows('test_suite', 'project_id = :project_id', 
+                             {'project_id': project_id})
+        except Exception as e:
+            print(f"Error deleting test suites: {e}")
+            pass
+        
+        # 7b. Delete test cycles with their plans and counters (executions were removed above)
+        for cycle in TestCycle.query.filter_by(project_id=project_id).all():
+            delete_cycle(cycle)
+            if cycle.id in affected_cycles:
+                affected_cycles.remove(cycle.id)
+        for cycle_id in affected_cycles:
+            rebuild_progress(cycle_id)
+        
+        # 8. Finally delete the project (no more foreign key references should exist)
+        db.session.delete(project)
+        invalidate_coverage(project_id)
+        db.session.commit()
+        attachment_store.purge()
+        
+        return jsonify({'success': True, 'message': 'Project and all related data deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        print(f"Project deletion error: {e}")  # For debugging
+        return jsonify({'success': False, 'message': f'Error deleting project: {str(e)}'})
+
+def _start_clone(kind, source_id, project):
+    if current_user.role not in ['admin', 'manager'] and (project is None or project.created_by != current_user.id):
+        return jsonify({'success': False, 'message': 'Access denied. Only admin, manager, or project creator can clone.'}), 403
+    data = request.get_json(silent=True) or {}
+    try:
+        job = clone_jobs.start(kind, source_id, current_user.id, data.get('name'))
+    except CloneError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error starting clone: {str(e)}'})
+    return jsonify({'success': True, 'job_id': job.id, 'status_url': url_for('projects.clone_job', job_id=job.id),
+                    'message': 'Clone started'}), 202
+
+@bp.route('/projects/<int:project_id>/clone', methods=['POST'])
+@login_required
+def clone_project(project_id):
+    project = Project.query.get_or_404(project_id)
+    return _start_clone('project', project.id, project)
+
+@bp.route('/test-suites/<int:suite_id>/clone', methods=['POST'])
+@login_required
+def clone_test_suite(suite_id):
+    suite = TestSuite.query.get_or_404(suite_id)
+    return _start_clone('suite', suite.id, db.session.get(Project, suite.project_id) if suite.project_id else None)
+
+@bp.route('/clone-jobs/<int:job_id>')
+@login_required
+def clone_job(job_id):
+    return jsonify(dict(job_dict(CloneJob.query.get_or_404(job_id)), success=True))
+
+@bp.route('/test-suites/<int:suite_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_test_suite(suite_id):
+    suite = TestSuite.query.get_or_404(suite_id)
+    
+    if request.method == 'POST':
+        suite.name = request.form['name']
+        suite.description = request.form['description']
+        suite.project_id = request.form['project_id']
+        try:
+            move_suite(suite, request.form.get('parent_suite_id'))
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e), 'error')
+            return redirect(url_for('projects.edit_test_suite', suite_id=suite_id))
+        db.session.commit()
+        flash('Test suite updated successfully', 'success')
+        return redirect(url_for('projects.test_suites'))
+    
+    projects = Project.query.all()
+    # A suite cannot become a child of its own subtree
+    excluded_ids = set(subtree_ids(suite_id))
+    parent_choices = [s for s in TestSuite.query.all() if s.id not in excluded_ids]
+    return render_template('edit_test_suite.html', suite=suite, projects=projects, parent_choices=parent_choices)
+
+@bp.route('/test-suites/<int:suite_id>/delete', methods=['POST'])
+@login_required
+def delete_test_suite(suite_id):
+    try:
+        suite = TestSuite.query.get_or_404(suite_id)
+        # Child suites move up to the deleted suite's parent
+        remove_suite(suite)
+        db.session.delete(suite)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Test suite deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+
+@bp.route('/test-suites/<int:suite_id>/test-cases')
+@login_required
+def test_suite_test_cases(suite_id):
+    """Show test cases for a specific test suite"""
+    suite = TestSuite.query.get_or_404(suite_id)
+    
+    include_children = request.args.get('include_children', '1') == '1'
+    
+    # Get test cases that belong to this suite (checking both suite_id and test_suite_id fields),
+    # optionally including every suite below it
+    if include_children:
+        in_suite = subtree_test_cases(suite_id).whereclause
+    else:
+        in_suite = db.or_(TestCase.suite_id == suite_id, TestCase.test_suite_id == suite_id)
+    test_cases = test_case_rows(in_suite, with_preview=True)
+    
+    # Get all test suites for the dropdown (in case user wants to move test cases)
+    all_suites = TestSuite.query.filter_by(project_id=suite.project_id).all()
+    child_suites = tree_nodes(parent_id=suite_id)
+    
+    return render_template('test_suite_test_cases.html', 
+                         suite=suite, 
+                         test_cases=test_cases, 
+                         all_suites=all_suites,
+                         child_suites=child_suites,
+                         include_children=include_children)
+
+@bp.route('/requirements')
+@login_required
+def requirements():
+    requirements = requirement_rows()
+    projects = Project.query.all()
+    return render_template('requirements.html', requirements=requirements, projects=projects)
+
+@bp.route('/requirements/create', methods=['GET', 'POST'])
+@login_required
+def create_requirement():
+    if request.method == 'POST':
+        requirement = Requirement(
+            title=request.form['title'],
+            description=request.form['description'],
+            type=request.form['type'],
+            priority=request.form['priority'],
+            project_id=request.form['project_id'],
+            created_by=current_user.id
+        )
+        db.session.add(requirement)
+        invalidate_coverage(requirement.project_id)
+        db.session.commit()
+        flash('Requirement created successfully', 'success')
+        return redirect(url_for('projects.requirements'))
+    
+    projects = Project.query.all()
+    return render_template('create_requirement.html', projects=projects)
+
+@bp.route('/requirements/<int:req_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_requirement(req_id):
+    requirement = Requirement.query.get_or_404(req_id)
+    
+    if request.method == 'POST':
+        requirement.title = request.form['title']
+        requirement.description = request.form['description']
+        requirement.type = request.form['type']
+        requirement.priority = request.form['priority']
+        requirement.project_id = request.form['project_id']
+        invalidate_coverage()
+        db.session.commit()
+        flash('Requirement updated successfully', 'success')
+        return redirect(url_for('projects.requirements'))
+    
+    projects = Project.query.all()
+    return render_template('edit_requirement.html', requirement=requirement, projects=projects)
+
+@bp.route('/requirements/<int:requirement_id>/delete', methods=['POST'])
+@login_required
+def delete_requirement(requirement_id):
+    try:
+        requirement = Requirement.query.get_or_404(requirement_id)
+        
+        # Check permissions - admin, manager, or requirement creator can delete
+        if current_user.role not in ['admin', 'manager'] and requirement.created_by != current_user.id:
+            return jsonify({'success': False, 'message': 'Access denied. Only admin, manager, or requirement creator can delete requirements.'})
+        
+        # Delete related test cases first
+        test_case_ids = [row[0] for row in db.session.query(TestCase.id).filter_by(requirement_id=requirement_id).all()]
+        remove_cases_from_cycles(test_case_ids)
+        forget_case_state(test_case_ids)
+        attachment_store.delete_for(test_case_ids=test_case_ids)
+        try:
+            delete_rows('test_case', 'requirement_id = :requirement_id', 
+                             {'requirement_id': requirement_id})
+        except:
+            pass
+        
+        project_id = requirement.project_id
+        db.session.delete(requirement)
+        invalidate_coverage(project_id)
+        db.session.commit()
+        attachment_store.purge()
+        
+        return jsonify({'success': True, 'message': 'Requirement deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error deleting requirement: {str(e)}'})
+
+@bp.route('/requirements/<int:requirement_id>/view', methods=['GET'])
+@login_required
+def view_requirement(requirement_id):
+    """Get requirement details for viewing"""
+    try:
+        requirement = Requirement.query.get_or_404(requirement_id)
+        
+        # Project, creator, linked test cases and their latest status in a few set-based queries
+        row = build_traceability_matrix(requirement_ids=[requirement_id])[0]
+        
+        requirement_data = {
+            'id': requirement.id,
+            'title': requirement.title,
+            'description': requirement.description,
+            'type': requirement.type,
+            'priority': requirement.priority,
+            'status': requirement.status,
+            'project_name': row['project_name'],
+            'created_by': row['created_by'],
+            'created_at': requirement.created_at.strftime('%Y-%m-%d %H:%M:%S') if requirement.created_at else '',
+            'linked_test_cases': row['linked_test_cases'],
+            'coverage': row['coverage']
+        }
+        
+        return jsonify({'success': True, 'requirement': requirement_data})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error fetching requirement: {str(e)}'})
+
+@bp.route('/requirements/<int:requirement_id>/test-cases', methods=['GET'])
+@login_required
+def get_available_test_cases(requirement_id):
+    """Get available test cases for linking to requirement"""
+    try:
+        requirement = Requirement.query.get_or_404(requirement_id)
+        
+        # Get all test cases from the same project
+        if requirement.project_id:
+            available_test_cases = TestCase.query.filter_by(project_id=requirement.project_id).all()
+        else:
+            available_test_cases = TestCase.query.all()
+        
+        # Get currently linked test cases
+        linked_test_case_ids = [tc.id for tc in TestCase.query.filter_by(requirement_id=requirement_id).all()]
+        
+        test_cases_data = [
+            {
+                'id': tc.id,
+                'title': tc.title,
+                'priority': tc.priority,
+                'is_linked': tc.id in linked_test_case_ids
+            } for tc in available_test_cases
+        ]
+        
+        return jsonify({'success': True, 'test_cases': test_cases_data})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error fetching test cases: {str(e)}'})
+
+@bp.route('/requirements/<int:requirement_id>/link-test-cases', methods=['POST'])
+@login_required
+def link_test_cases_to_requirement(requirement_id):
+    """Link test cases to requirement"""
+    try:
+        requirement = Requirement.query.get_or_404(requirement_id)
+        data = request.get_json()
+        test_case_ids = data.get('test_case_ids', [])
+        
+        # Only apply the difference between the current and the selected links
+        linked_count, added, removed = apply_requirement_links(requirement.id, test_case_ids)
+        # Cases may have moved between requirements of different projects
+        invalidate_coverage()
+        db.session.commit()
+        
+        return jsonify({
+            'success': True, 
+            'message': f'Successfully linked {linked_count} test case(s) to requirement',
+            'linked_count': linked_count,
+            'added_count': added,
+            'removed_count': removed
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error linking test cases: {str(e)}'})
+
+@bp.route('/requirements/traceability')
+@login_required
+def traceability_matrix():
+    """Requirements x linked test cases x latest execution status"""
+    project_id = request.args.get('project_id', type=int)
+    matrix = build_traceability_matrix(project_id)
+    coverage = project_coverage(project_id, matrix)
+    projects = Project.query.all()
+    return render_template('traceability.html', matrix=matrix, coverage=coverage,
+                           projects=projects, selected_project_id=project_id)
+
+@bp.route('/requirements/bulk-delete', methods=['POST'])
+@login_required
+def bulk_delete_requirements():
+    try:
+        data = request.get_json()
+        requirement_ids = data.get('requirement_ids', [])
+        
+        if not requirement_ids:
+            return jsonify({'success': False, 'message': 'No requirements selected'})
+        
+        deleted_count = 0
+        for requirement_id in requirement_ids:
+            try:
+                requirement = Requirement.query.get(requirement_id)
+                if requirement and (current_user.role in ['admin', 'manager'] or requirement.created_by == current_user.id):
+                    # Delete related test cases first
+                    test_case_ids = [row[0] for row in db.session.query(TestCase.id).filter_by(requirement_id=requirement_id).all()]
+                    remove_cases_from_cycles(test_case_ids)
+                    forget_case_state(test_case_ids)
+                    attachment_store.delete_for(test_case_ids=test_case_ids)
+                    try:
+                        delete_rows('test_case', 'requirement_id = :requirement_id', 
+                                         {'requirement_id': requirement_id})
+                    except:
+                        pass
+                    
+                    db.session.delete(requirement)
+                    deleted_count += 1
+            except:
+                pass
+        
+        invalidate_coverage()
+        db.session.commit()
+        attachment_store.purge()
+        return jsonify({'success': True, 'deleted_count': deleted_count, 'message': f'Successfully deleted {deleted_count} requirement(s)'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error deleting requirements: {str(e)}'})
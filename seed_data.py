@@ -0,0 +1,617 @@
+"""
+Scale-data generator: fills the database with a production-sized dataset.
+
+Everything is derived from one number, the count of test executions (the
+largest table), and a seed, so the same command always produces the same
+data (dated relative to today). Distributions are skewed the way real usage is: a few projects hold
+most test cases, a few testers record most executions, some cases are run
+far more often (Zipf weights) and a small share of flaky cases account for
+most failures (per-case failure rates drawn from a beta distribution).
+Executions are generated in time order and grouped into two-week cycles, so
+ids, dates and cycle plans stay consistent with each other.
+
+Users cover every role, starting with a known admin (seed.admin) that
+shares the published seed password; users, projects and suites grow with
+the execution count so per-entity volumes stay realistic.
+
+Rows are generated as plain tuples and written as multi-row INSERTs in
+chunks on a writer thread, bypassing the ORM; secondary indexes of the big
+tables are dropped for the load and rebuilt once at the end. The
+derived tables the app maintains incrementally (suite closure, latest case
+state, cycle plans and counters) are computed during generation instead of
+being rebuilt afterwards. Ids continue after the existing rows, so seeding
+into a non-empty database adds to it.
+
+    flask seed-data --executions 10000000 --seed 42
+
+Attachments are not generated: they need stored files.
+"""
+import bisect
+import itertools
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
+
+from models import db
+from suite_tree import MAX_TREE_DEPTH
+from test_cycles import NOT_RUN, counter_for
+
+logger = logging.getLogger(__name__)
+
+SEED_PASSWORD = 'password'
+SEED_HASH_METHOD = 'pbkdf2:sha256:1000'
+DESCRIPTION = 'Generated by seed_data.py'
+CYCLE_DAYS = 14
+MAX_PLAN_SIZE = 2000  # test cases planned per cycle
+MAX_SUITE_DEPTH = min(5, MAX_TREE_DEPTH)
+MAX_ROWS_PER_STATEMENT = 200  # rows in one multi-row VALUES on SQLite
+SQLITE_MAX_VARIABLES = 32766 if sqlite3.sqlite_version_info >= (3, 32) else 999
+
+ROLES = (('tester', 63), ('developer', 20), ('manager', 15), ('admin', 2))
+SEED_ADMIN = 'seed.admin'  # the first seeded user, an admin (seed.admin<id> if the name is taken)
+DEPARTMENTS = ('QA', 'Engineering', 'Product', 'Platform', 'Mobile', 'Payments')
+PROJECT_STATUSES = (('Active', 70), ('Completed', 15), ('On Hold', 10), ('Cancelled', 5))
+PRIORITIES = (('Low', 15), ('Medium', 50), ('High', 25), ('Critical', 10))
+CASE_STATUSES = (('Active', 85), ('Draft', 10), ('Deprecated', 5))
+REQUIREMENT_TYPES = (('Functional', 70), ('Non-Functional', 10), ('Performance', 8), ('Security', 7),
+                     ('Usability', 5))
+REQUIREMENT_STATUSES = (('Draft', 20), ('Approved', 50), ('Implemented', 30))
+BUG_TYPES = (('Functional', 55), ('UI/UX', 15), ('Performance', 10), ('Compatibility', 8), ('Security', 5),
+             ('Data', 7))
+ASSIGNMENT_TYPES = (('Testing', 50), ('Review', 20), ('Bug Fix', 20), ('Documentation', 10))
+ASSIGNMENT_STATUSES = (('Completed', 55), ('In Progress', 20), ('Assigned', 20), ('On Hold', 5))
+NOTIFICATION_TYPES = (('info', 50), ('error', 25), ('warning', 15), ('success', 10))
+ENVIRONMENTS = ('Chrome', 'Firefox', 'Safari', 'Edge', 'Android', 'iOS', 'Staging', 'Production')
+FEATURES = ('Login', 'Checkout', 'Search', 'Profile', 'Reports', 'Billing', 'Notifications', 'Settings',
+            'Dashboard', 'Export', 'Import', 'Permissions', 'Onboarding', 'Cart', 'API')
+ACTIONS = ('works with valid input', 'rejects invalid input', 'handles timeouts', 'keeps state after reload',
+           'shows the right error', 'respects permissions', 'paginates results', 'survives a retry')
+FAILURES = ('Element not found', 'Unexpected 500 response', 'Timed out waiting for page',
+            'Wrong total displayed', 'Validation message missing', 'Data not saved')
+COMMENTS = ('Re-tested after fix', 'Flaky on CI', 'Needs product input', 'Blocked by environment outage',
+            'Looks good', 'Attached logs', 'Duplicate of an earlier report')
+
+
+def zipf_weights(count, exponent):
+    """Cumulative Zipf weights for count items (rank 1 heaviest)"""
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def pick(rng, items, cumulative):
+    return items[bisect.bisect(cumulative, rng.random() * cumulative[-1])]
+
+
+def weighted(rng, pairs):
+    """Pick from ((value, weight), ...)"""
+    return rng.choices([value for value, _ in pairs], [weight for _, weight in pairs])[0]
+
+
+class Loader:
+    """Chunked executemany inserts on one connection, with bulk-load session settings"""
+
+    def __init__(self, connection, chunk_size):
+        self.connection = connection
+        self.chunk_size = chunk_size
+        self.dialect = connection.dialect.name
+        self.placeholder = '?' if connection.dialect.paramstyle == 'qmark' else '%s'
+        self.quote = connection.dialect.identifier_preparer.quote
+        self.counts = {}
+
+    def __enter__(self):
+        if self.dialect == 'sqlite':
+            # A crash mid-load only loses generated data, so skip fsyncs and the on-disk journal
+            self.journal_mode = self._pragma('journal_mode')
+            self.synchronous = self._pragma('synchronous')
+            self.threads = self._pragma('threads')
+            if self.journal_mode != 'wal':
+                self._pragma('journal_mode', 'MEMORY')
+            self._pragma('synchronous', 'OFF')
+            # Index builds sort with helper threads (SQLite caps them at its compile-time maximum)
+            self._pragma('threads', os.cpu_count() or 1)
+        elif self.dialect == 'mysql':
+            # Rows are generated consistent; per-row checks would dominate load time
+            self.connection.exec_driver_sql('SET foreign_key_checks=0, unique_checks=0')
+        return self
+
+    def __exit__(self, *exc):
+        if self.dialect == 'sqlite':
+            self._pragma('synchronous', self.synchronous)
+            self._pragma('threads', self.threads)
+            if self.journal_mode != 'wal':
+                self._pragma('journal_mode', self.journal_mode)
+        elif self.dialect == 'mysql':
+            self.connection.exec_driver_sql('SET foreign_key_checks=1, unique_checks=1')
+
+    def _pragma(self, name, value=None):
+        # On the driver connection: these pragmas cannot run inside the transaction SQLAlchemy would begin
+        driver = self.connection.connection.driver_connection
+        if value is None:
+            return driver.execute(f'PRAGMA {name}').fetchone()[0]
+        driver.execute(f'PRAGMA {name}={value}')
+
+    def has_row(self, table, column, value):
+        return self.connection.execute(
+            text(f'SELECT 1 FROM {self.quote(table)} WHERE {self.quote(column)} = :value'), {'value': value}
+        ).first() is not None
+
+    def next_id(self, table):
+        return (self.connection.execute(text(f'SELECT MAX(id) FROM {self.quote(table)}')).scalar() or 0) + 1
+
+    def _insert_multi(self, chunk, sql, multi_sql, per_statement):
+        whole = len(chunk) - len(chunk) % per_statement
+        if whole:
+            self.connection.exec_driver_sql(multi_sql, [
+                tuple(itertools.chain.from_iterable(chunk[start:start + per_statement]))
+                for start in range(0, whole, per_statement)
+            ])
+        if whole < len(chunk):
+            self.connection.exec_driver_sql(sql, chunk[whole:])
+
+    def insert(self, table, columns, rows, ordered_by=None):
+        """Insert an iterable of tuples, committing every chunk_size rows
+
+        A writer thread sends each chunk while the next one is generated; the
+        database driver releases the GIL while it waits on the server or disk.
+        Secondary indexes are dropped for the load and built again from the
+        sorted data afterwards, which is much cheaper than maintaining them
+        row by row; an index led by ordered_by (a column the rows arrive
+        sorted on) only ever grows at its end and is kept.
+        """
+        indexes = [index for index in db.metadata.tables[table].indexes
+                   if not index.unique and list(index.columns)[0].name != ordered_by]
+        for index in indexes:
+            index.drop(self.connection, checkfirst=True)
+        self.connection.commit()
+        prefix = f'INSERT INTO {self.quote(table)} ({", ".join(self.quote(c) for c in columns)}) VALUES '
+        values = f'({", ".join([self.placeholder] * len(columns))})'
+        sql = prefix + values
+        # SQLite's executemany steps one row at a time; a multi-row VALUES binds many per statement
+        per_statement = min(MAX_ROWS_PER_STATEMENT, SQLITE_MAX_VARIABLES // len(columns))
+        multi_sql = prefix + ', '.join([values] * per_statement)
+        chunks = queue.Queue(maxsize=2)
+        errors = []
+
+        def write():
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    return
+                if errors:
+                    continue  # drain, so the generating side never blocks
+                try:
+                    if self.dialect == 'sqlite':
+                        self._insert_multi(chunk, sql, multi_sql, per_statement)
+                    else:
+                        self.connection.exec_driver_sql(sql, chunk)  # pymysql sends multi-row INSERTs itself
+                    self.connection.commit()
+                    self.counts[table] = self.counts.get(table, 0) + len(chunk)
+                except Exception as e:
+                    errors.append(e)
+
+        writer = threading.Thread(target=write, name=f'seed-{table}', daemon=True)
+        writer.start()
+        try:
+            rows = iter(rows)
+            while not errors:
+                chunk = list(itertools.islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                chunks.put(chunk)
+        finally:
+            chunks.put(None)
+            writer.join()
+            for index in indexes:
+                index.create(self.connection, checkfirst=True)
+            self.connection.commit()
+        if errors:
+            raise errors[0]
+
+
+class ScaleProfile:
+    """Row counts for a target number of executions"""
+
+    def __init__(self, executions):
+        self.executions = executions
+        self.test_cases = max(200, executions // 40)
+        self.users = max(20, executions // 2000)
+        self.projects = max(5, executions // 100000)
+        self.cases_per_suite = 25
+        self.requirements = self.test_cases // 5
+        self.bugs = executions // 100
+        self.comments = executions // 50
+        self.assignments = self.test_cases // 10
+        self.notifications = executions // 100
+
+
+class Generator:
+    """Generates and loads one dataset; call run()"""
+
+    def __init__(self, loader, profile, seed=42, days=365):
+        self.load = loader
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.end = datetime.utcnow().replace(microsecond=0)
+        self.start = (self.end - timedelta(days=days)).replace(hour=0, minute=0, second=0)
+        self.days = days
+
+    def timestamp(self, fraction):
+        """Formatted time at a fraction (0..1) of the generated period"""
+        return (self.start + timedelta(seconds=int(fraction * self.days * 86400))).strftime('%Y-%m-%d %H:%M:%S')
+
+    def early(self):
+        """Creation time for long-lived rows: the first 40% of the period"""
+        return self.timestamp(self.rng.random() * 0.4)
+
+    def run(self):
+        for step in (self.users, self.projects, self.suites, self.requirements, self.test_cases,
+                     self.cycles, self.executions, self.bugs, self.comments, self.assignments,
+                     self.notifications):
+            started = time.monotonic()
+            step()
+            logger.info("%s done in %.1fs", step.__name__, time.monotonic() - started)
+        return self.load.counts
+
+    def users(self):
+        rng, first_id = self.rng, self.load.next_id('user')
+        # Every user shares one hash of the published seed password, so a cheap one costs nothing in safety
+        password_hash = generate_password_hash(SEED_PASSWORD, method=SEED_HASH_METHOD)
+        self.user_ids = list(range(first_id, first_id + self.profile.users))
+        # The first users are always active and cover every role; the first is a known admin to log in with
+        fixed_roles = ['admin', 'manager', 'tester', 'developer']
+        roles = (fixed_roles + [weighted(rng, ROLES) for _ in self.user_ids[len(fixed_roles):]])[:len(self.user_ids)]
+        taken = self.load.has_row('user', 'username', SEED_ADMIN)
+        self.admin_username = f'{SEED_ADMIN}{first_id}' if taken else SEED_ADMIN
+        usernames = [self.admin_username] + [f'seed.user{uid}' for uid in self.user_ids[1:]]
+        self.manager_ids = [uid for uid, role in zip(self.user_ids, roles) if role in ('admin', 'manager')]
+        # Activity: a few users record most of the work
+        self.active_users = rng.sample(self.user_ids, len(self.user_ids))
+        self.user_weights = zipf_weights(len(self.user_ids), 1.1)
+        self.load.insert('user', (
+            'id', 'username', 'email', 'password_hash', 'role', 'created_at', 'is_active', 'department',
+            'language', 'timezone', 'date_format', 'items_per_page', 'theme', 'email_notifications',
+            'test_failure_alerts', 'assignment_notifications', 'bug_update_notifications', 'compact_view',
+            'animations_enabled', 'two_factor_enabled'
+        ), (
+            (uid, username, f'{username}@example.com', password_hash, role, self.early(),
+             uid < first_id + len(fixed_roles) or rng.random() > 0.05, rng.choice(DEPARTMENTS), 'en', 'UTC',
+             'MM/DD/YYYY', 25, 'dark' if rng.random() < 0.3 else 'light', True, True, True, True, False, True, False)
+            for uid, username, role in zip(self.user_ids, usernames, roles)
+        ))
+
+    def user(self):
+        return pick(self.rng, self.active_users, self.user_weights)
+
+    def projects(self):
+        rng, first_id = self.rng, self.load.next_id('project')
+        self.project_ids = list(range(first_id, first_id + self.profile.projects))
+        # Project size: share of all test cases (and so of executions)
+        shares = [1 / rank for rank in range(1, len(self.project_ids) + 1)]
+        total = sum(shares)
+        self.project_cases = {pid: max(20, int(self.profile.test_cases * share / total))
+                              for pid, share in zip(self.project_ids, shares)}
+        self.project_weights = list(itertools.accumulate(self.project_cases.values()))
+        self.load.insert('project', (
+            'id', 'name', 'description', 'status', 'start_date', 'created_at', 'created_by'
+        ), (
+            (pid, f'{rng.choice(FEATURES)} Platform {pid}', DESCRIPTION,
+             weighted(rng, PROJECT_STATUSES), self.start.date().isoformat(), self.timestamp(0), rng.choice(self.manager_ids))
+            for pid in self.project_ids
+        ))
+
+        environment_id = self.load.next_id('test_environment')
+        self.environments = {}
+        rows = []
+        for pid in self.project_ids:
+            names = rng.sample(ENVIRONMENTS, rng.randint(2, 6))
+            self.environments[pid] = (names, zipf_weights(len(names), 1.0))
+            for name in names:
+                rows.append((environment_id, name, f'{name} test environment', None, 'Active', pid,
+                             self.timestamp(0)))
+                environment_id += 1
+        self.load.insert('test_environment', (
+            'id', 'name', 'description', 'url', 'status', 'project_id', 'created_at'
+        ), rows)
+
+    def suites(self):
+        """Nested suite trees per project, with their closure rows"""
+        rng, suite_id = self.rng, self.load.next_id('test_suite')
+        self.project_suites = {}
+        suites, closure = [], []
+        for pid in self.project_ids:
+            ancestors = {}  # suite id -> ancestor ids, nearest first
+            for number in range(max(1, self.project_cases[pid] // self.profile.cases_per_suite)):
+                parents = [sid for sid in ancestors if len(ancestors[sid]) < MAX_SUITE_DEPTH - 1]
+                parent = rng.choice(parents) if number >= 3 and parents and rng.random() < 0.8 else None
+                ancestors[suite_id] = ([parent] + ancestors[parent]) if parent else []
+                suites.append((suite_id, f'{rng.choice(FEATURES)} {number + 1}', DESCRIPTION, pid, self.early(),
+                               parent))
+                closure.append((suite_id, suite_id, 0))
+                closure.extend((ancestor, suite_id, depth) for depth, ancestor in enumerate(ancestors[suite_id], 1))
+                suite_id += 1
+            self.project_suites[pid] = list(ancestors)
+        self.load.insert('test_suite', (
+            'id', 'name', 'description', 'project_id', 'created_at', 'parent_suite_id'
+        ), suites)
+        self.load.insert('test_suite_closure', ('ancestor_id', 'descendant_id', 'depth'), closure)
+
+    def requirements(self):
+        rng, requirement_id = self.rng, self.load.next_id('requirement')
+        total_cases = sum(self.project_cases.values())
+        self.project_requirements = {}
+        rows = []
+        for pid in self.project_ids:
+            count = max(1, self.profile.requirements * self.project_cases[pid] // total_cases)
+            self.project_requirements[pid] = list(range(requirement_id, requirement_id + count))
+            for _ in range(count):
+                rows.append((requirement_id, f'{rng.choice(FEATURES)} {rng.choice(ACTIONS)}', DESCRIPTION,
+                             weighted(rng, REQUIREMENT_TYPES), weighted(rng, PRIORITIES),
+                             weighted(rng, REQUIREMENT_STATUSES), pid, rng.choice(self.manager_ids), self.early()))
+                requirement_id += 1
+        self.load.insert('requirement', (
+            'id', 'title', 'description', 'type', 'priority', 'status', 'project_id', 'created_by', 'created_at'
+        ), rows)
+
+    def test_cases(self):
+        rng, case_id = self.rng, self.load.next_id('test_case')
+        self.project_case_ids = {}
+        self.case_weights = {}
+        self.failure_rate = {}
+
+        def rows():
+            nonlocal case_id
+            for pid in self.project_ids:
+                suite_ids = self.project_suites[pid]
+                suite_weights = zipf_weights(len(suite_ids), 0.8)
+                requirement_ids = self.project_requirements[pid]
+                ids = list(range(case_id, case_id + self.project_cases[pid]))
+                # Hot cases (smoke and regression suites) are executed far more often
+                self.project_case_ids[pid] = rng.sample(ids, len(ids))
+                self.case_weights[pid] = zipf_weights(len(ids), 0.8)
+                for cid in ids:
+                    # Mostly stable; a flaky minority fails much of the time
+                    self.failure_rate[cid] = rng.betavariate(0.5, 6)
+                    automated = rng.random() < 0.4
+                    created = self.early()
+                    yield (cid, f'Verify {rng.choice(FEATURES).lower()} {rng.choice(ACTIONS)}',
+                           DESCRIPTION, 'User is logged in', '1. Open the page\n2. Act\n3. Check',
+                           'The expected outcome is shown', None, weighted(rng, PRIORITIES),
+                           weighted(rng, CASE_STATUSES), 'Automated' if automated else 'Manual',
+                           'Automated' if automated else 'Not Automated', pid, pick(rng, suite_ids, suite_weights),
+                           rng.choice(requirement_ids) if rng.random() < 0.7 else None,
+                           self.user(), self.user() if rng.random() < 0.6 else None, created, created,
+                           rng.choice((5, 10, 15, 30, 60)))
+                case_id += len(ids)
+
+        self.load.insert('test_case', (
+            'id', 'title', 'description', 'preconditions', 'test_steps', 'expected_result', 'test_data',
+            'priority', 'status', 'type', 'automation_status', 'project_id', 'suite_id', 'requirement_id',
+            'created_by', 'assigned_to', 'created_at', 'updated_at', 'estimated_time'
+        ), rows())
+
+    def cycles(self):
+        """Two-week cycles per project; each plans a sample of the project's cases"""
+        rng, cycle_id = self.rng, self.load.next_id('test_cycle')
+        windows = max(1, self.days // CYCLE_DAYS)
+        self.window_cycles = {}  # (project id, window) -> (cycle id, planned case ids)
+        rows = []
+        for pid in self.project_ids:
+            for window in range(windows):
+                if rng.random() > 0.7:
+                    continue
+                cases = self.project_case_ids[pid]
+                plan = rng.sample(cases, min(MAX_PLAN_SIZE, max(1, int(len(cases) * 0.4))))
+                self.window_cycles[(pid, window)] = (cycle_id, plan)
+                start = self.start + timedelta(days=window * CYCLE_DAYS)
+                end = start + timedelta(days=CYCLE_DAYS)
+                status = 'Completed' if end < self.end else 'In Progress'
+                start, end = (value.strftime('%Y-%m-%d %H:%M:%S') for value in (start, end))
+                rows.append((cycle_id, f'Sprint {window + 1}', DESCRIPTION, pid, start, end, status,
+                             rng.choice(self.manager_ids), start))
+                cycle_id += 1
+        self.load.insert('test_cycle', (
+            'id', 'name', 'description', 'project_id', 'start_date', 'end_date', 'status', 'created_by',
+            'created_at'
+        ), rows)
+
+    def executions(self):
+        rng, first_id = self.rng, self.load.next_id('test_execution')
+        count = self.profile.executions
+        # Latest rows, keyed by ints: cheaper to hash than tuples, and the rows carry the values back
+        latest_overall = {}  # case id -> its latest execution row
+        latest_state = {}  # case id * 8 + environment number within the project -> latest row there
+        latest_planned = {}  # cycle id << 32 | case id -> latest row in the cycle
+        self.failed = []  # sample of (case id, environment, time) for bugs, reservoir-sampled
+        step = self.days * 86400 / max(1, count)
+        windows = max(1, self.days // CYCLE_DAYS)
+
+        # Formatting a datetime per row is the slowest part of generation; build strings from parts
+        days = [(self.start + timedelta(days=day)).strftime('%Y-%m-%d ') for day in range(self.days + 1)]
+        times = [f'{hour:02d}:{minute:02d}:{second:02d}'
+                 for hour in range(24) for minute in range(60) for second in range(60)]
+        builds = [f'1.{window}.0' for window in range(windows)]  # one build per cycle
+
+        # Per project: (case ids, case weights, environment names, environment weights, cycle per window)
+        projects = [(self.project_case_ids[pid], self.case_weights[pid]) + self.environments[pid]
+                    + ([self.window_cycles.get((pid, window)) for window in range(windows)],)
+                    for pid in self.project_ids]
+
+        def rows():
+            random, bisect_right = rng.random, bisect.bisect_right
+            project_weights = self.project_weights
+            project_total = project_weights[-1]
+            failure_rate = self.failure_rate
+            users, user_weights = self.active_users, self.user_weights
+            user_total = user_weights[-1]
+            failed, bugs, failures_seen = self.failed, self.profile.bugs, 0
+            last_window, cycle_seconds = windows - 1, CYCLE_DAYS * 86400
+            execution_id = first_id - 1
+            for index in range(count):
+                execution_id += 1
+                # Evenly spread in time (jittered within the step), so ids follow execution dates
+                seconds = int((index + random()) * step)
+                executed_at = days[seconds // 86400] + times[seconds % 86400]
+                window = seconds // cycle_seconds
+                if window > last_window:
+                    window = last_window
+                case_ids, case_weights, names, environment_weights, cycles = projects[
+                    bisect_right(project_weights, random() * project_total)]
+                cycle = cycles[window]
+                if cycle and random() < 0.65:
+                    cycle_id, plan = cycle
+                    case_id = plan[int(random() * len(plan))]
+                else:
+                    cycle_id = None
+                    case_id = case_ids[bisect_right(case_weights, random() * case_weights[-1])]
+                environment_number = bisect_right(environment_weights, random() * environment_weights[-1])
+                environment = names[environment_number]
+                roll = random()
+                actual_result = None
+                if roll < failure_rate[case_id]:
+                    status = 'Fail'
+                    actual_result = FAILURES[index % len(FAILURES)]
+                    failures_seen += 1
+                    if len(failed) < bugs:
+                        failed.append((case_id, environment, executed_at))
+                    elif random() < bugs / failures_seen:
+                        failed[int(random() * bugs)] = (case_id, environment, executed_at)
+                elif roll > 0.97:
+                    status = 'Blocked'
+                else:
+                    status = 'Pass'
+                row = (execution_id, case_id, users[bisect_right(user_weights, random() * user_total)], status,
+                       actual_result, COMMENTS[index % len(COMMENTS)] if roll < 0.1 else None,
+                       executed_at, environment, builds[window], 1 + (index % 30), cycle_id)
+                latest_overall[case_id] = row
+                latest_state[case_id * 8 + environment_number] = row
+                if cycle_id:
+                    latest_planned[cycle_id << 32 | case_id] = row
+                yield row
+
+        self.load.insert('test_execution', (
+            'id', 'test_case_id', 'executed_by', 'status', 'actual_result', 'comments', 'execution_date',
+            'environment', 'build_version', 'execution_time', 'test_cycle_id'
+        ), rows(), ordered_by='execution_date')
+        self.execution_ids = (first_id, first_id + count - 1)
+
+        # Derived tables, as record_execution_state() and record_execution() would have left them
+        state_id = self.load.next_id('test_case_state')
+        self.load.insert('test_case_state', (
+            'id', 'test_case_id', 'environment', 'last_execution_id', 'status', 'build_version', 'executed_by',
+            'executed_at'
+        ), ((state_id + n, row[1], environment, row[0], row[3], row[8], row[2], row[6])
+            for n, (environment, row) in enumerate(itertools.chain(
+                (('', row) for row in latest_overall.values()), ((row[7], row) for row in latest_state.values())
+            ))))
+
+        plan_id = self.load.next_id('test_cycle_case')
+        planned_rows, progress_rows = [], []
+        for cycle_id, plan in self.window_cycles.values():
+            counts = {'planned': 0, 'not_run': 0, 'passed': 0, 'failed': 0, 'blocked': 0}
+            for case_id in plan:
+                row = latest_planned.get(cycle_id << 32 | case_id)
+                execution_id, status = (row[0], row[3]) if row else (None, NOT_RUN)
+                planned_rows.append((plan_id, cycle_id, case_id, status, execution_id))
+                plan_id += 1
+                counts['planned'] += 1
+                counts[counter_for(status)] += 1
+            progress_rows.append((cycle_id, counts['planned'], counts['not_run'], counts['passed'],
+                                  counts['failed'], counts['blocked'], self.timestamp(1)))
+        self.load.insert('test_cycle_case', (
+            'id', 'test_cycle_id', 'test_case_id', 'status', 'last_execution_id'
+        ), planned_rows)
+        self.load.insert('test_cycle_progress', (
+            'test_cycle_id', 'planned', 'not_run', 'passed', 'failed', 'blocked', 'updated_at'
+        ), progress_rows)
+
+    def bugs(self):
+        rng, bug_id = self.rng, self.load.next_id('bug')
+        self.bug_ids = list(range(bug_id, bug_id + len(self.failed)))
+
+        def rows():
+            for bid, (case_id, environment, reported_at) in zip(self.bug_ids, sorted(self.failed, key=lambda f: f[2])):
+                age = (self.end - datetime.strptime(reported_at, '%Y-%m-%d %H:%M:%S')).days
+                # Older bugs are more likely to have been dealt with
+                status = weighted(rng, (('Closed', age), ('Resolved', age // 2 + 1), ('In Progress', 20),
+                                        ('Open', 40), ('Rejected', 5)))
+                yield (bid, f'{rng.choice(FAILURES)} in {rng.choice(FEATURES).lower()}', DESCRIPTION,
+                       weighted(rng, PRIORITIES), weighted(rng, PRIORITIES), status, weighted(rng, BUG_TYPES),
+                       environment, None, '1. Run the linked test case', 'Test passes', rng.choice(FAILURES),
+                       case_id, self.user(), rng.choice(self.user_ids) if rng.random() < 0.8 else None,
+                       reported_at, reported_at)
+
+        self.load.insert('bug', (
+            'id', 'title', 'description', 'severity', 'priority', 'status', 'type', 'environment',
+            'build_version', 'steps_to_reproduce', 'expected_result', 'actual_result', 'test_case_id',
+            'reported_by', 'assigned_to', 'created_at', 'updated_at'
+        ), rows())
+
+    def comments(self):
+        rng, comment_id = self.rng, self.load.next_id('comment')
+        all_cases = [cid for pid in self.project_ids for cid in self.project_case_ids[pid]]
+
+        def rows():
+            for cid in range(comment_id, comment_id + self.profile.comments):
+                target, roll = [None, None, None], rng.random()
+                if roll < 0.5:
+                    target[2] = rng.randint(*self.execution_ids)
+                elif roll < 0.8 or not self.bug_ids:
+                    target[0] = rng.choice(all_cases)
+                else:
+                    target[1] = rng.choice(self.bug_ids)
+                yield (cid, rng.choice(COMMENTS), *target, self.user(), self.timestamp(rng.random()))
+
+        self.load.insert('comment', (
+            'id', 'content', 'test_case_id', 'bug_id', 'test_execution_id', 'created_by', 'created_at'
+        ), rows())
+
+    def assignments(self):
+        rng, assignment_id = self.rng, self.load.next_id('assignment')
+
+        def rows():
+            for aid in range(assignment_id, assignment_id + self.profile.assignments):
+                kind = weighted(rng, ASSIGNMENT_TYPES)
+                pid = pick(rng, self.project_ids, self.project_weights)
+                case_id = rng.choice(self.project_case_ids[pid]) if kind == 'Testing' else None
+                bug_id = rng.choice(self.bug_ids) if kind == 'Bug Fix' and self.bug_ids else None
+                created = self.timestamp(rng.random())
+                yield (aid, f'{kind} for {rng.choice(FEATURES).lower()}', DESCRIPTION, kind, self.user(),
+                       rng.choice(self.manager_ids), rng.choice(self.manager_ids),
+                       self.timestamp(min(1, rng.random() + 0.05)), weighted(rng, ASSIGNMENT_STATUSES),
+                       weighted(rng, PRIORITIES), pid, case_id, bug_id, None, created, created)
+
+        self.load.insert('assignment', (
+            'id', 'title', 'description', 'type', 'assigned_to', 'assigned_by', 'created_by', 'due_date',
+            'status', 'priority', 'project_id', 'test_case_id', 'bug_id', 'notes', 'created_at', 'updated_at'
+        ), rows())
+
+    def notifications(self):
+        rng, notification_id = self.rng, self.load.next_id('notification')
+
+        def rows():
+            for nid in range(notification_id, notification_id + self.profile.notifications):
+                fraction = rng.random()
+                yield (nid, rng.choice(('Test failed', 'New assignment', 'Bug updated')), rng.choice(COMMENTS),
+                       weighted(rng, NOTIFICATION_TYPES), self.user(), fraction < 0.9 or rng.random() < 0.3,
+                       self.timestamp(fraction))
+
+        self.load.insert('notification', (
+            'id', 'title', 'message', 'type', 'user_id', 'is_read', 'created_at'
+        ), rows())
+
+
+def seed(engine, executions, seed=42, chunk_size=10000, days=365):
+    """Generate a dataset sized for executions rows; returns ({table: rows}, seconds, admin username)"""
+    started = time.monotonic()
+    with engine.connect() as connection:
+        with Loader(connection, chunk_size) as loader:
+            generator = Generator(loader, ScaleProfile(executions), seed=seed, days=days)
+            counts = generator.run()
+    return counts, time.monotonic() - started, generator.admin_username
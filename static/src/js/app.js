@@ -0,0 +1,315 @@
+// Apply user theme on page load
+document.addEventListener('DOMContentLoaded', function() {
+    // Check if user has theme preference
+    const userTheme = document.body.dataset.theme || 'light';
+    const userCompactView = document.body.dataset.compactView === 'true';
+    const userAnimations = document.body.dataset.animations !== 'false';
+
+    // Apply theme
+    if (userTheme === 'dark') {
+        document.body.classList.add('dark-theme');
+    } else if (userTheme === 'auto') {
+        // Check system preference
+        if (window.matchMedia && window.matchMedia('(prefers-color-scheme: dark)').matches) {
+            document.body.classList.add('dark-theme');
+        }
+    }
+
+    // Apply compact view
+    if (userCompactView) {
+        document.body.classList.add('compact-view');
+    }
+
+
+    // Auto-hide flash messages after 10 seconds
+    // Only auto-hide success and info messages (not warnings or errors)
+    const flashMessages = document.querySelectorAll(".alert-success, .alert-info");
+    flashMessages.forEach(function(alert) {
+        let timeoutId;
+        let startTime = Date.now();
+        let remainingTime = 10000; // 10 seconds
+
+        // Add a progress bar to show countdown
+        const progressBar = document.createElement("div");
+        progressBar.className = "alert-progress-bar";
+        progressBar.style.cssText = `
+            position: absolute;
+            bottom: 0;
+            left: 0;
+            height: 3px;
+            background: rgba(255,255,255,0.8);
+            width: 100%;
+            animation: countdown 10s linear forwards;
+            border-radius: 0 0 4px 4px;
+        `;
+
+        // Make alert position relative for progress bar
+
+        // Add countdown indicator to close button
+        const closeBtn = alert.querySelector(".btn-close");
+        if (closeBtn) {
+            let countdown = 10;
+            const originalTitle = closeBtn.title || "Close";
+
+            const updateCountdown = () => {
+                closeBtn.title = `${originalTitle} (auto-close in ${countdown}s)`;
+                countdown--;
+            };
+
+            updateCountdown();
+            const countdownInterval = setInterval(updateCountdown, 1000);
+
+            // Clear interval when alert is manually closed or auto-closed
+            const observer = new MutationObserver(() => {
+                if (!document.contains(alert)) {
+                    clearInterval(countdownInterval);
+                    observer.disconnect();
+                }
+            });
+            observer.observe(document.body, { childList: true, subtree: true });
+        }
+        alert.style.position = "relative";
+        alert.style.overflow = "hidden";
+        alert.appendChild(progressBar);
+
+        // Function to start countdown
+        function startCountdown() {
+            timeoutId = setTimeout(function() {
+                if (alert && alert.parentNode) {
+                    // Use Bootstrap's alert dismiss functionality
+                    // Add fade-out animation
+                    alert.classList.add("auto-dismissing");
+                    // Wait for animation to complete before removing
+                    setTimeout(() => {
+                        const bsAlert = new bootstrap.Alert(alert);
+                        bsAlert.close();
+                    }, 500); // Match animation duration
+                }
+            }, remainingTime);
+        }
+
+        // Start initial countdown
+        startCountdown();
+
+        // Pause on hover
+        alert.addEventListener("mouseenter", function() {
+            clearTimeout(timeoutId);
+            const elapsed = Date.now() - startTime;
+            remainingTime = Math.max(0, 10000 - elapsed);
+            progressBar.style.animationPlayState = "paused";
+        });
+
+        // Resume on mouse leave
+        alert.addEventListener("mouseleave", function() {
+            if (remainingTime > 0) {
+                startTime = Date.now();
+                progressBar.style.animation = `countdown ${remainingTime}ms linear forwards`;
+                startCountdown();
+            }
+        });
+    });
+
+    // Apply animation preference
+    if (!userAnimations) {
+        document.body.classList.add('no-animations');
+    }
+});
+
+// Add smooth scrolling and animations
+document.addEventListener('DOMContentLoaded', function() {
+    // Animate cards on scroll
+    const cards = document.querySelectorAll('.card');
+    const observer = new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                entry.target.style.opacity = '1';
+                entry.target.style.transform = 'translateY(0)';
+            }
+        });
+    });
+
+    cards.forEach(card => {
+        card.style.opacity = '0';
+        card.style.transform = 'translateY(20px)';
+        card.style.transition = 'opacity 0.6s ease, transform 0.6s ease';
+        observer.observe(card);
+    });
+});
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Fix dropdown positioning for table dropdowns
+    function fixDropdownPositioning() {
+        const dropdowns = document.querySelectorAll('.table .dropdown');
+
+        dropdowns.forEach(dropdown => {
+            const button = dropdown.querySelector('.dropdown-toggle');
+            const menu = dropdown.querySelector('.dropdown-menu');
+
+            if (button && menu) {
+                button.addEventListener('click', function(e) {
+                    // Reset positioning
+                    menu.style.position = 'absolute';
+                    menu.style.top = '';
+                    menu.style.left = '';
+                    menu.style.right = '';
+                    menu.style.transform = '';
+
+                    // Get button position
+                    const buttonRect = button.getBoundingClientRect();
+                    const menuHeight = menu.offsetHeight || 200; // Estimate if not visible
+                    const viewportHeight = window.innerHeight;
+                    const spaceBelow = viewportHeight - buttonRect.bottom;
+                    const spaceAbove = buttonRect.top;
+
+                    // Determine if dropdown should open upward
+                    if (spaceBelow < menuHeight && spaceAbove > menuHeight) {
+                        // Open upward
+                        dropdown.classList.add('dropup');
+                        menu.style.top = 'auto';
+                        menu.style.bottom = '100%';
+                    } else {
+                        // Open downward (default)
+                        dropdown.classList.remove('dropup');
+                        menu.style.top = '100%';
+                        menu.style.bottom = 'auto';
+                    }
+
+                    // Adjust horizontal positioning if needed
+                    const spaceRight = window.innerWidth - buttonRect.right;
+                    if (spaceRight < 200) { // If not enough space on right
+                        menu.classList.add('dropdown-menu-end');
+                    } else {
+                        menu.classList.remove('dropdown-menu-end');
+                    }
+                });
+            }
+        });
+    }
+
+    // Apply fixes on page load
+    fixDropdownPositioning();
+
+    // Reapply fixes when content changes (for dynamic content)
+    const observer = new MutationObserver(function(mutations) {
+        mutations.forEach(function(mutation) {
+            if (mutation.type === 'childList') {
+                fixDropdownPositioning();
+            }
+        });
+    });
+
+    // Observe changes in table containers
+    const tableContainers = document.querySelectorAll('.table-responsive, .table-container');
+    tableContainers.forEach(container => {
+        observer.observe(container, { childList: true, subtree: true });
+    });
+
+    // Handle window resize
+    window.addEventListener('resize', fixDropdownPositioning);
+
+    // Ensure dropdowns are visible when opened
+    document.addEventListener('shown.bs.dropdown', function(e) {
+        const dropdown = e.target.closest('.dropdown');
+        const menu = dropdown.querySelector('.dropdown-menu');
+
+        if (menu) {
+            // Ensure dropdown is visible
+            menu.style.visibility = 'visible';
+            menu.style.opacity = '1';
+
+            // Adjust z-index if needed
+            const zIndex = Math.max(1050, getHighestZIndex() + 1);
+            menu.style.zIndex = zIndex;
+        }
+    });
+
+    // Helper function to get highest z-index
+    function getHighestZIndex() {
+        let highest = 0;
+        const elements = document.querySelectorAll('*');
+
+        elements.forEach(element => {
+            const zIndex = parseInt(window.getComputedStyle(element).zIndex);
+            if (zIndex > highest) {
+                highest = zIndex;
+            }
+        });
+
+        return highest;
+    }
+
+    // Fix user profile dropdown positioning
+    function fixUserProfileDropdown() {
+        const userProfileDropdown = document.querySelector('.user-profile .dropdown');
+
+        if (userProfileDropdown) {
+            const button = userProfileDropdown.querySelector('.dropdown-toggle');
+            const menu = userProfileDropdown.querySelector('.dropdown-menu');
+
+            if (button && menu) {
+                // Force upward opening
+                userProfileDropdown.classList.add('dropup');
+
+                // Handle click event
+                button.addEventListener('click', function(e) {
+                    e.preventDefault();
+                    e.stopPropagation();
+
+                    // Toggle dropdown
+                    const isOpen = userProfileDropdown.classList.contains('show');
+
+                    // Close all other dropdowns first
+                    document.querySelectorAll('.dropdown.show').forEach(dropdown => {
+                        if (dropdown !== userProfileDropdown) {
+                            dropdown.classList.remove('show');
+                            const otherMenu = dropdown.querySelector('.dropdown-menu');
+                            if (otherMenu) {
+                                otherMenu.classList.remove('show');
+                            }
+                        }
+                    });
+
+                    if (isOpen) {
+                        // Close dropdown
+                        userProfileDropdown.classList.remove('show');
+                        menu.classList.remove('show');
+                        button.setAttribute('aria-expanded', 'false');
+                    } else {
+                        // Open dropdown
+                        userProfileDropdown.classList.add('show');
+                        menu.classList.add('show');
+                        button.setAttribute('aria-expanded', 'true');
+
+                        // Force visibility with enhanced styling
+                        menu.style.display = 'block';
+                        menu.style.visibility = 'visible';
+                        menu.style.opacity = '1';
+                        menu.style.position = 'absolute';
+                        menu.style.zIndex = '9999';
+                        menu.style.top = 'auto';
+                        menu.style.bottom = '100%';
+                        menu.style.left = '0';
+                        menu.style.marginBottom = '10px';
+                        menu.style.minWidth = '200px';
+                        menu.style.backgroundColor = '#2d2d2d';
+                        menu.style.border = '1px solid #404040';
+                        menu.style.borderRadius = '0.375rem';
+                        menu.style.boxShadow = '0 0.5rem 1rem rgba(0, 0, 0, 0.5)';
+                    }
+                });
+
+                // Close dropdown when clicking outside
+                document.addEventListener('click', function(e) {
+                    if (!userProfileDropdown.contains(e.target)) {
+                        userProfileDropdown.classList.remove('show');
+                        menu.classList.remove('show');
+                        button.setAttribute('aria-expanded', 'false');
+                    }
+                });
+            }
+        }
+    }
+
+    // Apply user profile dropdown fixes
+    fixUserProfileDropdown();
+});
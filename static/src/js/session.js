@@ -0,0 +1,343 @@
+// Session timeout management and live updates; base.html only loads this for
+// authenticated users.
+let sessionTimeoutWarning = null;
+let sessionTimeoutFinal = null;
+let countdownInterval = null;
+let sessionCheckInterval = null;
+
+let liveEvents = null;
+let sessionWarningShown = false;
+
+function startSessionChecks() {
+    // Session warnings and live updates arrive over Server-Sent Events;
+    // browsers without EventSource fall back to polling every 30 seconds
+    if (window.EventSource) {
+        if (!liveEvents) {
+            connectLiveEvents();
+        }
+    } else if (!sessionCheckInterval) {
+        sessionCheckInterval = setInterval(checkSessionStatus, 30000);
+    }
+}
+
+function connectLiveEvents() {
+    liveEvents = new EventSource('/events/stream');
+
+    liveEvents.addEventListener('session', event => {
+        const data = JSON.parse(event.data);
+        if (data.state === 'active') {
+            sessionWarningShown = false;
+            return;
+        }
+        if (data.state === 'expired') {
+            liveEvents.close();
+            liveEvents = null;
+        }
+        // The stream only knows this tab's activity, so confirm with the server
+        checkSessionStatus();
+    });
+
+    liveEvents.addEventListener('notifications', event => {
+        updateNotificationBadge(JSON.parse(event.data).unread_count);
+    });
+
+    // Pages listen for these as live:execution / live:bug_status DOM events
+    ['execution', 'bug_status'].forEach(type => {
+        liveEvents.addEventListener(type, event => {
+            document.dispatchEvent(new CustomEvent(`live:${type}`, {detail: JSON.parse(event.data)}));
+        });
+    });
+}
+
+startSessionChecks();
+
+function checkSessionStatus() {
+    fetch('/check-session-status')
+        .then(response => response.json())
+        .then(data => {
+            if (!data.authenticated) {
+                // Session expired on server
+                clearAllTimeouts();
+                showSessionExpiredModal();
+                return;
+            }
+
+            const timeRemaining = data.time_remaining_seconds;
+            const warningTime = 5 * 60; // 5 minutes warning
+
+            if (timeRemaining <= warningTime && timeRemaining > 0) {
+                // Show warning modal only if not already shown
+                if (!sessionWarningShown && !document.getElementById('sessionTimeoutModal').classList.contains('show')) {
+                    sessionWarningShown = true;
+                    showSessionTimeoutWarning(timeRemaining);
+                }
+            } else if (timeRemaining <= 0) {
+                // Session expired
+                clearAllTimeouts();
+                showSessionExpiredModal();
+            } else if (timeRemaining > warningTime) {
+                // Reset warning flag if we're back in safe zone
+                sessionWarningShown = false;
+                startSessionChecks();
+            }
+        })
+        .catch(error => {
+            console.error('Session check failed:', error);
+            // If we can't check session, assume it's expired
+            clearAllTimeouts();
+            showSessionExpiredModal();
+        });
+}
+
+function showSessionTimeoutWarning(timeRemaining) {
+    const modal = new bootstrap.Modal(document.getElementById('sessionTimeoutModal'));
+    modal.show();
+
+    // Start countdown
+    startCountdown(timeRemaining);
+
+    // Set final timeout
+    sessionTimeoutFinal = setTimeout(() => {
+        modal.hide();
+        showSessionExpiredModal();
+    }, timeRemaining * 1000);
+}
+
+function startCountdown(seconds) {
+    let remaining = seconds;
+    const countdownElement = document.getElementById('timeoutCountdown');
+
+    function updateCountdown() {
+        const minutes = Math.floor(remaining / 60);
+        const secs = remaining % 60;
+        countdownElement.textContent = `${minutes}:${secs.toString().padStart(2, '0')}`;
+
+        if (remaining <= 0) {
+            clearInterval(countdownInterval);
+            return;
+        }
+
+        remaining--;
+    }
+
+    updateCountdown(); // Initial update
+    countdownInterval = setInterval(updateCountdown, 1000);
+}
+
+function showSessionExpiredModal() {
+    console.log("Session expired - showing modal...");
+
+    // Hide timeout warning modal if shown
+    const timeoutModal = bootstrap.Modal.getInstance(document.getElementById("sessionTimeoutModal"));
+    if (timeoutModal) {
+        console.log("Hiding timeout warning modal...");
+        timeoutModal.hide();
+    }
+
+    // Show expired modal
+    try {
+        const expiredModalElement = document.getElementById("sessionExpiredModal");
+        if (expiredModalElement) {
+            console.log("Showing session expired modal...");
+            const expiredModal = new bootstrap.Modal(expiredModalElement);
+            expiredModal.show();
+
+            // Add event listener for when modal is shown
+            expiredModalElement.addEventListener("shown.bs.modal", function() {
+                console.log("Session expired modal is now visible");
+            });
+        } else {
+            console.error("Session expired modal element not found!");
+            // Fallback - direct redirect
+            redirectToLogin();
+        }
+    } catch (error) {
+        console.error("Error showing session expired modal:", error);
+        // Fallback - direct redirect
+        redirectToLogin();
+    }
+
+    // Clear all intervals
+    clearAllTimeouts();
+
+    // Auto-redirect after 10 seconds if user doesn't click
+    setTimeout(() => {
+        console.log("Auto-redirecting after 10 seconds...");
+        redirectToLogin();
+    }, 10000);
+}
+
+function extendSession() {
+    // Make a request to extend session
+    fetch('/extend-session', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': document.querySelector('meta[name=csrf-token]')?.getAttribute('content') || ''
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Session extended successfully
+            const modal = bootstrap.Modal.getInstance(document.getElementById('sessionTimeoutModal'));
+            if (modal) {
+                modal.hide();
+            }
+            clearAllTimeouts();
+
+            // Show success message
+            showNotification('Session extended successfully!', 'success');
+
+            // Restart session checking
+            startSessionChecks();
+
+            // Reset the warning flag
+            sessionWarningShown = false;
+        } else {
+            // Session extension failed
+            showSessionExpiredModal();
+        }
+    })
+    .catch(error => {
+        console.error('Session extension failed:', error);
+        showSessionExpiredModal();
+    });
+}
+
+function logoutNow() {
+    console.log("Logging out now...");
+
+    // Clear any existing session data
+    try {
+        localStorage.clear();
+        sessionStorage.clear();
+    } catch (e) {
+        console.log("Storage clear error:", e);
+    }
+
+    // Force logout with cache busting
+    const logoutUrl = "/logout?t=" + Date.now();
+    console.log("Redirecting to:", logoutUrl);
+
+    // Try multiple redirect methods
+    try {
+        window.location.replace(logoutUrl);
+    } catch (e) {
+        console.log("Replace failed, trying href:", e);
+        window.location.href = logoutUrl;
+    }
+}
+
+function redirectToLogin() {
+    console.log("Redirecting to login page...");
+
+    // Clear any existing session data
+    try {
+        // Clear local storage
+        localStorage.clear();
+        // Clear session storage
+        sessionStorage.clear();
+    } catch (e) {
+        console.log("Storage clear error:", e);
+    }
+
+    // Force redirect to login with cache busting
+    const loginUrl = "/login?t=" + Date.now();
+    console.log("Redirecting to:", loginUrl);
+
+    // Try multiple redirect methods
+    try {
+        window.location.replace(loginUrl);
+    } catch (e) {
+        console.log("Replace failed, trying href:", e);
+        window.location.href = loginUrl;
+    }
+
+    // Fallback after delay
+    setTimeout(() => {
+        if (window.location.pathname !== "/login") {
+            console.log("Fallback redirect...");
+            window.location = loginUrl;
+        }
+    }, 1000);
+}
+
+function clearAllTimeouts() {
+    if (sessionTimeoutWarning) {
+        clearTimeout(sessionTimeoutWarning);
+        sessionTimeoutWarning = null;
+    }
+    if (sessionTimeoutFinal) {
+        clearTimeout(sessionTimeoutFinal);
+        sessionTimeoutFinal = null;
+    }
+    if (countdownInterval) {
+        clearInterval(countdownInterval);
+        countdownInterval = null;
+    }
+    if (sessionCheckInterval) {
+        clearInterval(sessionCheckInterval);
+        sessionCheckInterval = null;
+    }
+    // Reset warning flag
+    sessionWarningShown = false;
+}
+
+function showNotification(message, type = 'info') {
+    // Create notification element
+    const notification = document.createElement('div');
+    notification.className = `alert alert-${type} alert-dismissible fade show position-fixed`;
+    notification.style.cssText = 'top: 20px; right: 20px; z-index: 9999; min-width: 300px;';
+    notification.innerHTML = `
+        ${message}
+        <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+    `;
+
+    document.body.appendChild(notification);
+
+    // Auto remove after 5 seconds
+    setTimeout(() => {
+        if (notification.parentNode) {
+            notification.parentNode.removeChild(notification);
+        }
+    }, 5000);
+}
+
+function updateNotificationBadge(count) {
+    const badge = document.getElementById('notificationBadge');
+    if (!badge) return;
+    badge.textContent = count;
+    badge.style.display = count > 0 ? '' : 'none';
+}
+
+// Without EventSource, refresh the unread badge from the cached counter every minute
+if (!window.EventSource) {
+    setInterval(() => {
+        fetch('/api/notifications/unread-count')
+            .then(response => response.json())
+            .then(data => updateNotificationBadge(data.unread_count))
+            .catch(() => {});
+    }, 60000);
+}
+
+// Activity tracking - reset session timeout on user activity
+let activityEvents = ['mousedown', 'mousemove', 'keypress', 'scroll', 'touchstart', 'click'];
+let activityTimer = null;
+
+function resetActivityTimer() {
+    clearTimeout(activityTimer);
+    activityTimer = setTimeout(() => {
+        // User has been inactive, but we'll let the server-side timeout handle it
+    }, 1000);
+}
+
+// Add activity listeners
+activityEvents.forEach(event => {
+    document.addEventListener(event, resetActivityTimer, true);
+});
+
+// Initial session check (the live stream reports the session state itself)
+if (!window.EventSource) {
+    checkSessionStatus();
+}
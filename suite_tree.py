@@ -0,0 +1,221 @@
+"""
+Test suite hierarchy backed by the test_suite_closure table.
+
+The closure table holds one row per (ancestor, descendant) pair, so subtree
+lookups, subtree case counts and pass rates are single indexed joins instead
+of recursive walks over TestSuite.parent_suite_id. The helpers here keep it in
+sync when suites are created, moved or deleted; callers commit.
+"""
+from sqlalchemy import func, case, distinct, select, insert, literal
+
+from models import db, TestSuite, TestSuiteClosure, TestCase, TestCaseState
+from case_state import ALL_ENVIRONMENTS
+
+# Guard against cycles in legacy parent_suite_id data while rebuilding
+MAX_TREE_DEPTH = 1000
+
+
+def add_suite(suite):
+    """Insert closure rows for a newly created (flushed) suite"""
+    db.session.add(TestSuiteClosure(ancestor_id=suite.id, descendant_id=suite.id, depth=0))
+    if suite.parent_suite_id:
+        db.session.flush()
+        db.session.execute(insert(TestSuiteClosure).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(TestSuiteClosure.ancestor_id, literal(suite.id), TestSuiteClosure.depth + 1).where(
+                TestSuiteClosure.descendant_id == suite.parent_suite_id
+            )
+        ))
+
+
+def subtree_ids(suite_id):
+    """Ids of a suite and all of its descendants"""
+    return [row[0] for row in db.session.query(TestSuiteClosure.descendant_id).filter(
+        TestSuiteClosure.ancestor_id == suite_id
+    ).all()]
+
+
+def ancestor_ids(suite_id):
+    """Ids of the proper ancestors of a suite, nearest first"""
+    return [row[0] for row in db.session.query(TestSuiteClosure.ancestor_id).filter(
+        TestSuiteClosure.descendant_id == suite_id, TestSuiteClosure.depth > 0
+    ).order_by(TestSuiteClosure.depth).all()]
+
+
+def move_suite(suite, new_parent_id):
+    """Re-parent a suite (and its whole subtree) under new_parent_id
+
+    The subtree takes the suite's project_id, so a suite moved to another
+    project brings its children along. Raises ValueError if the new parent
+    is the suite itself, one of its descendants or a suite of another
+    project.
+    """
+    new_parent_id = int(new_parent_id) if new_parent_id else None
+    project_id = int(suite.project_id) if suite.project_id else None
+    subtree = subtree_ids(suite.id)
+    if new_parent_id in subtree:
+        raise ValueError('A test suite cannot be moved under itself or one of its children')
+    if new_parent_id:
+        parent = TestSuite.query.get(new_parent_id)
+        if not parent:
+            raise ValueError('Parent test suite not found')
+        if parent.project_id != project_id:
+            raise ValueError('A test suite can only be moved under a suite of the same project')
+
+    TestSuite.query.filter(
+        TestSuite.id.in_(subtree), TestSuite.id != suite.id, TestSuite.project_id.is_distinct_from(project_id)
+    ).update({'project_id': project_id}, synchronize_session=False)
+    if new_parent_id == suite.parent_suite_id:
+        return
+
+    # 1. Detach the subtree from its old ancestors
+    TestSuiteClosure.query.filter(
+        TestSuiteClosure.descendant_id.in_(subtree),
+        TestSuiteClosure.ancestor_id.notin_(subtree)
+    ).delete(synchronize_session=False)
+
+    # 2. Attach it below every ancestor of the new parent in one INSERT ... SELECT
+    if new_parent_id:
+        above = db.aliased(TestSuiteClosure)
+        below = db.aliased(TestSuiteClosure)
+        db.session.execute(insert(TestSuiteClosure).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1).select_from(
+                above
+            ).join(below, db.true()).where(
+                above.descendant_id == new_parent_id,
+                below.ancestor_id == suite.id
+            )
+        ))
+
+    suite.parent_suite_id = new_parent_id
+
+
+def remove_suite(suite):
+    """Drop a suite from the tree, re-attaching its children to its parent"""
+    ancestors = ancestor_ids(suite.id)
+    descendants = [sid for sid in subtree_ids(suite.id) if sid != suite.id]
+
+    TestSuiteClosure.query.filter(db.or_(
+        TestSuiteClosure.ancestor_id == suite.id,
+        TestSuiteClosure.descendant_id == suite.id
+    )).delete(synchronize_session=False)
+
+    # Descendants are now one level closer to the suite's ancestors
+    if ancestors and descendants:
+        TestSuiteClosure.query.filter(
+            TestSuiteClosure.ancestor_id.in_(ancestors),
+            TestSuiteClosure.descendant_id.in_(descendants)
+        ).update({'depth': TestSuiteClosure.depth - 1}, synchronize_session=False)
+
+    TestSuite.query.filter_by(parent_suite_id=suite.id).update(
+        {'parent_suite_id': suite.parent_suite_id}, synchronize_session=False
+    )
+
+
+def rebuild_closure():
+    """Rebuild the closure table from TestSuite.parent_suite_id, one level per statement"""
+    TestSuiteClosure.query.delete(synchronize_session=False)
+    db.session.execute(insert(TestSuiteClosure).from_select(
+        ['ancestor_id', 'descendant_id', 'depth'],
+        select(TestSuite.id, TestSuite.id, literal(0))
+    ))
+
+    depth = 1
+    while depth <= MAX_TREE_DEPTH:
+        result = db.session.execute(insert(TestSuiteClosure).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(TestSuiteClosure.ancestor_id, TestSuite.id, literal(depth)).join(
+                TestSuite, TestSuite.parent_suite_id == TestSuiteClosure.descendant_id
+            ).where(TestSuiteClosure.depth == depth - 1)
+        ))
+        if not result.rowcount:
+            break
+        depth += 1
+    return db.session.query(func.count()).select_from(TestSuiteClosure).scalar()
+
+
+def closure_rows():
+    """Every closure row as an (ancestor_id, descendant_id, depth) set, to compare before and after a rebuild"""
+    return set(db.session.query(
+        TestSuiteClosure.ancestor_id, TestSuiteClosure.descendant_id, TestSuiteClosure.depth
+    ).all())
+
+
+def ensure_closure():
+    """Populate the closure table for suites created before it existed"""
+    has_suites = db.session.query(TestSuite.id).first() is not None
+    has_closure = db.session.query(TestSuiteClosure.ancestor_id).first() is not None
+    if has_suites and not has_closure:
+        rebuild_closure()
+        db.session.commit()
+
+
+def _in_subtree(closure):
+    """Join condition matching test cases filed under any suite of a subtree"""
+    return db.or_(TestCase.suite_id == closure.descendant_id,
+                  TestCase.test_suite_id == closure.descendant_id)
+
+
+def subtree_test_cases(suite_id):
+    """Query for the test cases filed under a suite or any of its descendants"""
+    descendants = select(TestSuiteClosure.descendant_id).where(TestSuiteClosure.ancestor_id == suite_id)
+    return TestCase.query.filter(db.or_(
+        TestCase.suite_id.in_(descendants), TestCase.test_suite_id.in_(descendants)
+    ))
+
+
+def subtree_case_counts(suite_ids=None):
+    """Return {suite_id: number of test cases in the suite's subtree}"""
+    closure = db.aliased(TestSuiteClosure)
+    query = db.session.query(
+        closure.ancestor_id, func.count(distinct(TestCase.id))
+    ).join(TestCase, _in_subtree(closure)).group_by(closure.ancestor_id)
+    if suite_ids is not None:
+        query = query.filter(closure.ancestor_id.in_(suite_ids))
+    return dict(query.all())
+
+
+def tree_nodes(project_id=None, parent_id=None, suite_ids=None):
+    """Suites one level below parent_id (roots when None) with subtree rollups
+
+    Each node carries its subtree suite count, case count and pass rate over
+    the latest execution of every case, all computed by a single grouped query.
+    suite_ids may be given instead to fetch specific nodes.
+    """
+    closure = db.aliased(TestSuiteClosure)
+
+    query = db.session.query(
+        TestSuite.id, TestSuite.name, TestSuite.project_id, TestSuite.parent_suite_id,
+        func.count(distinct(closure.descendant_id)).label('suite_count'),
+        func.count(distinct(TestCase.id)).label('case_count'),
+        func.count(distinct(case((TestCaseState.id.isnot(None), TestCase.id)))).label('executed'),
+        func.count(distinct(case((TestCaseState.status == 'Pass', TestCase.id)))).label('passed')
+    ).outerjoin(closure, closure.ancestor_id == TestSuite.id
+    ).outerjoin(TestCase, _in_subtree(closure)
+    ).outerjoin(TestCaseState, db.and_(TestCaseState.test_case_id == TestCase.id,
+                                       TestCaseState.environment == ALL_ENVIRONMENTS))
+
+    if suite_ids is not None:
+        query = query.filter(TestSuite.id.in_(suite_ids))
+    else:
+        query = query.filter(TestSuite.parent_suite_id == parent_id if parent_id else TestSuite.parent_suite_id.is_(None))
+        if project_id and not parent_id:
+            query = query.filter(TestSuite.project_id == project_id)
+
+    rows = query.group_by(
+        TestSuite.id, TestSuite.name, TestSuite.project_id, TestSuite.parent_suite_id
+    ).order_by(TestSuite.name).all()
+
+    return [{
+        'id': row.id,
+        'name': row.name,
+        'project_id': row.project_id,
+        'parent_suite_id': row.parent_suite_id,
+        'has_children': row.suite_count > 1,
+        'descendant_suites': max(row.suite_count - 1, 0),
+        'case_count': row.case_count,
+        'executed': row.executed,
+        'passed': row.passed,
+        'pass_rate': round(row.passed / row.executed * 100, 2) if row.executed else 0
+    } for row in rows]
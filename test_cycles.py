@@ -0,0 +1,255 @@
+"""
+Test cycle execution engine.
+
+A cycle snapshots its planned test cases into test_cycle_case when it is
+created. Progress lives in test_cycle_progress as plain counters that are
+adjusted by one UPDATE whenever an execution moves a planned case from one
+bucket to another, so the cycle dashboard never joins executions against the
+plan. Helpers here do not commit; callers do.
+"""
+from sqlalchemy import func, select, insert, literal, or_
+
+from models import db, TestCycle, TestCycleCase, TestCycleProgress, TestCase, TestExecution
+from suite_tree import subtree_test_cases
+
+NOT_RUN = 'Not Run'
+
+# Execution status -> progress counter column; anything else counts as not run
+STATUS_COUNTERS = {
+    'Pass': 'passed',
+    'Fail': 'failed',
+    'Blocked': 'blocked'
+}
+
+CYCLE_FILTERS = ('project_id', 'priority', 'type', 'status')
+CYCLE_STATUSES = ('Planning', 'In Progress', 'Completed')
+
+
+def counter_for(status):
+    """Progress counter column an execution status falls into"""
+    return STATUS_COUNTERS.get(status, 'not_run')
+
+
+def planned_cases_query(suite_id=None, filters=None):
+    """Test cases a new cycle should plan: a suite subtree and/or simple filters"""
+    query = subtree_test_cases(suite_id) if suite_id else TestCase.query
+    for field, value in (filters or {}).items():
+        if field in CYCLE_FILTERS and value:
+            query = query.filter(getattr(TestCase, field) == value)
+    return query
+
+
+def create_cycle(name, created_by, project_id=None, description=None, suite_id=None, filters=None,
+                 start_date=None, end_date=None):
+    """Create a cycle and snapshot its planned case list with one INSERT ... SELECT"""
+    cycle = TestCycle(
+        name=name,
+        description=description,
+        project_id=project_id,
+        start_date=start_date,
+        end_date=end_date,
+        status='Planning',
+        created_by=created_by
+    )
+    db.session.add(cycle)
+    db.session.flush()
+
+    case_ids = planned_cases_query(suite_id, filters).with_entities(TestCase.id).order_by(None)
+    db.session.execute(insert(TestCycleCase).from_select(
+        ['test_cycle_id', 'test_case_id', 'status'],
+        select(literal(cycle.id), case_ids.subquery().c.id, literal(NOT_RUN))
+    ))
+
+    planned = db.session.query(func.count(TestCycleCase.id)).filter(
+        TestCycleCase.test_cycle_id == cycle.id
+    ).scalar()
+    db.session.add(TestCycleProgress(test_cycle_id=cycle.id, planned=planned, not_run=planned))
+    return cycle
+
+
+def _move_counter(cycle_id, old_status, new_status):
+    """Shift one planned case between progress counters with a single UPDATE"""
+    old_counter, new_counter = counter_for(old_status), counter_for(new_status)
+    if old_counter == new_counter:
+        return
+    TestCycleProgress.query.filter_by(test_cycle_id=cycle_id).update({
+        old_counter: getattr(TestCycleProgress, old_counter) - 1,
+        new_counter: getattr(TestCycleProgress, new_counter) + 1
+    }, synchronize_session=False)
+
+
+def record_execution(execution):
+    """Apply a newly flushed execution to its cycle's plan and counters"""
+    if not execution.test_cycle_id:
+        return
+    # Locked until commit: a concurrent execution of the case waits here instead of moving the counters
+    # from the same old status
+    planned = TestCycleCase.query.filter_by(
+        test_cycle_id=execution.test_cycle_id, test_case_id=execution.test_case_id
+    ).with_for_update().populate_existing().first()
+    if not planned:
+        # Executions of unplanned cases are kept but don't affect progress
+        return
+
+    _move_counter(execution.test_cycle_id, planned.status, execution.status)
+    planned.status = execution.status
+    planned.last_execution_id = execution.id
+
+    cycle = TestCycle.query.get(execution.test_cycle_id)
+    if cycle and cycle.status == 'Planning':
+        cycle.status = 'In Progress'
+
+
+def forget_execution(execution):
+    """Roll a cycle's plan back to the previous execution before one is deleted"""
+    if not execution.test_cycle_id:
+        return
+    planned = TestCycleCase.query.filter_by(
+        test_cycle_id=execution.test_cycle_id, test_case_id=execution.test_case_id,
+        last_execution_id=execution.id
+    ).with_for_update().populate_existing().first()
+    if not planned:
+        return
+
+    previous = TestExecution.query.filter(
+        TestExecution.test_cycle_id == execution.test_cycle_id,
+        TestExecution.test_case_id == execution.test_case_id,
+        TestExecution.id != execution.id
+    ).order_by(TestExecution.id.desc()).first()
+
+    new_status = previous.status if previous else NOT_RUN
+    _move_counter(execution.test_cycle_id, planned.status, new_status)
+    planned.status = new_status
+    planned.last_execution_id = previous.id if previous else None
+
+
+def release_executions(execution_ids):
+    """Unlink plan rows from executions that are about to be bulk-deleted
+
+    Returns the ids of the affected cycles; pass each one to rebuild_progress()
+    once the executions are gone.
+    """
+    if not execution_ids:
+        return []
+    cycle_ids = [row[0] for row in db.session.query(TestCycleCase.test_cycle_id).filter(
+        TestCycleCase.last_execution_id.in_(execution_ids)
+    ).distinct().all()]
+    if cycle_ids:
+        TestCycleCase.query.filter(TestCycleCase.last_execution_id.in_(execution_ids)).update(
+            {'last_execution_id': None}, synchronize_session=False
+        )
+    return cycle_ids
+
+
+def remove_cases_from_cycles(test_case_ids):
+    """Drop deleted test cases from every cycle plan, adjusting counters
+
+    Three statements whatever the number of cases and cycles: lock the plan
+    rows, subtract their per-counter counts from each cycle with one UPDATE,
+    and delete them.
+    """
+    if not test_case_ids:
+        return
+    cycle_ids = {row[0] for row in TestCycleCase.query.filter(
+        TestCycleCase.test_case_id.in_(test_case_ids)
+    ).with_entities(TestCycleCase.test_cycle_id).with_for_update().all()}
+    if not cycle_ids:
+        return
+
+    def removed(*conditions):
+        return select(func.count(TestCycleCase.id)).where(
+            TestCycleCase.test_cycle_id == TestCycleProgress.test_cycle_id,
+            TestCycleCase.test_case_id.in_(test_case_ids),
+            *conditions
+        ).scalar_subquery()
+
+    counted = list(STATUS_COUNTERS)
+    values = {'planned': TestCycleProgress.planned - removed()}
+    for status, counter in STATUS_COUNTERS.items():
+        values[counter] = getattr(TestCycleProgress, counter) - removed(TestCycleCase.status == status)
+    values['not_run'] = TestCycleProgress.not_run - removed(
+        or_(TestCycleCase.status.is_(None), TestCycleCase.status.notin_(counted))
+    )
+    TestCycleProgress.query.filter(TestCycleProgress.test_cycle_id.in_(cycle_ids)).update(
+        values, synchronize_session=False
+    )
+    TestCycleCase.query.filter(TestCycleCase.test_case_id.in_(test_case_ids)).delete(
+        synchronize_session=False
+    )
+
+
+def delete_cycle(cycle):
+    """Delete a cycle with its plan and counters; its executions are kept"""
+    TestExecution.query.filter_by(test_cycle_id=cycle.id).update(
+        {'test_cycle_id': None}, synchronize_session=False
+    )
+    TestCycleCase.query.filter_by(test_cycle_id=cycle.id).delete(synchronize_session=False)
+    TestCycleProgress.query.filter_by(test_cycle_id=cycle.id).delete(synchronize_session=False)
+    db.session.delete(cycle)
+
+
+def cycle_progress(cycle_id):
+    """Progress counters of a cycle as a dict (a single primary-key read)"""
+    progress = TestCycleProgress.query.get(cycle_id)
+    return progress_dict(progress)
+
+
+def progress_dict(progress):
+    """Serialise a TestCycleProgress row with derived percentages"""
+    if not progress:
+        return {'planned': 0, 'not_run': 0, 'passed': 0, 'failed': 0, 'blocked': 0,
+                'executed': 0, 'completion_pct': 0, 'pass_rate': 0}
+    executed = progress.planned - progress.not_run
+    return {
+        'planned': progress.planned,
+        'not_run': progress.not_run,
+        'passed': progress.passed,
+        'failed': progress.failed,
+        'blocked': progress.blocked,
+        'executed': executed,
+        'completion_pct': round(executed / progress.planned * 100, 2) if progress.planned else 0,
+        'pass_rate': round(progress.passed / executed * 100, 2) if executed else 0
+    }
+
+
+def progress_rows():
+    """Counter and plan rows as a set of tuples, to compare before and after a rebuild"""
+    db.session.flush()
+    counters = db.session.query(
+        TestCycleProgress.test_cycle_id, TestCycleProgress.planned, TestCycleProgress.not_run,
+        TestCycleProgress.passed, TestCycleProgress.failed, TestCycleProgress.blocked
+    ).all()
+    plans = db.session.query(TestCycleCase.id, TestCycleCase.status, TestCycleCase.last_execution_id).all()
+    return {('progress',) + tuple(row) for row in counters} | {('plan',) + tuple(row) for row in plans}
+
+
+def rebuild_progress(cycle_id=None):
+    """Recompute plan statuses and counters from the execution history
+
+    Used to verify or repair counters after bulk operations that bypass
+    record_execution(). Returns the number of cycles rebuilt.
+    """
+    cycle_ids = [cycle_id] if cycle_id else [row[0] for row in db.session.query(TestCycle.id).all()]
+    for cid in cycle_ids:
+        latest = dict(db.session.query(
+            TestExecution.test_case_id, func.max(TestExecution.id)
+        ).filter(TestExecution.test_cycle_id == cid).group_by(TestExecution.test_case_id).all())
+        statuses = dict(db.session.query(TestExecution.id, TestExecution.status).filter(
+            TestExecution.id.in_(list(latest.values()))
+        ).all()) if latest else {}
+
+        counts = {'planned': 0, 'not_run': 0, 'passed': 0, 'failed': 0, 'blocked': 0}
+        for planned in TestCycleCase.query.filter_by(test_cycle_id=cid).all():
+            execution_id = latest.get(planned.test_case_id)
+            planned.last_execution_id = execution_id
+            planned.status = statuses.get(execution_id, NOT_RUN)
+            counts['planned'] += 1
+            counts[counter_for(planned.status)] += 1
+
+        progress = TestCycleProgress.query.get(cid)
+        if not progress:
+            progress = TestCycleProgress(test_cycle_id=cid)
+            db.session.add(progress)
+        for field, value in counts.items():
+            setattr(progress, field, value)
+    return len(cycle_ids)
@@ -0,0 +1,201 @@
+"""
+Requirement traceability: requirements x linked test cases x latest execution status.
+
+Everything here is computed with a handful of set-based queries instead of
+one query per requirement / test case.
+
+Coverage rollups are cached per process. Writers bump the project's
+coverage_version row in their own transaction (invalidate_coverage), and a
+cached rollup is only served while the versions it was built at are still
+current, so every worker sees a change as soon as it commits.
+"""
+import time
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Requirement, TestCase, TestCaseState, Project, User, CoverageVersion
+from case_state import ALL_ENVIRONMENTS
+
+# Per-project coverage rollups, keyed by project_id (None = all projects)
+COVERAGE_CACHE_TTL = 300  # seconds; bounds staleness after writes outside the app (CLI loads)
+UNSCOPED = 0  # coverage_version row for changes whose project is unknown
+_coverage_cache = {}
+
+
+def latest_execution_status(test_case_ids):
+    """Return {test_case_id: status} of the newest execution of each test case"""
+    if not test_case_ids:
+        return {}
+    rows = db.session.query(TestCaseState.test_case_id, TestCaseState.status).filter(
+        TestCaseState.test_case_id.in_(test_case_ids),
+        TestCaseState.environment == ALL_ENVIRONMENTS
+    ).all()
+    return {test_case_id: status for test_case_id, status in rows}
+
+
+def build_traceability_matrix(project_id=None, requirement_ids=None):
+    """Build the traceability matrix for one project (or all projects)
+
+    requirement_ids optionally restricts the matrix to specific requirements.
+    Returns a list of requirement dicts, each with its linked test cases, the
+    latest execution status of each case and the coverage rollup.
+    """
+    # 1. Requirements with project name and creator in one query
+    req_query = db.session.query(
+        Requirement.id, Requirement.title, Requirement.type, Requirement.priority,
+        Requirement.status, Requirement.project_id,
+        Project.name.label('project_name'), User.username.label('created_by')
+    ).outerjoin(Project, Project.id == Requirement.project_id
+    ).outerjoin(User, User.id == Requirement.created_by)
+    if project_id:
+        req_query = req_query.filter(Requirement.project_id == project_id)
+    if requirement_ids is not None:
+        req_query = req_query.filter(Requirement.id.in_(requirement_ids))
+    requirements = req_query.order_by(Requirement.id).all()
+
+    if not requirements:
+        return []
+
+    # 2. All linked test cases for those requirements in one query
+    requirement_ids = [req.id for req in requirements]
+    case_rows = db.session.query(
+        TestCase.id, TestCase.title, TestCase.priority, TestCase.requirement_id
+    ).filter(TestCase.requirement_id.in_(requirement_ids)).order_by(TestCase.id).all()
+
+    # 3. Latest execution status of every linked case in one query
+    statuses = latest_execution_status([tc.id for tc in case_rows])
+
+    cases_by_requirement = {}
+    for tc in case_rows:
+        cases_by_requirement.setdefault(tc.requirement_id, []).append({
+            'id': tc.id,
+            'title': tc.title,
+            'priority': tc.priority,
+            'latest_status': statuses.get(tc.id, 'Not Run')
+        })
+
+    matrix = []
+    for req in requirements:
+        linked = cases_by_requirement.get(req.id, [])
+        matrix.append({
+            'id': req.id,
+            'title': req.title,
+            'type': req.type,
+            'priority': req.priority,
+            'status': req.status,
+            'project_id': req.project_id,
+            'project_name': req.project_name or 'No Project',
+            'created_by': req.created_by or 'Unknown',
+            'linked_test_cases': linked,
+            'coverage': _rollup([tc['latest_status'] for tc in linked])
+        })
+    return matrix
+
+
+def _rollup(statuses):
+    """Summarise a list of latest statuses into coverage percentages"""
+    total = len(statuses)
+    executed = len([s for s in statuses if s != 'Not Run'])
+    passed = len([s for s in statuses if s == 'Pass'])
+    return {
+        'linked': total,
+        'executed': executed,
+        'passed': passed,
+        'failed': len([s for s in statuses if s == 'Fail']),
+        'coverage_pct': round(executed / total * 100, 2) if total else 0,
+        'pass_pct': round(passed / total * 100, 2) if total else 0
+    }
+
+
+def _coverage_version(project_id):
+    """Versions a rollup of project_id depends on; read in the same transaction as the rollup"""
+    if project_id is None:
+        # Every bump adds one, so the sum moves whenever any project changes
+        return db.session.query(func.coalesce(func.sum(CoverageVersion.version), 0)).scalar()
+    return tuple(sorted(db.session.query(CoverageVersion.project_id, CoverageVersion.version).filter(
+        CoverageVersion.project_id.in_((int(project_id), UNSCOPED))
+    ).all()))
+
+
+def project_coverage(project_id=None, matrix=None):
+    """Per-requirement coverage percentages for a project, cached per project
+
+    A matrix the caller already built for project_id is rolled up (and
+    cached) instead of being built again.
+    """
+    version = _coverage_version(project_id)
+    if matrix is None:
+        cached = _coverage_cache.get(project_id)
+        if cached and cached[1] == version and time.time() - cached[0] < COVERAGE_CACHE_TTL:
+            return cached[2]
+        matrix = build_traceability_matrix(project_id)
+
+    requirements = {row['id']: row['coverage'] for row in matrix}
+    covered = len([c for c in requirements.values() if c['linked']])
+    coverage = {
+        'project_id': project_id,
+        'total_requirements': len(requirements),
+        'covered_requirements': covered,
+        'requirement_coverage_pct': round(covered / len(requirements) * 100, 2) if requirements else 0,
+        'requirements': requirements
+    }
+    _coverage_cache[project_id] = (time.time(), version, coverage)
+    return coverage
+
+
+def invalidate_coverage(project_id=None):
+    """Mark cached coverage of a project (and the all-projects rollup) stale in every process
+
+    Bumps the project's coverage_version row, so call it before the writing
+    transaction commits. Without a project_id every project is affected.
+    """
+    key = int(project_id) if project_id else UNSCOPED
+    bump = {'version': CoverageVersion.version + 1}
+    if CoverageVersion.query.filter_by(project_id=key).update(bump, synchronize_session=False):
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(CoverageVersion(project_id=key, version=1))
+    except IntegrityError:
+        # Another transaction created the row first
+        CoverageVersion.query.filter_by(project_id=key).update(bump, synchronize_session=False)
+
+
+def invalidate_case_coverage(test_case):
+    """Mark coverage affected by a new or removed execution of test_case stale; call before committing"""
+    if not test_case or not test_case.requirement_id:
+        return
+    project_id = db.session.query(Requirement.project_id).filter(
+        Requirement.id == test_case.requirement_id
+    ).scalar()
+    invalidate_coverage(project_id)
+
+
+def apply_requirement_links(requirement_id, test_case_ids):
+    """Make test_case_ids the exact set of cases linked to a requirement
+
+    Only the difference is written: one UPDATE for cases to unlink and one for
+    cases to link. The caller commits. Returns (linked_count, added, removed).
+    """
+    wanted = set(int(tc_id) for tc_id in test_case_ids)
+    current = set(tc_id for (tc_id,) in db.session.query(TestCase.id).filter(
+        TestCase.requirement_id == requirement_id
+    ).all())
+
+    to_remove = current - wanted
+    to_add = wanted - current
+
+    removed = 0
+    if to_remove:
+        removed = TestCase.query.filter(
+            TestCase.id.in_(to_remove), TestCase.requirement_id == requirement_id
+        ).update({'requirement_id': None}, synchronize_session=False)
+
+    added = 0
+    if to_add:
+        added = TestCase.query.filter(
+            TestCase.id.in_(to_add)
+        ).update({'requirement_id': requirement_id}, synchronize_session=False)
+
+    return len(current) - removed + added, added, removed
@@ -0,0 +1,340 @@
+"""
+Outbound webhooks.
+
+Routes call enqueue() before they commit, so one outbox row per subscribed
+endpoint is written in the same transaction as the execution or bug change
+that caused it: an event is never sent for a change that rolled back, and
+never lost for one that committed.
+
+A poller thread per process finds endpoints with due rows and hands each to
+a small worker pool. A worker leases up to WEBHOOK_BATCH_SIZE rows of its
+endpoint (the lease keeps other processes off them), POSTs them as one JSON
+body signed with the endpoint's secret and marks them delivered, or
+reschedules them with exponential backoff and jitter; after
+WEBHOOK_MAX_ATTEMPTS a row is dead. WEBHOOK_CIRCUIT_THRESHOLD failed batches
+in a row open the endpoint's circuit: it is left alone for
+WEBHOOK_CIRCUIT_COOLDOWN seconds, then one batch probes it again. Once an
+endpoint's backlog reaches WEBHOOK_MAX_BACKLOG, new events for it are
+dropped and counted rather than piling up.
+
+Receivers verify X-Webhook-Signature, "sha256=" + HMAC-SHA256(secret,
+"<X-Webhook-Timestamp>.<body>"). `python webhooks.py` runs a receiver that
+prints what it gets, as a stand-in for a real integration.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import random
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+
+from models import db, WebhookEndpoint, WebhookOutbox
+
+logger = logging.getLogger(__name__)
+
+EVENTS = ('execution.failed', 'bug.status_changed')
+CACHE_TTL = 10  # seconds endpoint subscriptions and backlog sizes are cached per process
+LEASE_SECONDS = 60  # longer than one delivery can take (timeout plus bookkeeping)
+MAX_ERROR_LENGTH = 500
+
+
+def sign(secret, timestamp, body):
+    return 'sha256=' + hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+
+
+def new_secret():
+    return secrets.token_hex(32)
+
+
+class UrllibSender:
+    """POSTs with the standard library; returns (status code or None, error message)"""
+
+    def post(self, url, body, headers, timeout):
+        request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return response.status, None
+        except urllib.error.HTTPError as e:
+            return e.code, f'HTTP {e.code}'
+        except (urllib.error.URLError, OSError) as e:
+            return None, str(getattr(e, 'reason', e))
+
+
+class WebhookDispatcher:
+    """Flask extension: the outbox writer and the per-process delivery workers"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.sender = UrllibSender()
+        self._lock = threading.Lock()
+        self._poller = None
+        self._pool = None
+        self._in_flight = set()  # endpoint ids with a batch being delivered by this process
+        self._subscriptions = (0, {})  # (loaded at, {event: [endpoint ids]})
+        self._backlog = (0, {})  # (counted at, {endpoint id: pending rows})
+        self._pruned_at = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('WEBHOOK_DELIVERY', 'inline')  # inline (web processes) or external (flask webhook-worker)
+        app.config.setdefault('WEBHOOK_WORKERS', 4)
+        app.config.setdefault('WEBHOOK_POLL_INTERVAL', 1.0)  # seconds
+        app.config.setdefault('WEBHOOK_BATCH_SIZE', 50)
+        app.config.setdefault('WEBHOOK_TIMEOUT', 10)  # seconds per POST
+        app.config.setdefault('WEBHOOK_MAX_ATTEMPTS', 10)
+        app.config.setdefault('WEBHOOK_BACKOFF_BASE', 2)  # seconds before the first retry, doubled each time
+        app.config.setdefault('WEBHOOK_BACKOFF_MAX', 3600)
+        app.config.setdefault('WEBHOOK_CIRCUIT_THRESHOLD', 5)
+        app.config.setdefault('WEBHOOK_CIRCUIT_COOLDOWN', 300)  # seconds
+        app.config.setdefault('WEBHOOK_MAX_BACKLOG', 10000)
+        app.config.setdefault('WEBHOOK_RETENTION_DAYS', 7)  # delivered and dead rows are kept this long
+        self.app = app
+        app.extensions['webhooks'] = self
+        if app.config['WEBHOOK_DELIVERY'] == 'inline':
+            app.before_request(self._ensure_worker)
+
+    # Publishing
+
+    def _subscribers(self, event):
+        loaded_at, subscriptions = self._subscriptions
+        if time.monotonic() - loaded_at > CACHE_TTL:
+            subscriptions = {}
+            for endpoint_id, events in db.session.query(WebhookEndpoint.id, WebhookEndpoint.events).filter(
+                    WebhookEndpoint.is_active.is_(True)):
+                for name in events.split(','):
+                    subscriptions.setdefault(name.strip(), []).append(endpoint_id)
+            self._subscriptions = (time.monotonic(), subscriptions)
+        return subscriptions.get(event, [])
+
+    def _backlog_sizes(self):
+        counted_at, backlog = self._backlog
+        if time.monotonic() - counted_at > CACHE_TTL:
+            backlog = dict(db.session.query(WebhookOutbox.endpoint_id, func.count(WebhookOutbox.id)).filter(
+                WebhookOutbox.status == 'pending').group_by(WebhookOutbox.endpoint_id).all())
+            self._backlog = (time.monotonic(), backlog)
+        return backlog
+
+    def invalidate(self):
+        """Forget cached subscriptions after endpoints change"""
+        self._subscriptions = (0, {})
+
+    def enqueue(self, event, data):
+        """Add event to the outbox of every subscribed endpoint, in the caller's transaction
+
+        The caller commits. Returns the number of rows written.
+        """
+        endpoint_ids = self._subscribers(event)
+        if not endpoint_ids:
+            return 0
+        backlog = self._backlog_sizes()
+        limit = self.app.config['WEBHOOK_MAX_BACKLOG']
+        full = [endpoint_id for endpoint_id in endpoint_ids if backlog.get(endpoint_id, 0) >= limit]
+        if full:
+            WebhookEndpoint.query.filter(WebhookEndpoint.id.in_(full)).update(
+                {'dropped_events': WebhookEndpoint.dropped_events + 1}, synchronize_session=False
+            )
+        now = datetime.utcnow()
+        payload = json.dumps(data, default=str)
+        rows = [{'endpoint_id': endpoint_id, 'event': event, 'payload': payload, 'status': 'pending',
+                 'attempts': 0, 'next_attempt_at': now, 'created_at': now}
+                for endpoint_id in endpoint_ids if endpoint_id not in full]
+        if rows:
+            db.session.execute(insert(WebhookOutbox), rows)
+        return len(rows)
+
+    # Workers
+
+    def _ensure_worker(self):
+        # Started lazily so each gunicorn worker process gets its own threads after fork
+        if self._poller and self._poller.is_alive():
+            return
+        with self._lock:
+            if not (self._poller and self._poller.is_alive()):
+                self._pool = ThreadPoolExecutor(self.app.config['WEBHOOK_WORKERS'], thread_name_prefix='webhook')
+                self._poller = threading.Thread(target=self.run, name='webhook-poller', daemon=True)
+                self._poller.start()
+
+    def run(self, stop=None):
+        """Poll for due endpoints until stop (a threading.Event) is set"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.app.config['WEBHOOK_WORKERS'], thread_name_prefix='webhook')
+        while not (stop and stop.is_set()):
+            try:
+                with self.app.app_context():
+                    for endpoint_id in self.due_endpoints():
+                        self._submit(endpoint_id)
+                    self._prune()
+            except Exception:
+                logger.exception("Webhook poll failed")
+            time.sleep(self.app.config['WEBHOOK_POLL_INTERVAL'])
+
+    def _submit(self, endpoint_id):
+        with self._lock:
+            if endpoint_id in self._in_flight:
+                return
+            self._in_flight.add(endpoint_id)
+        self._pool.submit(self._deliver_in_context, endpoint_id)
+
+    def _deliver_in_context(self, endpoint_id):
+        try:
+            with self.app.app_context():
+                self.deliver(endpoint_id)
+        except Exception:
+            logger.exception("Webhook delivery to endpoint %s failed", endpoint_id)
+        finally:
+            with self._lock:
+                self._in_flight.discard(endpoint_id)
+
+    def due_endpoints(self):
+        """Active endpoints with rows ready to send and a closed (or cooled-down) circuit"""
+        now = datetime.utcnow()
+        query = db.session.query(WebhookOutbox.endpoint_id).join(
+            WebhookEndpoint, WebhookEndpoint.id == WebhookOutbox.endpoint_id
+        ).filter(
+            WebhookOutbox.status == 'pending', WebhookOutbox.next_attempt_at <= now,
+            db.or_(WebhookOutbox.lease_until.is_(None), WebhookOutbox.lease_until < now),
+            WebhookEndpoint.is_active.is_(True),
+            db.or_(WebhookEndpoint.circuit_open_until.is_(None), WebhookEndpoint.circuit_open_until <= now)
+        ).distinct()
+        endpoint_ids = [row[0] for row in query]
+        db.session.rollback()
+        return endpoint_ids
+
+    def _lease(self, endpoint_id):
+        """Claim due rows of one endpoint; rows another process claimed first are skipped"""
+        config = self.app.config
+        now = datetime.utcnow()
+        unleased = db.or_(WebhookOutbox.lease_until.is_(None), WebhookOutbox.lease_until < now)
+        candidate_ids = [row[0] for row in db.session.query(WebhookOutbox.id).filter(
+            WebhookOutbox.endpoint_id == endpoint_id, WebhookOutbox.status == 'pending',
+            WebhookOutbox.next_attempt_at <= now, unleased
+        ).order_by(WebhookOutbox.id).limit(config['WEBHOOK_BATCH_SIZE'])]
+        if not candidate_ids:
+            return None, []
+        token = secrets.token_hex(16)
+        WebhookOutbox.query.filter(WebhookOutbox.id.in_(candidate_ids), WebhookOutbox.status == 'pending',
+                                   unleased).update(
+            {'lease_token': token, 'lease_until': now + timedelta(seconds=LEASE_SECONDS)}, synchronize_session=False
+        )
+        db.session.commit()
+        rows = WebhookOutbox.query.filter_by(lease_token=token).order_by(WebhookOutbox.id).all()
+        return token, rows
+
+    def deliver(self, endpoint_id):
+        """Send one batch of an endpoint's due events; returns the number delivered"""
+        config = self.app.config
+        endpoint = db.session.get(WebhookEndpoint, endpoint_id)
+        if endpoint is None or not endpoint.is_active:
+            return 0
+        token, rows = self._lease(endpoint_id)
+        if not rows:
+            return 0
+
+        body = json.dumps({'events': [{
+            'id': row.id,
+            'type': row.event,
+            'created_at': row.created_at.isoformat() + 'Z',
+            'data': json.loads(row.payload)
+        } for row in rows]}).encode()
+        timestamp = str(int(time.time()))
+        status, error = self.sender.post(endpoint.url, body, {
+            'Content-Type': 'application/json',
+            'User-Agent': 'TestPro-Webhooks/1',
+            'X-Webhook-Endpoint': str(endpoint.id),
+            'X-Webhook-Timestamp': timestamp,
+            'X-Webhook-Signature': sign(endpoint.secret, timestamp, body),
+        }, config['WEBHOOK_TIMEOUT'])
+
+        now = datetime.utcnow()
+        ids = [row.id for row in rows]
+        if status is not None and 200 <= status < 300:
+            WebhookOutbox.query.filter(WebhookOutbox.id.in_(ids)).update(
+                {'status': 'delivered', 'delivered_at': now, 'lease_token': None, 'lease_until': None,
+                 'attempts': WebhookOutbox.attempts + 1}, synchronize_session=False
+            )
+            endpoint.consecutive_failures = 0
+            endpoint.circuit_open_until = None
+            endpoint.last_success_at = now
+            db.session.commit()
+            return len(rows)
+
+        error = (error or f'HTTP {status}')[:MAX_ERROR_LENGTH]
+        for row in rows:
+            row.attempts += 1
+            row.last_error = error
+            row.lease_token = row.lease_until = None
+            if row.attempts >= config['WEBHOOK_MAX_ATTEMPTS']:
+                row.status = 'dead'
+            else:
+                # Full jitter keeps retries from many processes from arriving in lockstep
+                delay = min(config['WEBHOOK_BACKOFF_MAX'], config['WEBHOOK_BACKOFF_BASE'] * 2 ** (row.attempts - 1))
+                row.next_attempt_at = now + timedelta(seconds=random.uniform(delay / 2, delay))
+        endpoint.consecutive_failures += 1
+        endpoint.last_error = error
+        if endpoint.consecutive_failures >= config['WEBHOOK_CIRCUIT_THRESHOLD']:
+            endpoint.circuit_open_until = now + timedelta(seconds=config['WEBHOOK_CIRCUIT_COOLDOWN'])
+            logger.warning("Webhook endpoint %s failed %d times in a row; pausing it for %ss",
+                           endpoint.id, endpoint.consecutive_failures, config['WEBHOOK_CIRCUIT_COOLDOWN'])
+        db.session.commit()
+        return 0
+
+    def _prune(self):
+        if time.monotonic() - self._pruned_at < 3600:
+            return
+        cutoff = datetime.utcnow() - timedelta(days=self.app.config['WEBHOOK_RETENTION_DAYS'])
+        WebhookOutbox.query.filter(WebhookOutbox.status != 'pending', WebhookOutbox.created_at < cutoff).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+        self._pruned_at = time.monotonic()
+
+    # Administration
+
+    def stats(self):
+        """{endpoint id: {status: rows}}"""
+        stats = {}
+        for endpoint_id, status, count in db.session.query(
+                WebhookOutbox.endpoint_id, WebhookOutbox.status, func.count(WebhookOutbox.id)
+        ).group_by(WebhookOutbox.endpoint_id, WebhookOutbox.status):
+            stats.setdefault(endpoint_id, {})[status] = count
+        return stats
+
+
+if __name__ == '__main__':
+    # Local receiver: prints each batch and checks its signature against WEBHOOK_SECRET
+    import os
+    import sys
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    secret = os.environ.get('WEBHOOK_SECRET', '')
+
+    class Receiver(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            valid = secret and hmac.compare_digest(
+                sign(secret, self.headers.get('X-Webhook-Timestamp', ''), body),
+                self.headers.get('X-Webhook-Signature', '')
+            )
+            events = json.loads(body)['events']
+            print(f"{len(events)} event(s), signature {'ok' if valid else 'NOT verified'}")
+            for event in events:
+                print(f"  #{event['id']} {event['type']} {json.dumps(event['data'])}")
+            sys.stdout.flush()
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8001
+    print(f"Receiving webhooks on http://localhost:{port}/")
+    HTTPServer(('', port), Receiver).serve_forever()